@@ -4,20 +4,42 @@ ActiveMQ Consumer for PythonConsumerTopic - STOMP 1.0
 This module provides a consumer that listens to ActiveMQ topic:
     com.zoomsystems.common.PythonConsumerTopic
 
-Protocol: STOMP 1.0 (uses Connection10 for ActiveMQ Classic compatibility)
+Protocol: STOMP 1.0 (uses Connection10 for ActiveMQ Classic compatibility);
+STOMP 1.1 (Connection11) when heartbeats are enabled
 Connection: tcp://localhost:61613 (STOMP port)
 
 Features:
 - Durable subscription: Messages are stored when consumer is offline
 - Messages are delivered when consumer reconnects
 - No message loss during maintenance/shutdown
+- Handlers run on a bounded worker pool; messages are acknowledged only
+  after their handler succeeds (client / client-individual ack)
+- Messages whose handler keeps failing are redirected to a failure queue;
+  handlers raise RetryMessages for transient failures, retried until they pass
+- Automatic reconnect with jittered exponential backoff across a failover
+  list of brokers, re-subscribing the durable subscription each time
+- TCP keepalive, or STOMP 1.1 heartbeats when heartbeat_ms > 0
+- Shared consumption ("queue" / "virtual-topic" modes) so several processes
+  can split the load; see activemq_workers.py
+- Prometheus metrics (received, redelivered, in-flight, handler time and
+  broker-timestamp-to-completion lag) on metrics_port
+- Optional micro-batch delivery: batch_handler(batch) receives up to
+  batch_size messages (or whatever arrived within batch_timeout_ms) and the
+  batch is acknowledged cumulatively once the handler returns
 """
+import os
 import time
+import socket
 import logging
+import random
 import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Optional
 import stomp
 from config import ACTIVEMQ_CONFIG
+from metrics import (ACTIVEMQ_END_TO_END_SECONDS, ACTIVEMQ_HANDLER_SECONDS, ACTIVEMQ_IN_FLIGHT, ACTIVEMQ_OUTCOMES,
+                     ACTIVEMQ_RECEIVED, ACTIVEMQ_REDELIVERED, serve_metrics)
 
 # Configure logging
 logging.basicConfig(
@@ -29,8 +51,405 @@ logger = logging.getLogger(__name__)
 logging.getLogger('stomp.py').setLevel(logging.WARNING)
 
 
+ACK_MODES = ("auto", "client", "client-individual")
+
+# Upper bound on the delay between retries of a RetryMessages failure
+MAX_RETRY_BACKOFF = 30
+
+
+class RejectMessages(Exception):
+    """
+    Raised by a handler that processed its message(s) except some it can never
+    handle (e.g. malformed content). The rejected messages go straight to the
+    failure destination without retries and the rest are acknowledged.
+
+    Args:
+        rejected: List of (index, reason) pairs; index is the position in the
+            batch (always 0 for a single-message handler)
+    """
+
+    def __init__(self, rejected):
+        self.rejected = list(rejected)
+        super().__init__(f"{len(self.rejected)} message(s) rejected")
+
+
+class RetryMessages(Exception):
+    """
+    Raised by a handler for a transient failure (e.g. a downstream outage).
+
+    The messages are retried with backoff, up to MAX_RETRY_BACKOFF seconds
+    apart, until the handler succeeds or the consumer stops. These retries do
+    not count towards max_attempts, so the messages are never redirected to
+    the failure destination. While they wait they hold their in-flight slots,
+    which pauses delivery once max_in_flight is reached.
+    """
+
+
+# "durable": one durable topic subscriber (single consumer per client_id);
+# "queue" / "virtual-topic": any number of consumers share a queue, each
+# message going to one of them
+CONSUME_MODES = ("durable", "queue", "virtual-topic")
+
+# Headers copied from the original message when redirecting it to the failure queue
+FAILURE_COPY_HEADERS = ("message-id", "destination", "timestamp", "correlation-id", "type", "persistent")
+
+
+class MessageDispatcher:
+    """
+    Runs the message handler on a bounded worker pool and acknowledges each
+    message only after its handler succeeds.
+
+    dispatch() is called on stomp.py's receiver thread and blocks while
+    max_in_flight messages are unacknowledged, which pushes back on the broker
+    instead of buffering without limit.
+
+    Args:
+        conn: Connected stomp connection used for ACK and failure redirects
+        message_handler: Callable(headers, body)
+        ack_mode: "auto", "client" or "client-individual"
+        workers: Number of handler threads
+        max_in_flight: Maximum messages dispatched but not yet acknowledged
+        max_attempts: Handler attempts per message before it is treated as failed
+        failure_destination: Destination failed messages are sent to before being
+            acknowledged; None leaves them unacknowledged for redelivery. With
+            cumulative "client" acks a later ack also covers them, so they are
+            only redelivered if the session ends first
+        retry_backoff: Base delay in seconds between handler attempts
+        destination: Subscribed destination, used as the metrics label
+    """
+
+    def __init__(
+        self,
+        conn,
+        message_handler: Callable,
+        ack_mode: str = "client-individual",
+        workers: int = 4,
+        max_in_flight: int = 8,
+        max_attempts: int = 3,
+        failure_destination: Optional[str] = None,
+        retry_backoff: float = 0.5,
+        destination: str = ""
+    ):
+        if ack_mode not in ACK_MODES:
+            raise ValueError(f"Unsupported ack mode: {ack_mode}")
+        self.conn = conn
+        self.message_handler = message_handler
+        self.ack_mode = ack_mode
+        self.max_attempts = max(1, max_attempts)
+        self.failure_destination = failure_destination
+        self.retry_backoff = retry_backoff
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="activemq-worker")
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        # stomp.py writes frames straight to the socket; serialize ACK/SEND from workers
+        self._send_lock = threading.Lock()
+        # Set on shutdown; ends RetryMessages retries
+        self._stopping = threading.Event()
+        # Delivery-ordered message ids -> headers once handled (None until then),
+        # for cumulative "client" acks
+        self._pending = OrderedDict()
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self.destination = destination
+        if ack_mode == "client" and not failure_destination:
+            logger.warning("Cumulative client acks without a failure destination: failed messages are "
+                           "acknowledged by the next successful ack and are not redelivered")
+        self._received = ACTIVEMQ_RECEIVED.labels(destination)
+        self._redelivered = ACTIVEMQ_REDELIVERED.labels(destination)
+        self._in_flight = ACTIVEMQ_IN_FLIGHT.labels(destination)
+        self._handler_seconds = ACTIVEMQ_HANDLER_SECONDS.labels(destination)
+        self._end_to_end_seconds = ACTIVEMQ_END_TO_END_SECONDS.labels(destination)
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+        if key in ("handled", "redirected", "unacknowledged"):
+            ACTIVEMQ_OUTCOMES.labels(self.destination, key).inc(n)
+
+    def _admit(self, headers: dict):
+        """Wait for an in-flight slot and record the message's delivery order."""
+        self._received.inc()
+        if headers.get("redelivered") == "true":
+            self._redelivered.inc()
+        self._slots.acquire()
+        self._in_flight.inc()
+        if self.ack_mode == "client":
+            with self._send_lock:
+                self._pending[headers.get("message-id")] = None
+
+    def _submit(self, fn, messages):
+        try:
+            self._pool.submit(fn, messages)
+        except RuntimeError:
+            # Pool shut down: leave the messages unacknowledged for redelivery
+            for _ in messages:
+                self._slots.release()
+            self._in_flight.dec(len(messages))
+            logger.warning(f"Consumer stopping - {len(messages)} message(s) left for redelivery")
+
+    def dispatch(self, headers: dict, body: str):
+        """Queue a message for processing, blocking while the in-flight limit is reached."""
+        self._admit(headers)
+        self._submit(self._process, [(headers, body)])
+
+    def _process(self, messages):
+        headers, body = messages[0]
+        self._handle(messages, lambda: self.message_handler(headers, body), f"message {headers.get('message-id')}")
+
+    def _handle(self, messages, call, label):
+        """Run call with retries, then ack messages on success or fail them."""
+        try:
+            attempt = transient = 0
+            while attempt < self.max_attempts:
+                start = time.perf_counter()
+                try:
+                    call()
+                    self._handler_seconds.observe(time.perf_counter() - start)
+                    self._observe_end_to_end(messages)
+                    self._count("handled", len(messages))
+                    self._acknowledge(messages)
+                    return
+                except RejectMessages as rejected:
+                    self._handler_seconds.observe(time.perf_counter() - start)
+                    self._reject(messages, rejected.rejected, label)
+                    return
+                except RetryMessages as e:
+                    self._handler_seconds.observe(time.perf_counter() - start)
+                    self._count("transient_errors")
+                    transient += 1
+                    delay = min(self.retry_backoff * (2 ** min(transient - 1, 16)), MAX_RETRY_BACKOFF)
+                    logger.warning(f"Transient failure processing {label} (retry {transient} in {delay:.1f}s): {e}")
+                    if self._stopping.wait(delay):
+                        # Still pending, so later cumulative acks cannot cover it before the session ends
+                        logger.warning(f"Consumer stopping - {label} left for redelivery")
+                        return
+                except Exception as e:
+                    self._handler_seconds.observe(time.perf_counter() - start)
+                    self._count("handler_errors")
+                    attempt += 1
+                    logger.error(f"Error processing {label} (attempt {attempt}/{self.max_attempts}): {e}",
+                                 exc_info=True)
+                    if attempt < self.max_attempts:
+                        time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            self._fail(messages, label)
+        except Exception as e:
+            logger.error(f"Failed to acknowledge or redirect {label}: {e}", exc_info=True)
+        finally:
+            for _ in messages:
+                self._slots.release()
+            self._in_flight.dec(len(messages))
+
+    def _observe_end_to_end(self, messages):
+        """Record broker timestamp -> handler completion for each message."""
+        now_ms = time.time() * 1000
+        for headers, _ in messages:
+            try:
+                sent_ms = int(headers["timestamp"])
+            except (KeyError, ValueError):
+                continue
+            if sent_ms > 0:
+                self._end_to_end_seconds.observe(max(0.0, now_ms - sent_ms) / 1000)
+
+    def _fail(self, messages, label):
+        if not self.failure_destination:
+            self._count("unacknowledged", len(messages))
+            logger.error(f"{label} failed {self.max_attempts} times - left unacknowledged for redelivery")
+            self._forget(messages)
+            return
+        with self._send_lock:
+            for headers, body in messages:
+                self._redirect(headers, body, {"failure-attempts": str(self.max_attempts)})
+        self._count("redirected", len(messages))
+        logger.error(f"{label} failed {self.max_attempts} times - redirected to {self.failure_destination}")
+        self._acknowledge(messages)
+
+    def _reject(self, messages, rejected, label):
+        """Redirect rejected messages without retrying and acknowledge the whole batch."""
+        if not self.failure_destination:
+            self._count("unacknowledged", len(messages))
+            logger.error(f"{label}: {len(rejected)} message(s) rejected and no failure destination - "
+                         f"left unacknowledged for redelivery")
+            self._forget(messages)
+            return
+        with self._send_lock:
+            for index, reason in rejected:
+                headers, body = messages[index]
+                self._redirect(headers, body, {"failure-reason": str(reason)[:1000]})
+        self._count("redirected", len(rejected))
+        self._count("handled", len(messages) - len(rejected))
+        self._observe_end_to_end(messages)
+        logger.warning(f"{label}: {len(rejected)} message(s) rejected - redirected to {self.failure_destination}")
+        self._acknowledge(messages)
+
+    def _redirect(self, headers, body, extra_headers):
+        # Caller holds _send_lock
+        failure_headers = {f"original-{name}": headers[name] for name in FAILURE_COPY_HEADERS if name in headers}
+        failure_headers.update(extra_headers)
+        self.conn.send(destination=self.failure_destination, body=body, headers=failure_headers)
+
+    def _acknowledge(self, messages):
+        if self.ack_mode == "auto":
+            return
+        with self._send_lock:
+            if self.ack_mode == "client-individual":
+                for headers, _ in messages:
+                    self._send_ack(headers)
+                return
+            # Cumulative ack: acknowledge up to the last message whose
+            # predecessors have all been handled. Ids missing from _pending
+            # were delivered before a reconnect and will be redelivered.
+            for headers, _ in messages:
+                message_id = headers.get("message-id")
+                if message_id in self._pending:
+                    self._pending[message_id] = headers
+            self._ack_handled_prefix()
+
+    def _forget(self, messages):
+        """
+        Drop messages left unacknowledged from the cumulative ack order.
+
+        Otherwise their entries would block every later ack, and delivery
+        would stall once max_in_flight messages were waiting behind them.
+        The next cumulative ack covers them too.
+        """
+        if self.ack_mode != "client":
+            return
+        with self._send_lock:
+            for headers, _ in messages:
+                self._pending.pop(headers.get("message-id"), None)
+            self._ack_handled_prefix()
+
+    def _ack_handled_prefix(self):
+        # Caller holds _send_lock
+        last_done = None
+        while self._pending:
+            first_headers = next(iter(self._pending.values()))
+            if first_headers is None:
+                break
+            self._pending.popitem(last=False)
+            last_done = first_headers
+        if last_done is not None:
+            self._send_ack(last_done)
+
+    def _send_ack(self, headers: dict):
+        # STOMP 1.1+ ACK frames must name the subscription
+        if self.conn.version == "1.0":
+            self.conn.ack(headers.get("message-id"))
+        else:
+            self.conn.ack(headers.get("message-id"), headers.get("subscription"))
+
+    def reset_session(self):
+        """
+        Forget delivery order after a reconnect.
+
+        The broker redelivers everything that was unacknowledged when the old
+        session ended, so acks for those deliveries are no longer tracked.
+        """
+        with self._send_lock:
+            self._pending.clear()
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting messages and, with wait=True, let in-flight handlers finish and ack."""
+        self._stopping.set()
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+class BatchDispatcher(MessageDispatcher):
+    """
+    Collects messages into micro-batches and calls batch_handler(batch) once per batch.
+
+    A batch is flushed when it holds batch_size messages or its oldest message
+    has waited batch_timeout_ms. After batch_handler returns, the batch is
+    acknowledged (cumulatively in "client" mode, so only its last message id
+    is sent once every earlier delivery is done). Unacknowledged messages stay
+    in the durable subscription and are redelivered after a reconnect.
+
+    Args:
+        conn: Connected stomp connection
+        batch_handler: Callable(list of (headers, body))
+        batch_size: Maximum messages per batch
+        batch_timeout_ms: Maximum time the oldest message waits for its batch
+        ack_mode, workers, max_in_flight, max_attempts, failure_destination,
+        retry_backoff: As for MessageDispatcher; max_in_flight is raised to
+            batch_size if smaller
+    """
+
+    def __init__(
+        self,
+        conn,
+        batch_handler: Callable,
+        batch_size: int = 100,
+        batch_timeout_ms: int = 500,
+        ack_mode: str = "client",
+        workers: int = 2,
+        max_in_flight: int = 200,
+        **kwargs
+    ):
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout_ms / 1000
+        super().__init__(conn, batch_handler, ack_mode=ack_mode, workers=workers,
+                         max_in_flight=max(max_in_flight, self.batch_size), **kwargs)
+        self._batch = []
+        self._batch_started = None
+        self._batch_cond = threading.Condition()
+        self._closed = False
+        self._timer = threading.Thread(target=self._flush_on_timeout, name="activemq-batch-timer", daemon=True)
+        self._timer.start()
+
+    def dispatch(self, headers: dict, body: str):
+        """Add a message to the current batch, flushing it when full."""
+        self._admit(headers)
+        with self._batch_cond:
+            if not self._batch:
+                self._batch_started = time.monotonic()
+                self._batch_cond.notify()
+            self._batch.append((headers, body))
+            batch = self._take_batch() if len(self._batch) >= self.batch_size else None
+        if batch:
+            self._submit(self._process, batch)
+
+    def _take_batch(self):
+        batch, self._batch, self._batch_started = self._batch, [], None
+        return batch
+
+    def _flush_on_timeout(self):
+        while True:
+            with self._batch_cond:
+                while not self._closed and not self._batch:
+                    self._batch_cond.wait()
+                if self._closed:
+                    return
+                remaining = self._batch_started + self.batch_timeout - time.monotonic()
+                if remaining > 0:
+                    self._batch_cond.wait(remaining)
+                    continue
+                batch = self._take_batch()
+            self._submit(self._process, batch)
+
+    def flush(self):
+        """Submit the current partial batch now."""
+        with self._batch_cond:
+            batch = self._take_batch() if self._batch else None
+        if batch:
+            self._submit(self._process, batch)
+
+    def _process(self, messages):
+        self._count("batches")
+        label = f"batch of {len(messages)} ({messages[0][0].get('message-id')}..{messages[-1][0].get('message-id')})"
+        self._handle(messages, lambda: self.message_handler(messages), label)
+
+    def shutdown(self, wait: bool = True):
+        """Flush the partial batch, stop the timer and the worker pool."""
+        if wait:
+            self.flush()
+        with self._batch_cond:
+            self._closed = True
+            self._batch_cond.notify()
+        self._timer.join()
+        super().shutdown(wait=wait)
+
+
 class ActiveMQConsumerListener(stomp.ConnectionListener):
-    """Listener class for ActiveMQ message handling using STOMP 1.0"""
+    """Listener class for ActiveMQ message handling using STOMP 1.0 (1.1 with heartbeats)"""
     
     def __init__(self, message_handler: Optional[Callable] = None):
         """
@@ -42,14 +461,20 @@ class ActiveMQConsumerListener(stomp.ConnectionListener):
         """
         self.message_handler = message_handler
         self.connection = None
+        # Set by ActiveMQConsumer; when present, messages are handed to its worker pool
+        self.dispatcher = None
+        # Set by ActiveMQConsumer; called when the connection drops
+        self.on_connection_lost = None
         
     def on_connected(self, frame):
         """Called when connection is established"""
-        logger.info("Connected to ActiveMQ broker (STOMP 1.0)")
+        logger.info(f"Connected to ActiveMQ broker (STOMP {frame.headers.get('version', '1.0')})")
         
     def on_disconnected(self):
         """Called when connection is lost"""
         logger.warning("Disconnected from ActiveMQ broker")
+        if self.on_connection_lost is not None:
+            self.on_connection_lost()
         
     def on_message(self, frame):
         """
@@ -65,8 +490,11 @@ class ActiveMQConsumerListener(stomp.ConnectionListener):
         logger.debug(f"Message headers: {headers}")
         logger.debug(f"Message body: {body[:200]}...")  # Log first 200 chars
         
+        # Hand off to the worker pool (acks after the handler succeeds)
+        if self.dispatcher is not None:
+            self.dispatcher.dispatch(headers, body)
         # Process message with custom handler if provided
-        if self.message_handler:
+        elif self.message_handler:
             try:
                 self.message_handler(headers, body)
             except Exception as e:
@@ -81,6 +509,7 @@ class ActiveMQConsumerListener(stomp.ConnectionListener):
         
     def on_heartbeat_timeout(self):
         """Called when heartbeat timeout occurs"""
+        # stomp.py closes the socket after this, which triggers on_disconnected
         logger.warning("Heartbeat timeout - connection may be stale")
         
     def on_receipt(self, frame):
@@ -104,7 +533,21 @@ class ActiveMQConsumer:
         topic: str = None,
         client_id: str = None,
         subscription_name: str = None,
-        message_handler: Optional[Callable] = None
+        message_handler: Optional[Callable] = None,
+        ack_mode: str = None,
+        workers: int = None,
+        max_in_flight: int = None,
+        max_attempts: int = None,
+        failure_destination: str = None,
+        batch_handler: Optional[Callable] = None,
+        batch_size: int = None,
+        batch_timeout_ms: int = None,
+        brokers=None,
+        heartbeat_ms: int = None,
+        consume_mode: str = None,
+        queue: str = None,
+        consumer_group: str = None,
+        metrics_port: int = None
     ):
         """
         Initialize the ActiveMQ consumer with STOMP 1.0.
@@ -118,26 +561,123 @@ class ActiveMQConsumer:
             client_id: Client ID for durable subscription (defaults to config)
             subscription_name: Durable subscription name (defaults to config)
             message_handler: Optional callback function to handle messages
+            ack_mode: "client-individual", "client" or "auto" (defaults to config)
+            workers: Handler threads (defaults to config)
+            max_in_flight: Maximum unacknowledged messages (defaults to config)
+            max_attempts: Handler attempts before a message is redirected (defaults to config)
+            failure_destination: Where failed messages go; "none" leaves them
+                                 unacknowledged (defaults to config, then /queue/DLQ.<topic>)
+            batch_handler: Optional callback receiving a list of (headers, body);
+                           replaces message_handler with micro-batch delivery
+                           (cumulative "client" acks unless ack_mode is given)
+            batch_size: Maximum messages per batch (defaults to config)
+            batch_timeout_ms: Maximum wait for a partial batch (defaults to config)
+            brokers: Failover list of (host, port) tuples or a "host:port,host:port"
+                     string, tried in order (defaults to host/port, then config)
+            heartbeat_ms: STOMP heartbeat interval; 0 keeps STOMP 1.0 with TCP
+                          keepalive, >0 switches to STOMP 1.1 heartbeats (defaults to config)
+            consume_mode: "durable", "queue" or "virtual-topic" (defaults to config)
+            queue: Queue consumed in "queue" mode (defaults to config, then the topic name)
+            consumer_group: Virtual topic consumer group; consumers in the same
+                            group share messages (defaults to config)
+            metrics_port: Port for Prometheus metrics; 0 disables (defaults to config)
         """
         self.host = host or ACTIVEMQ_CONFIG["host"]
         self.port = port or ACTIVEMQ_CONFIG["stomp_port"]
+        if brokers:
+            self.brokers = parse_brokers(brokers) if isinstance(brokers, str) else list(brokers)
+        elif host or port or not ACTIVEMQ_CONFIG["brokers"]:
+            self.brokers = [(self.host, self.port)]
+        else:
+            self.brokers = parse_brokers(ACTIVEMQ_CONFIG["brokers"])
+        self.heartbeat_ms = ACTIVEMQ_CONFIG["heartbeat_ms"] if heartbeat_ms is None else heartbeat_ms
+        self.reconnect_initial_delay = ACTIVEMQ_CONFIG["reconnect_initial_delay"]
+        self.reconnect_max_delay = ACTIVEMQ_CONFIG["reconnect_max_delay"]
+        self.reconnect_max_attempts = ACTIVEMQ_CONFIG["reconnect_max_attempts"]
         self.username = username or ACTIVEMQ_CONFIG["username"]
         self.password = password or ACTIVEMQ_CONFIG["password"]
         self.topic = topic or ACTIVEMQ_CONFIG["topic"]
+        self.consume_mode = consume_mode or ACTIVEMQ_CONFIG["consume_mode"]
+        if self.consume_mode not in CONSUME_MODES:
+            raise ValueError(f"Unsupported consume mode: {self.consume_mode}")
+        self.queue = queue or ACTIVEMQ_CONFIG["queue"] or self.topic
+        self.consumer_group = consumer_group or ACTIVEMQ_CONFIG["consumer_group"]
+        self.destination = self._subscription_destination()
         self.client_id = client_id or ACTIVEMQ_CONFIG["client_id"]
+        if self.consume_mode != "durable" and not client_id:
+            # The broker rejects a second connection with the same client-id
+            self.client_id = f"{self.client_id}-{socket.gethostname()}-{os.getpid()}"
         self.subscription_name = subscription_name or ACTIVEMQ_CONFIG["subscription_name"]
+        self.ack_mode = ack_mode or ("client" if batch_handler else ACTIVEMQ_CONFIG["ack_mode"])
+        self.workers = workers or ACTIVEMQ_CONFIG["workers"]
+        self.max_in_flight = max_in_flight or ACTIVEMQ_CONFIG["max_in_flight"]
+        self.max_attempts = max_attempts or ACTIVEMQ_CONFIG["max_attempts"]
+        failure_destination = failure_destination or ACTIVEMQ_CONFIG["failure_destination"]
+        if not failure_destination:
+            failure_destination = f"/queue/DLQ.{self.destination.rsplit('/', 1)[-1]}"
+        self.failure_destination = None if failure_destination.lower() == "none" else failure_destination
+        self.metrics_port = ACTIVEMQ_CONFIG["metrics_port"] if metrics_port is None else metrics_port
+        self.batch_size = batch_size or ACTIVEMQ_CONFIG["batch_size"]
+        self.batch_timeout_ms = batch_timeout_ms or ACTIVEMQ_CONFIG["batch_timeout_ms"]
+        if batch_handler:
+            # A full batch must fit within the unacknowledged window
+            self.max_in_flight = max(self.max_in_flight, self.batch_size)
         
-        self.conn = stomp.Connection10(
-            host_and_ports=[(self.host, self.port)]
-        )
+        # One pass over the broker list per connect(); backoff between passes
+        # is handled by _connect_with_backoff()
+        if self.heartbeat_ms > 0:
+            self.conn = stomp.Connection11(
+                host_and_ports=self.brokers,
+                heartbeats=(self.heartbeat_ms, self.heartbeat_ms),
+                reconnect_attempts_max=1,
+                keepalive=True
+            )
+        else:
+            self.conn = stomp.Connection10(
+                host_and_ports=self.brokers,
+                reconnect_attempts_max=1,
+                keepalive=True
+            )
         
         # Set up listener
         self.listener = ActiveMQConsumerListener(message_handler)
+        self.listener.on_connection_lost = self._on_connection_lost
         self.conn.set_listener('', self.listener)
+        self.dispatcher = None
+        if batch_handler:
+            self.dispatcher = BatchDispatcher(
+                self.conn,
+                batch_handler,
+                batch_size=self.batch_size,
+                batch_timeout_ms=self.batch_timeout_ms,
+                ack_mode=self.ack_mode,
+                workers=self.workers,
+                max_in_flight=self.max_in_flight,
+                max_attempts=self.max_attempts,
+                failure_destination=self.failure_destination,
+                destination=self.destination
+            )
+            self.listener.dispatcher = self.dispatcher
+        elif message_handler:
+            self.dispatcher = MessageDispatcher(
+                self.conn,
+                message_handler,
+                ack_mode=self.ack_mode,
+                workers=self.workers,
+                max_in_flight=self.max_in_flight,
+                max_attempts=self.max_attempts,
+                failure_destination=self.failure_destination,
+                destination=self.destination
+            )
+            self.listener.dispatcher = self.dispatcher
         
         self.connected = False
         self.subscribed = False
         self.running = False
+        self._stopping = threading.Event()
+        self._connection_lost = threading.Event()
+        self._stopped = threading.Event()
+        self._supervisor = None
         
     def connect(self):
         """Connect to ActiveMQ broker using STOMP 1.0 with durable subscription support"""
@@ -165,37 +705,110 @@ class ActiveMQConsumer:
                 return False
                 
             self.connected = True
-            logger.info(f"Connected to ActiveMQ at {self.host}:{self.port} (STOMP 1.0, Client ID: {self.client_id})")
+            self.host, self.port = self.conn.transport.current_host_and_port
+            logger.info(f"Connected to ActiveMQ at {self.host}:{self.port} "
+                        f"(STOMP {self.conn.version}, Client ID: {self.client_id})")
             return True
         except Exception as e:
-            logger.error(f"Failed to connect to ActiveMQ: {e}")
+            logger.error(f"Failed to connect to ActiveMQ ({', '.join(f'{h}:{p}' for h, p in self.brokers)}): {e}")
             self.connected = False
             return False
+
+    def _subscription_destination(self):
+        """Return the STOMP destination this consumer subscribes to."""
+        if self.consume_mode == "queue":
+            return self.queue if self.queue.startswith("/") else f"/queue/{self.queue}"
+        if self.consume_mode == "virtual-topic":
+            # Producers publish to /topic/VirtualTopic.<name>; the broker copies each
+            # message to one queue per consumer group
+            name = self.topic.rsplit("/", 1)[-1]
+            if not name.startswith("VirtualTopic."):
+                name = f"VirtualTopic.{name}"
+            return f"/queue/Consumer.{self.consumer_group}.{name}"
+        return f"/topic/{self.topic}" if not self.topic.startswith("/") else self.topic
+
+    def _connect_with_backoff(self):
+        """
+        Connect and (re)subscribe the durable subscription, retrying with
+        jittered exponential backoff until it succeeds, stop() is called or
+        reconnect_max_attempts (0 = unlimited) is reached.
+        """
+        delay = self.reconnect_initial_delay
+        attempt = 0
+        while not self._stopping.is_set():
+            attempt += 1
+            if self.dispatcher:
+                self.dispatcher.reset_session()
+            if self.connect():
+                if self.subscribe():
+                    return True
+                self.disconnect()
+            if self.reconnect_max_attempts and attempt >= self.reconnect_max_attempts:
+                logger.error(f"Giving up after {attempt} connection attempts")
+                return False
+            sleep = random.uniform(delay / 2, delay)
+            logger.warning(f"Connection attempt {attempt} failed - retrying in {sleep:.1f}s")
+            if self._stopping.wait(sleep):
+                return False
+            delay = min(delay * 2, self.reconnect_max_delay)
+        return False
+
+    def _on_connection_lost(self):
+        self.connected = False
+        self.subscribed = False
+        if self.running:
+            self._connection_lost.set()
+
+    def _supervise(self):
+        """Reconnect and resubscribe whenever the connection drops, until stop()."""
+        try:
+            while True:
+                self._connection_lost.wait()
+                if self._stopping.is_set():
+                    return
+                self._connection_lost.clear()
+                if self.conn.is_connected() and self.subscribed:
+                    continue
+                logger.warning("Connection to ActiveMQ lost - reconnecting")
+                if not self._connect_with_backoff():
+                    if not self._stopping.is_set():
+                        self.running = False
+                    return
+                logger.info("Reconnected and resubscribed - unacknowledged messages will be redelivered")
+        finally:
+            self._stopped.set()
             
     def subscribe(self):
-        """Subscribe to the configured topic using STOMP 1.0 with durable subscription"""
+        """Subscribe to the configured destination (durable topic subscription or shared queue)"""
         if not self.connected:
             logger.error("Cannot subscribe - not connected to broker")
             return False
             
         try:
-            topic_path = f"/topic/{self.topic}" if not self.topic.startswith("/") else self.topic
-            
-            # Durable subscription headers - messages stored when consumer is offline
-            subscribe_headers = {
-                'activemq.subscriptionName': self.subscription_name,
-                'activemq.durableSubscriptionName': self.subscription_name
-            }
+            subscribe_headers = {}
+            if self.consume_mode == "durable":
+                # Durable subscription headers - messages stored when consumer is offline
+                subscribe_headers = {
+                    'activemq.subscriptionName': self.subscription_name,
+                    'activemq.durableSubscriptionName': self.subscription_name
+                }
+            ack_mode = self.ack_mode if self.dispatcher else 'auto'
+            if ack_mode != 'auto':
+                # Don't let the broker push more than we may hold unacknowledged
+                subscribe_headers['activemq.prefetchSize'] = str(self.max_in_flight)
             
             self.conn.subscribe(
-                destination=topic_path,
+                destination=self.destination,
                 id=1,
-                ack='auto',
+                ack=ack_mode,
                 headers=subscribe_headers
             )
             self.subscribed = True
-            logger.info(f"Subscribed to topic: {topic_path} (Durable: {self.subscription_name})")
-            logger.info("Messages will be stored when consumer is offline and delivered on reconnect")
+            if self.consume_mode == "durable":
+                logger.info(f"Subscribed to topic: {self.destination} (Durable: {self.subscription_name}, ack: {ack_mode})")
+                logger.info("Messages will be stored when consumer is offline and delivered on reconnect")
+            else:
+                logger.info(f"Subscribed to shared queue: {self.destination} ({self.consume_mode}, ack: {ack_mode})")
             return True
         except Exception as e:
             logger.error(f"Failed to subscribe to topic: {e}", exc_info=True)
@@ -210,7 +823,7 @@ class ActiveMQConsumer:
         try:
             self.conn.unsubscribe(id=1)
             self.subscribed = False
-            logger.info(f"Unsubscribed from topic: {self.topic}")
+            logger.info(f"Unsubscribed from: {self.destination}")
         except Exception as e:
             logger.error(f"Failed to unsubscribe: {e}", exc_info=True)
             
@@ -231,7 +844,7 @@ class ActiveMQConsumer:
             try:
                 self.conn.disconnect()
                 self.connected = False
-                if keep_durable_subscription:
+                if keep_durable_subscription and self.consume_mode == "durable":
                     logger.info(f"Disconnected from ActiveMQ broker (durable subscription '{self.subscription_name}' remains active)")
                     logger.info("Messages sent while offline will be stored and delivered on reconnect")
                 else:
@@ -243,41 +856,36 @@ class ActiveMQConsumer:
         """
         Start the consumer and begin listening for messages.
         
+        The connection is supervised: after a drop the consumer reconnects
+        (failing over through the broker list) and resubscribes.
+        
         Args:
             blocking: If True, blocks the current thread. If False, runs in background.
         """
-        if not self.connect():
+        if self.metrics_port:
+            serve_metrics(self.metrics_port)
+            logger.info(f"Serving consumer metrics on :{self.metrics_port}/metrics")
+        self._stopping.clear()
+        self._stopped.clear()
+        self._connection_lost.clear()
+        # Set before connecting so a drop right after subscribing is noticed
+        self.running = True
+        if not self._connect_with_backoff():
             logger.error("Failed to connect - cannot start consumer")
+            self.running = False
             return False
             
-        if not self.subscribe():
-            logger.error("Failed to subscribe - cannot start consumer")
-            self.disconnect()
-            return False
-            
-        self.running = True
+        self._supervisor = threading.Thread(target=self._supervise, name="activemq-supervisor", daemon=True)
+        self._supervisor.start()
         logger.info("Consumer started and listening for messages...")
         
         if blocking:
             try:
-                # Keep the connection alive
-                while self.running:
-                    time.sleep(1)
+                # Wakes on stop() or when reconnecting gives up
+                self._stopped.wait()
             except KeyboardInterrupt:
                 logger.info("Received interrupt signal, shutting down...")
                 self.stop()
-        else:
-            # Run in background thread
-            def run_loop():
-                try:
-                    while self.running:
-                        time.sleep(1)
-                except Exception as e:
-                    logger.error(f"Error in consumer loop: {e}", exc_info=True)
-                    self.running = False
-                    
-            thread = threading.Thread(target=run_loop, daemon=True)
-            thread.start()
             
         return True
         
@@ -291,9 +899,33 @@ class ActiveMQConsumer:
         """
         logger.info("Stopping consumer...")
         self.running = False
+        self._stopping.set()
+        self._connection_lost.set()
+        if self.dispatcher:
+            # Let in-flight handlers finish and ack before the connection closes;
+            # anything not yet acked is redelivered on reconnect
+            self.dispatcher.shutdown(wait=True)
         self.disconnect(keep_durable_subscription=keep_durable_subscription)
 
 
+def parse_brokers(value: str):
+    """
+    Parse a broker list such as "mq1:61613,mq2:61613" or
+    "failover:(tcp://mq1:61613,tcp://mq2:61613)" into (host, port) tuples.
+    """
+    value = value.strip()
+    if value.startswith("failover:"):
+        value = value[len("failover:"):].split("?", 1)[0].strip("()")
+    brokers = []
+    for entry in value.split(","):
+        entry = entry.strip().split("://", 1)[-1].split("?", 1)[0]
+        if not entry:
+            continue
+        host, _, port = entry.rpartition(":")
+        brokers.append((host, int(port)) if host else (entry, ACTIVEMQ_CONFIG["stomp_port"]))
+    return brokers
+
+
 def default_message_handler(headers: dict, body: str):
     """
     Default message handler - processes received messages.
@@ -0,0 +1,182 @@
+"""
+Multi-process ActiveMQ consumer launcher.
+
+Runs one ActiveMQConsumer per process (default: one per CPU) on a shared
+queue or virtual topic, so N processes split the messages between them.
+A durable topic subscription only allows one consumer per client-id, so
+the launcher refuses to start more than one process in "durable" mode.
+
+On SIGTERM/SIGINT the launcher asks every worker to stop; each worker
+stops taking new messages, finishes and acknowledges its in-flight ones
+and disconnects. Workers that are still running after drain_timeout are
+killed, and their unacknowledged messages are redelivered. Workers that
+exit unexpectedly are restarted.
+
+Usage:
+    ACTIVEMQ_CONSUME_MODE=virtual-topic python activemq_workers.py
+    python activemq_workers.py --processes 4 --mode queue --handler mypkg.handlers:handle
+"""
+import argparse
+import importlib
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+from config import ACTIVEMQ_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between restarts of the same worker slot
+RESTART_BACKOFF = 5.0
+
+
+def load_handler(path: str):
+    """Import a handler given as "module:function"."""
+    module_name, _, attr = path.partition(":")
+    if not attr:
+        raise ValueError(f"Handler must be given as module:function, got {path!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _interrupt(signum, frame):
+    # ActiveMQConsumer.start() treats KeyboardInterrupt as a request to stop
+    raise KeyboardInterrupt
+
+
+def run_worker(index: int, handler_path: str, batch: bool, consume_mode: str):
+    """
+    Worker process entry point: run one consumer until SIGTERM/SIGINT.
+
+    Args:
+        index: Worker slot number (for logging)
+        handler_path: "module:function" message or batch handler
+        batch: Pass the handler as batch_handler instead of message_handler
+        consume_mode: "queue" or "virtual-topic" ("durable" with a single worker)
+    """
+    from activemq_consumer import ActiveMQConsumer
+
+    signal.signal(signal.SIGTERM, _interrupt)
+    signal.signal(signal.SIGINT, _interrupt)
+    handler = load_handler(handler_path)
+    # Each worker serves its own metrics port so every process can be scraped
+    metrics_port = ACTIVEMQ_CONFIG["metrics_port"] + index if ACTIVEMQ_CONFIG["metrics_port"] else 0
+    if batch:
+        consumer = ActiveMQConsumer(batch_handler=handler, consume_mode=consume_mode, metrics_port=metrics_port)
+    else:
+        consumer = ActiveMQConsumer(message_handler=handler, consume_mode=consume_mode, metrics_port=metrics_port)
+    logger.info(f"Worker {index} (pid {os.getpid()}) consuming {consumer.destination}")
+    try:
+        consumer.start(blocking=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Drains the dispatcher (in-flight handlers finish and ack) before disconnecting
+        consumer.stop()
+        logger.info(f"Worker {index} (pid {os.getpid()}) stopped")
+
+
+class WorkerPool:
+    """
+    Starts, watches and drains a fixed number of consumer processes.
+
+    Args:
+        processes: Number of worker processes
+        handler_path: "module:function" handler run in each worker
+        batch: Use the handler as a batch handler
+        consume_mode: Consumption mode passed to each ActiveMQConsumer
+        drain_timeout: Seconds workers get to finish in-flight messages on shutdown
+    """
+
+    def __init__(self, processes: int, handler_path: str, batch: bool = False,
+                 consume_mode: str = "virtual-topic", drain_timeout: float = 30.0):
+        if consume_mode == "durable" and processes > 1:
+            raise ValueError("A durable topic subscription supports a single consumer; "
+                             "use consume mode 'queue' or 'virtual-topic' to run several processes")
+        self.processes = processes
+        self.handler_path = handler_path
+        self.batch = batch
+        self.consume_mode = consume_mode
+        self.drain_timeout = drain_timeout
+        # spawn: workers never inherit the parent's threads or sockets
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = {}
+        self._started_at = {}
+        self._stopping = False
+
+    def _start_worker(self, index: int):
+        process = self._context.Process(
+            target=run_worker,
+            args=(index, self.handler_path, self.batch, self.consume_mode),
+            name=f"activemq-worker-{index}",
+        )
+        process.start()
+        self._workers[index] = process
+        self._started_at[index] = time.monotonic()
+        logger.info(f"Started worker {index} (pid {process.pid})")
+
+    def _request_stop(self, signum, frame):
+        if not self._stopping:
+            logger.info(f"Received signal {signum}, draining {len(self._workers)} worker(s)...")
+        self._stopping = True
+
+    def run(self):
+        """Run workers until SIGTERM/SIGINT, restarting any that exit early, then drain them."""
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        for index in range(self.processes):
+            self._start_worker(index)
+
+        while not self._stopping:
+            time.sleep(0.5)
+            for index, process in list(self._workers.items()):
+                if process.is_alive() or self._stopping:
+                    continue
+                logger.warning(f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}")
+                if time.monotonic() - self._started_at[index] >= RESTART_BACKOFF:
+                    self._start_worker(index)
+
+        self.drain()
+
+    def drain(self):
+        """Ask every worker to stop, wait up to drain_timeout, then kill stragglers."""
+        for process in self._workers.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM -> consumer.stop() in the worker
+        deadline = time.monotonic() + self.drain_timeout
+        for index, process in self._workers.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Worker {index} (pid {process.pid}) did not drain in "
+                               f"{self.drain_timeout}s - killing; unacked messages will be redelivered")
+                process.kill()
+                process.join()
+        logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several ActiveMQ consumer processes on a shared queue")
+    parser.add_argument("--processes", type=int, default=ACTIVEMQ_CONFIG["processes"] or os.cpu_count(),
+                        help="Worker processes (default: ACTIVEMQ_PROCESSES or one per CPU)")
+    parser.add_argument("--mode", default=None, choices=("durable", "queue", "virtual-topic"),
+                        help="Consume mode (default: ACTIVEMQ_CONSUME_MODE, 'virtual-topic' if that is 'durable')")
+    parser.add_argument("--handler", default="activemq_consumer:default_message_handler",
+                        help="Handler as module:function")
+    parser.add_argument("--batch", action="store_true", help="Treat --handler as a batch handler")
+    parser.add_argument("--drain-timeout", type=float, default=ACTIVEMQ_CONFIG["drain_timeout"],
+                        help="Seconds workers get to finish in-flight messages on shutdown")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    consume_mode = args.mode or ACTIVEMQ_CONFIG["consume_mode"]
+    if args.mode is None and consume_mode == "durable" and args.processes > 1:
+        consume_mode = "virtual-topic"
+    pool = WorkerPool(args.processes, args.handler, batch=args.batch,
+                      consume_mode=consume_mode, drain_timeout=args.drain_timeout)
+    logger.info(f"Starting {args.processes} consumer process(es) ({consume_mode})")
+    pool.run()
+
+
+if __name__ == "__main__":
+    main()
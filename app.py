@@ -1,16 +1,28 @@
 import logging
 from flask import Flask, request, jsonify
 from seed_client import send_vdi_message, send_vdi_dataexchange
-from config import VDI_TYPES, DEFAULT_OPERATOR_ID, SEED_ENDPOINTS
+from config import VDI_TYPES, DEFAULT_OPERATOR_ID, SEED_ENDPOINTS, SEED_ENVIRONMENT
 from vdi_configs import (
     get_market_config, list_available_configs
 )
 from sales_template import build_vdi_dataexchange_from_json
-import xml.etree.ElementTree as ET
-import re
+from sales_schema import SalesValidationError
+from http_compression import install_flask_compression
+from metrics import install_flask_metrics
+from tracing import configure_tracing, span
+from payload_templates import payload_templates
+from vdi_compression import VDIXMLSizeError
+from vdi_envelope import VDIEnvelopeError, iter_records
+from vdi_parsers import extract_sales, frame_columns
+from xml_backend import XML_PARSE_ERRORS
+
+configure_tracing("seed-vdi-sender")
 
 app = Flask(__name__)
 app.logger.setLevel(logging.INFO)
+# Metrics first so its timer also covers requests rejected by the body decoder
+install_flask_metrics(app)
+install_flask_compression(app)
 
 
 @app.route("/send/markets", methods=["POST"])
@@ -45,13 +57,9 @@ def handle_vdi_send(vdi_type, request):
         # Check if custom payload file is specified
         payload_file = request_data.get("payload_file", f"payloads/{vdi_type}.xml")
         
-        # Load payload file
-        with open(payload_file, "r") as file:
-            xml_payload = file.read()
-        
-        # Apply dynamic configuration based on VDI type
+        # Apply dynamic configuration based on VDI type to the cached template
         config_data = get_config_for_vdi_type(vdi_type, request_data)
-        xml_payload = apply_config_to_payload(xml_payload, config_data)
+        xml_payload = payload_templates.render(payload_file, config_data)
         
         app.logger.info(
             "Sending VDI message",
@@ -65,7 +73,8 @@ def handle_vdi_send(vdi_type, request):
         status, response = send_vdi_message(
             vdi_type=VDI_TYPES[vdi_type],
             vdi_content=xml_payload,
-            operator_id=operator_id
+            operator_id=operator_id,
+            environment=SEED_ENVIRONMENT
         )
         app.logger.info(
             "VDI message sent",
@@ -114,18 +123,6 @@ def get_config_for_vdi_type(vdi_type, request_data):
     else:
         return {}
 
-def apply_config_to_payload(xml_payload, config_data):
-    """Apply configuration data to XML payload using template substitution"""
-    pattern = re.compile(r"\{\{(\w+)\}\}")
-
-    def replace_placeholder(match):
-        key = match.group(1)
-        if key in config_data:
-            return str(config_data[key])
-        raise KeyError(f"Missing config value for {key}")
-
-    return pattern.sub(replace_placeholder, xml_payload)
-
 @app.route("/configs", methods=["GET"])
 def list_configs():
     """List all available configuration templates"""
@@ -158,7 +155,7 @@ def get_config_details(vdi_type):
 
 @app.route("/send/sales", methods=["POST"])
 def send_sales():
-    """Send sales VDI message to SEED test environment endpoint (SOAP)"""
+    """Send sales VDI message to the configured SEED environment endpoint (SOAP)"""
     try:
         request_data = request.get_json(silent=True)
         if not request_data:
@@ -179,11 +176,14 @@ def send_sales():
             extra={"sale_count": sale_count}
         )
 
-        environment = "test"
+        environment = SEED_ENVIRONMENT
 
-        vdi_dataexchange_xml = build_vdi_dataexchange_from_json(request_data, "mms-sales")
+        with span("vdi.send_sales", {"vdi.type": "mms-sales", "vdi.sale_count": sale_count}):
+            with span("vdi.build", {"vdi.type": "mms-sales"}) as build_span:
+                vdi_dataexchange_xml = build_vdi_dataexchange_from_json(request_data, "mms-sales", environment)
+                build_span.set_attribute("vdi.envelope_bytes", len(vdi_dataexchange_xml))
 
-        status, response = send_vdi_dataexchange(vdi_dataexchange_xml, environment)
+            status, response = send_vdi_dataexchange(vdi_dataexchange_xml, environment)
 
         app.logger.info(
             "Sales message sent",
@@ -197,6 +197,9 @@ def send_sales():
             "endpoint": SEED_ENDPOINTS[environment]
         })
 
+    except SalesValidationError as sve:
+        app.logger.warning("Invalid sales payload", extra={"errors": sve.errors})
+        return jsonify({"error": str(sve), "errors": sve.errors}), 400
     except ValueError as ve:
         app.logger.warning("Invalid sales payload", extra={"error": str(ve)})
         return jsonify({"error": str(ve)}), 400
@@ -205,23 +208,32 @@ def send_sales():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/receive/sales", methods=["POST"])
+def receive_sales():
+    """Receive mms-sales messages from Provider to Seed"""
+    try:
+        sales_data = process_sales_message(request.get_data())
+        
+        return jsonify({
+            "status": "success",
+            "message": "Sales data received and processed",
+            "data": sales_data
+        })
+        
+    except VDIXMLSizeError as e:
+        return jsonify({"error": str(e)}), 413
+    except VDIEnvelopeError:
+        return jsonify({"error": "Invalid VDI message format"}), 400
+    except XML_PARSE_ERRORS:
+        return jsonify({"error": "Invalid XML format"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/receive/kiosks", methods=["POST"])
 def receive_kiosks():
     """Receive mms-kiosks messages from Provider to Seed"""
     try:
-        xml_data = request.get_data(as_text=True)
-        root = ET.fromstring(xml_data)
-
-        def find_by_localname(node, local):
-            for el in node.iter():
-                if el.tag.split('}')[-1] == local:
-                    return el
-            return None
-        vdi_transaction = find_by_localname(root, 'VDITransaction')
-        if vdi_transaction is None:
-            return jsonify({"error": "Invalid VDI message format"}), 400
-        
-        kiosks_data = process_kiosks_message(vdi_transaction)
+        kiosks_data = process_kiosks_message(request.get_data())
         
         return jsonify({
             "status": "success",
@@ -229,7 +241,11 @@ def receive_kiosks():
             "data": kiosks_data
         })
         
-    except ET.ParseError:
+    except VDIXMLSizeError as e:
+        return jsonify({"error": str(e)}), 413
+    except VDIEnvelopeError:
+        return jsonify({"error": "Invalid VDI message format"}), 400
+    except XML_PARSE_ERRORS:
         return jsonify({"error": "Invalid XML format"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -238,19 +254,7 @@ def receive_kiosks():
 def receive_collections():
     """Receive mms-collections messages from Provider to Seed"""
     try:
-        xml_data = request.get_data(as_text=True)
-        root = ET.fromstring(xml_data)
-
-        def find_by_localname(node, local):
-            for el in node.iter():
-                if el.tag.split('}')[-1] == local:
-                    return el
-            return None
-        vdi_transaction = find_by_localname(root, 'VDITransaction')
-        if vdi_transaction is None:
-            return jsonify({"error": "Invalid VDI message format"}), 400
-        
-        collections_data = process_collections_message(vdi_transaction)
+        collections_data = process_collections_message(request.get_data())
         
         return jsonify({
             "status": "success",
@@ -258,74 +262,49 @@ def receive_collections():
             "data": collections_data
         })
         
-    except ET.ParseError:
+    except VDIXMLSizeError as e:
+        return jsonify({"error": str(e)}), 413
+    except VDIEnvelopeError:
+        return jsonify({"error": "Invalid VDI message format"}), 400
+    except XML_PARSE_ERRORS:
         return jsonify({"error": "Invalid XML format"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def process_sales_message(vdi_transaction):
-    """Process incoming sales VDI message"""
-    sales_data = []
-    
-    # Extract sales information
-    sales_collection = vdi_transaction.find('.//Sales')
-    if sales_collection is not None:
-        for sale in sales_collection.findall('Sale'):
-            sale_data = {
-                "market_id": sale.get('MarketID'),
-                "kiosk_id": sale.get('KioskID'),
-                "sale_id": sale.get('SaleID'),
-                "sale_time": sale.get('SaleTime'),
-                "consumer_id": sale.get('ConsumerID')
-            }
-            
-            # Extract summary
-            summary = sale.find('Summary')
-            if summary is not None:
-                sale_data["summary"] = {
-                    "price": summary.get('Price'),
-                    "discount": summary.get('Discount'),
-                    "total": summary.get('Total')
-                }
-            
-            sales_data.append(sale_data)
-    
-    return sales_data
+def process_sales_message(xml_data):
+    """Process incoming sales VDI message into the normalized sales tables, as {table: {column: [values]}}"""
+    return {table: frame_columns(df) for table, df in extract_sales(xml_data).items()}
 
-def process_kiosks_message(vdi_transaction):
-    """Process incoming kiosks VDI message"""
+def process_kiosks_message(xml_data):
+    """Process incoming kiosks VDI message (raw body, streamed record by record)"""
     kiosks_data = []
     
-    kiosks_collection = vdi_transaction.find('.//KiosksCollection')
-    if kiosks_collection is not None:
-        for kiosk in kiosks_collection.findall('Kiosk'):
-            kiosk_data = {
-                "market_id": kiosk.get('MarketID'),
-                "kiosk_id": kiosk.get('KioskID'),
-                "kiosk_sn": kiosk.get('KioskSN'),
-                "last_sync": kiosk.get('LastSync'),
-                "last_transaction": kiosk.get('LastTransaction'),
-                "catalog_version": kiosk.get('CatalogVersion')
-            }
-            kiosks_data.append(kiosk_data)
+    for _, kiosk in iter_records(xml_data, "KiosksCollection", "Kiosk"):
+        kiosk_data = {
+            "market_id": kiosk.get('MarketID'),
+            "kiosk_id": kiosk.get('KioskID'),
+            "kiosk_sn": kiosk.get('KioskSN'),
+            "last_sync": kiosk.get('LastSync'),
+            "last_transaction": kiosk.get('LastTransaction'),
+            "catalog_version": kiosk.get('CatalogVersion')
+        }
+        kiosks_data.append(kiosk_data)
     
     return kiosks_data
 
-def process_collections_message(vdi_transaction):
-    """Process incoming collections VDI message"""
+def process_collections_message(xml_data):
+    """Process incoming collections VDI message (raw body, streamed record by record)"""
     collections_data = []
     
-    collections_collection = vdi_transaction.find('.//CashCollections')
-    if collections_collection is not None:
-        for collection in collections_collection.findall('CashCollection'):
-            collection_data = {
-                "market_id": collection.get('MarketID'),
-                "kiosk_id": collection.get('KioskID'),
-                "collection_time": collection.get('CollectionTime'),
-                "amount": collection.get('Amount'),
-                "collected_by": collection.get('CollectedBy')
-            }
-            collections_data.append(collection_data)
+    for _, collection in iter_records(xml_data, "CashCollections", "CashCollection"):
+        collection_data = {
+            "market_id": collection.get('MarketID'),
+            "kiosk_id": collection.get('KioskID'),
+            "collection_time": collection.get('CollectionTime'),
+            "amount": collection.get('Amount'),
+            "collected_by": collection.get('CollectedBy')
+        }
+        collections_data.append(collection_data)
     
     return collections_data
 
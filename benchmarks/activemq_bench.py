@@ -0,0 +1,224 @@
+"""
+End-to-end benchmark for ActiveMQConsumer.
+
+Publishes messages at a target rate and payload size through a STOMP broker
+(by default the in-process stand-in in benchmarks/stomp_broker.py) into an
+ActiveMQConsumer, and reports messages per second and end-to-end latency
+(publish to handler completion). Handler work can be simulated with a
+latency distribution to see how workers, in-flight limits and batching
+affect throughput.
+
+Usage (from the repository root):
+    python -m benchmarks.activemq_bench --rate 2000 --messages 20000 --size 2048 --workers 8
+    python -m benchmarks.activemq_bench --rate 5000 --messages 50000 --batch-size 200 --handler-latency fixed:0.02
+    python -m benchmarks.activemq_bench --broker 127.0.0.1:61613 --mode virtual-topic   # real ActiveMQ
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import stomp
+
+from activemq_consumer import ActiveMQConsumer, parse_brokers
+from benchmarks.bench_ingest import _git_revision, save_results
+from benchmarks.seed_load_test import percentile
+from benchmarks.seed_stub_server import LatencyModel
+from benchmarks.stomp_broker import StompBroker
+
+SENT_HEADER = "bench-sent-ns"
+
+
+class ConsumerStats:
+    """Thread-safe record of handler completions and their end-to-end latency."""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.latencies = []
+        self.first_done = None
+        self.last_done = None
+        self._lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def record(self, headers_list):
+        now = time.time_ns()
+        with self._lock:
+            for headers in headers_list:
+                self.latencies.append((now - int(headers.get(SENT_HEADER, now))) / 1e9)
+            if self.first_done is None:
+                self.first_done = now
+            self.last_done = now
+            if len(self.latencies) >= self.expected:
+                self.finished.set()
+
+
+def _publish_destination(consumer):
+    """Where a producer has to send for this consumer to receive it."""
+    if consumer.consume_mode == "virtual-topic":
+        name = consumer.topic.rsplit("/", 1)[-1]
+        return f"/topic/{name if name.startswith('VirtualTopic.') else 'VirtualTopic.' + name}"
+    return consumer.destination
+
+
+def run_benchmark(options):
+    broker = None
+    if options.broker:
+        brokers = parse_brokers(options.broker)
+    else:
+        broker = StompBroker("127.0.0.1", 0).start()
+        brokers = [("127.0.0.1", broker.port)]
+
+    stats = ConsumerStats(options.messages)
+    handler_latency = LatencyModel(options.handler_latency, seed=options.seed)
+
+    def message_handler(headers, body):
+        delay = handler_latency.sample()
+        if delay:
+            time.sleep(delay)
+        stats.record([headers])
+
+    def batch_handler(batch):
+        delay = handler_latency.sample()
+        if delay:
+            time.sleep(delay)
+        stats.record([headers for headers, _ in batch])
+
+    run_id = uuid.uuid4().hex[:8]
+    consumer_options = dict(
+        brokers=brokers,
+        topic=f"bench.{run_id}" if not options.broker else options.topic,
+        client_id=f"bench-{run_id}",
+        subscription_name=f"bench-{run_id}",
+        consume_mode=options.mode,
+        workers=options.workers,
+        max_in_flight=options.max_in_flight,
+        ack_mode=options.ack_mode,
+        failure_destination="none",
+    )
+    if options.batch_size:
+        consumer = ActiveMQConsumer(batch_handler=batch_handler, batch_size=options.batch_size,
+                                    batch_timeout_ms=options.batch_timeout_ms, **consumer_options)
+    else:
+        consumer = ActiveMQConsumer(message_handler=message_handler, **consumer_options)
+    if not consumer.start(blocking=False):
+        raise SystemExit("Consumer failed to start")
+
+    producer = stomp.Connection10(host_and_ports=brokers)
+    producer.connect(wait=True)
+    destination = _publish_destination(consumer)
+    body = os.urandom(options.size // 2 + 1).hex()[:options.size]
+    interval = 1.0 / options.rate if options.rate > 0 else 0.0
+
+    try:
+        start_ns = time.time_ns()
+        start = time.perf_counter()
+        for i in range(options.messages):
+            due = start + i * interval
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            producer.send(destination=destination, body=body, headers={SENT_HEADER: str(time.time_ns())})
+        publish_elapsed = time.perf_counter() - start
+        completed = stats.finished.wait(options.timeout)
+    finally:
+        producer.disconnect()
+        consumer.stop(keep_durable_subscription=bool(options.broker))
+        if broker is not None:
+            # The stand-in handles each session's last frames after the client returns
+            if not broker.wait_closed():
+                logging.getLogger(__name__).warning("Stand-in broker sessions still open; acked may be incomplete")
+            broker_stats = broker.snapshot()
+            broker.stop()
+        else:
+            broker_stats = None
+
+    latencies = sorted(stats.latencies)
+    elapsed = (stats.last_done - start_ns) / 1e9 if stats.last_done else None
+    return {
+        "benchmark": "activemq_consumer",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "broker": options.broker or "stand-in",
+        "mode": options.mode,
+        "ack_mode": consumer.ack_mode,
+        "workers": options.workers,
+        "max_in_flight": consumer.max_in_flight,
+        "batch_size": options.batch_size,
+        "handler_latency": options.handler_latency,
+        "payload_bytes": options.size,
+        "target_rate": options.rate,
+        "published": options.messages,
+        "publish_rate": options.messages / publish_elapsed if publish_elapsed else None,
+        "completed": len(latencies),
+        "timed_out": not completed,
+        "elapsed_s": elapsed,
+        "throughput_mps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_s": {
+            "mean": statistics.fmean(latencies) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "dispatcher": dict(consumer.dispatcher.stats),
+        "broker_stats": broker_stats,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ActiveMQ consumer end-to-end benchmark")
+    parser.add_argument("--broker", default="",
+                        help="host:port of a real broker (default: in-process stand-in)")
+    parser.add_argument("--topic", default="bench.ActiveMQConsumer", help="Topic used with --broker")
+    parser.add_argument("--mode", choices=["durable", "queue", "virtual-topic"], default="durable")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Target publish rate (messages/s, 0 = flat out)")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--size", type=int, default=1024, help="Payload size in bytes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--ack-mode", default=None, choices=["auto", "client", "client-individual"])
+    parser.add_argument("--batch-size", type=int, default=0, help="Use a batch handler with this batch size")
+    parser.add_argument("--batch-timeout-ms", type=int, default=100)
+    parser.add_argument("--handler-latency", default="fixed:0",
+                        help="Simulated handler work per call: fixed:S, uniform:LOW,HIGH, exp:MEAN, ...")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for the consumer to finish")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Append the summary to this JSON-lines file")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    options = parser.parse_args(argv)
+
+    # The consumer logs every message at INFO; keep that out of the measurement
+    for name in ("activemq_consumer", "benchmarks.stomp_broker"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    summary = run_benchmark(options)
+    if options.output:
+        save_results([summary], options.output)
+    if options.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    latency = summary["latency_s"]
+
+    def fmt(value):
+        return f"{value * 1000:.1f}ms" if value is not None else "-"
+
+    print(f"broker={summary['broker']} mode={summary['mode']} ack={summary['ack_mode']} "
+          f"workers={summary['workers']} in_flight={summary['max_in_flight']} batch={summary['batch_size']} "
+          f"payload={summary['payload_bytes']}B")
+    print(f"published {summary['published']} at {summary['publish_rate']:.0f}/s; "
+          f"completed {summary['completed']}{' (timed out)' if summary['timed_out'] else ''} "
+          f"-> {summary['throughput_mps']:.0f} msg/s")
+    print(f"end-to-end latency mean {fmt(latency['mean'])} p50 {fmt(latency['p50'])} p90 {fmt(latency['p90'])} "
+          f"p99 {fmt(latency['p99'])} max {fmt(latency['max'])}")
+    print(f"dispatcher {summary['dispatcher']}")
+    if summary["broker_stats"]:
+        print(f"broker {summary['broker_stats']}")
+
+
+if __name__ == "__main__":
+    main()
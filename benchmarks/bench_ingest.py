@@ -0,0 +1,195 @@
+"""
+Scale-parameterized ingest benchmarks.
+
+Measures wall time and peak traced memory for the parsing, merging and
+building steps of the VDI pipeline on synthetic payloads, and appends the
+results to a JSON-lines file so runs can be compared over time.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_ingest
+    python -m benchmarks.bench_ingest --cases products,products-merge --scales 1000,100000
+    PARALLEL_PARSING_WORKERS=8 python -m benchmarks.bench_ingest --cases products,products-parallel \
+        --scales 100000 --markets 8
+    python -m benchmarks.bench_ingest --compare
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import utils
+from benchmarks.payload_generators import (
+    generate_markets_soap, generate_products_soap, generate_sales_json
+)
+from products_parallel import parse_products_parallel
+from sales_template import build_vdi_dataexchange_from_json
+
+DEFAULT_RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+DEFAULT_SCALES = [1, 100, 10_000]
+
+
+def _setup_markets(scale, options):
+    return generate_markets_soap(n_markets=scale, seed=options.seed)
+
+
+def _setup_products(scale, options):
+    return generate_products_soap(n_products=scale, n_markets=options.markets, seed=options.seed,
+                                  codes=options.codes, taxes=options.taxes, fees=options.fees)
+
+
+def _setup_products_merge(scale, options):
+    return utils.parse_seed_products_soap(_setup_products(scale, options))
+
+
+def _setup_sales_build(scale, options):
+    return generate_sales_json(n_sales=scale, seed=options.seed)
+
+
+# name -> (setup(scale, options) -> input, run(input), payload size(input) or None)
+CASES = {
+    "markets": (_setup_markets, utils.parse_seed_markets_soap, len),
+    "products": (_setup_products, utils.parse_seed_products_soap, len),
+    # Process pool with PARALLEL_PARSING_WORKERS workers (default: one per CPU)
+    "products-parallel": (_setup_products, parse_products_parallel, len),
+    "products-merge": (_setup_products_merge, utils.merge_products_data, None),
+    "sales-build": (_setup_sales_build,
+                    lambda data: build_vdi_dataexchange_from_json(data, "mms-sales"), None),
+}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(run, data, repeat=3, memory=True):
+    """
+    Time run(data) over `repeat` runs and, optionally, its peak traced memory.
+
+    Memory is measured in a separate run so tracemalloc overhead does not
+    distort the timings.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run(data)
+        timings.append(time.perf_counter() - start)
+
+    peak_bytes = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run(data)
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "peak_bytes": peak_bytes,
+    }
+
+
+def run_benchmarks(cases, scales, options):
+    """Run every case at every scale and return the result records."""
+    revision = _git_revision()
+    started = datetime.now(timezone.utc).isoformat()
+    results = []
+    for name in cases:
+        setup, run, size = CASES[name]
+        for scale in scales:
+            data = setup(scale, options)
+            record = {
+                "case": name,
+                "scale": scale,
+                "input_bytes": size(data) if size else None,
+                "repeat": options.repeat,
+                "revision": revision,
+                "started_at": started,
+                "python": platform.python_version(),
+                **measure(run, data, repeat=options.repeat, memory=not options.no_memory),
+            }
+            results.append(record)
+            peak = f"{record['peak_bytes'] / 2 ** 20:9.1f} MiB" if record["peak_bytes"] is not None else "        -"
+            print(f"{name:16s} {scale:>9,d}  min {record['min_s']:9.4f}s  "
+                  f"median {record['median_s']:9.4f}s  peak {peak}")
+            del data
+    return results
+
+
+def save_results(results, path):
+    with open(path, "a") as f:
+        for record in results:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(results, history):
+    """Print each result next to the most recent earlier run of the same case and scale."""
+    for record in results:
+        previous = [r for r in history if r["case"] == record["case"] and r["scale"] == record["scale"]]
+        if not previous:
+            continue
+        last = previous[-1]
+        change = (record["median_s"] - last["median_s"]) / last["median_s"] * 100 if last["median_s"] else 0.0
+        print(f"{record['case']:16s} {record['scale']:>9,d}  median {last['median_s']:.4f}s -> "
+              f"{record['median_s']:.4f}s ({change:+.1f}%) vs {last.get('revision') or 'unknown'}")
+
+
+def _range_arg(value):
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VDI ingest benchmarks")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated cases: " + ", ".join(CASES))
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Comma-separated scales (products, markets or sales per payload), up to 1000000")
+    parser.add_argument("--markets", type=int, default=1, help="Markets per products payload")
+    parser.add_argument("--codes", type=_range_arg, default=(1, 3), help="Barcodes per product, e.g. 1-3")
+    parser.add_argument("--taxes", type=_range_arg, default=(1, 2), help="Taxes per product, e.g. 1-2")
+    parser.add_argument("--fees", type=_range_arg, default=(1, 2), help="Fees per product, e.g. 1-2")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory run")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_FILE, help="JSON-lines results file to append to")
+    parser.add_argument("--compare", action="store_true", help="Compare with the previous run in --output")
+    options = parser.parse_args(argv)
+
+    cases = [c.strip() for c in options.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(unknown)}")
+    scales = [int(s) for s in options.scales.split(",") if s.strip()]
+
+    # Parsers write CSVs to data/ in dry-run mode; keep that out of the timings
+    utils.dry_run = False
+
+    history = load_results(options.output)
+    results = run_benchmarks(cases, scales, options)
+    save_results(results, options.output)
+    if options.compare:
+        compare(results, history)
+
+
+if __name__ == "__main__":
+    main()
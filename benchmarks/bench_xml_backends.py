@@ -0,0 +1,128 @@
+"""
+Compare the XML parser backends (xml_backend.py) on inbound VDI payloads.
+
+Runs each payload's registered parser (vdi_parsers.PARSERS, including the
+merge step) once per backend and reports wall time, peak traced memory and
+the lxml/etree speedup, so a deployment can pick XML_PARSER_BACKEND from
+numbers on its own payload sizes. Payloads come from a payload archive or
+directory of captured envelopes (see replay_payloads.py), or are generated
+at the given scales.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_xml_backends
+    python -m benchmarks.bench_xml_backends --types mms-products --scales 1000,100000 --markets 10
+    python -m benchmarks.bench_xml_backends --source data/archive --limit 20
+"""
+import argparse
+
+import utils
+import xml_backend
+from benchmarks.bench_ingest import DEFAULT_RESULTS_FILE, _git_revision, _range_arg, measure, save_results
+from benchmarks.payload_generators import (
+    generate_kiosks_soap, generate_markets_soap, generate_products_soap, generate_sales_soap
+)
+from benchmarks.replay_payloads import find_payloads
+from payload_archive import envelope_metadata
+from vdi_parsers import get_parser
+
+DEFAULT_SCALES = [100, 10_000]
+
+# VDIXMLType -> generate(scale, options) -> SOAP envelope
+GENERATORS = {
+    "mms-markets": lambda scale, options: generate_markets_soap(n_markets=scale, seed=options.seed),
+    "mms-products": lambda scale, options: generate_products_soap(
+        n_products=scale, n_markets=options.markets, seed=options.seed,
+        codes=options.codes, taxes=options.taxes, fees=options.fees),
+    "mms-sales": lambda scale, options: generate_sales_soap(n_sales=scale, seed=options.seed),
+    "mms-kiosks": lambda scale, options: generate_kiosks_soap(n_kiosks=scale, seed=options.seed),
+}
+
+
+def run_parser(vdi_type):
+    """Return a callable running vdi_type's parse and merge steps on an envelope."""
+    parser = get_parser(vdi_type)
+
+    def run(xml_str):
+        frames = parser.parse(xml_str)
+        return parser.merge(frames) if parser.merge is not None else frames
+    return run
+
+
+def inputs(options):
+    """Yield (name, vdi_type, envelope) for every payload to benchmark."""
+    if options.source:
+        for payload in find_payloads(options.source, limit=options.limit):
+            body = payload.load().decode("utf-8")
+            vdi_type = payload.vdi_type or envelope_metadata(body.encode("utf-8"))["vdi_type"]
+            if get_parser(vdi_type) is None or (options.types and vdi_type not in options.types):
+                continue
+            yield payload.name, vdi_type, body
+        return
+    for vdi_type in options.types or GENERATORS:
+        for scale in options.scales:
+            yield f"{vdi_type}x{scale}", vdi_type, GENERATORS[vdi_type](scale, options)
+
+
+def run_benchmarks(options):
+    revision = _git_revision()
+    results = []
+    for name, vdi_type, body in inputs(options):
+        run = run_parser(vdi_type)
+        timings = {}
+        for backend in options.backends:
+            xml_backend.use_backend(backend)
+            record = {
+                "case": f"xml-backend:{vdi_type}",
+                "payload": name,
+                "backend": backend,
+                "input_bytes": len(body),
+                "repeat": options.repeat,
+                "revision": revision,
+                **measure(run, body, repeat=options.repeat, memory=not options.no_memory),
+            }
+            results.append(record)
+            timings[backend] = record
+        line = f"{name:28s} {len(body) / 2 ** 20:9.2f} MiB"
+        for backend, record in timings.items():
+            peak = f"{record['peak_bytes'] / 2 ** 20:8.1f} MiB" if record["peak_bytes"] is not None else "       -"
+            line += f"  {backend} {record['median_s']:8.4f}s {peak}"
+        if "etree" in timings and "lxml" in timings and timings["lxml"]["median_s"]:
+            line += f"  lxml x{timings['etree']['median_s'] / timings['lxml']['median_s']:.2f}"
+        print(line)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare XML parser backends on VDI payloads")
+    parser.add_argument("--source", help="Payload archive, directory of envelopes or a single file "
+                                         "(default: generated payloads)")
+    parser.add_argument("--limit", type=int, help="Maximum payloads read from --source")
+    parser.add_argument("--types", default="", help="Comma-separated VDIXMLTypes (default: all)")
+    parser.add_argument("--backends", default=",".join(xml_backend.BACKENDS),
+                        help="Comma-separated backends: " + ", ".join(xml_backend.BACKENDS))
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Records per generated payload (products, sales, kiosks or markets)")
+    parser.add_argument("--markets", type=int, default=1, help="Markets per generated products payload")
+    parser.add_argument("--codes", type=_range_arg, default=(1, 3), help="Barcodes per product, e.g. 1-3")
+    parser.add_argument("--taxes", type=_range_arg, default=(1, 2), help="Taxes per product, e.g. 1-2")
+    parser.add_argument("--fees", type=_range_arg, default=(1, 2), help="Fees per product, e.g. 1-2")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory run")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_FILE, help="JSON-lines results file to append to")
+    options = parser.parse_args(argv)
+
+    options.types = [t.strip() for t in options.types.split(",") if t.strip()]
+    options.backends = [b.strip() for b in options.backends.split(",") if b.strip()]
+    options.scales = [int(s) for s in options.scales.split(",") if s.strip()]
+    unknown = [t for t in options.types if t not in GENERATORS and not options.source]
+    if unknown:
+        parser.error(f"No generator for: {', '.join(unknown)}")
+
+    # Parsers write CSVs to data/ in dry-run mode; keep that out of the timings
+    utils.dry_run = False
+    save_results(run_benchmarks(options), options.output)
+
+
+if __name__ == "__main__":
+    main()
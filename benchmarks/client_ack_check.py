@@ -0,0 +1,106 @@
+"""
+Regression check: cumulative "client" acks keep flowing past a failed message.
+
+Publishes one message whose handler always fails followed by --messages good
+ones through the in-process STOMP broker stand-in, to a consumer using
+ack_mode "client" with no failure destination. Every good message must be
+handled; before the fix the failed message's ack slot blocked all later
+acks and delivery stopped once max_in_flight messages were waiting.
+
+Usage (from the repository root):
+    python -m benchmarks.client_ack_check
+    python -m benchmarks.client_ack_check --ack-mode client-individual --batch-size 10
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+import uuid
+
+import stomp
+
+from activemq_consumer import ActiveMQConsumer
+from benchmarks.stomp_broker import StompBroker
+
+logger = logging.getLogger(__name__)
+
+POISON_HEADER = "check-poison"
+
+
+def run_check(messages=50, max_in_flight=8, ack_mode="client", batch_size=0, timeout=30.0):
+    """
+    Run the check against a fresh stand-in broker.
+
+    Returns:
+        (number of good messages handled, dispatcher stats)
+    """
+    broker = StompBroker("127.0.0.1", 0).start()
+    handled = set()
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def record(headers_list):
+        if any(headers.get(POISON_HEADER) for headers in headers_list):
+            raise ValueError("poison message")
+        with lock:
+            handled.update(headers["message-id"] for headers in headers_list)
+            if len(handled) >= messages:
+                done.set()
+
+    run_id = uuid.uuid4().hex[:8]
+    consumer_options = dict(
+        brokers=[("127.0.0.1", broker.port)],
+        topic=f"check.{run_id}",
+        client_id=f"check-{run_id}",
+        subscription_name=f"check-{run_id}",
+        workers=2,
+        max_in_flight=max_in_flight,
+        max_attempts=1,
+        ack_mode=ack_mode,
+        failure_destination="none",
+    )
+    if batch_size:
+        # A failing batch fails as a whole, so only the poison message goes in its own batch
+        consumer = ActiveMQConsumer(batch_handler=lambda batch: record([h for h, _ in batch]),
+                                    batch_size=batch_size, batch_timeout_ms=50, **consumer_options)
+    else:
+        consumer = ActiveMQConsumer(message_handler=lambda headers, body: record([headers]), **consumer_options)
+    if not consumer.start(blocking=False):
+        broker.stop()
+        raise SystemExit("Consumer failed to start")
+
+    producer = stomp.Connection10(host_and_ports=[("127.0.0.1", broker.port)])
+    producer.connect(wait=True)
+    try:
+        producer.send(destination=consumer.destination, body="poison", headers={POISON_HEADER: "1"})
+        if batch_size:
+            time.sleep(0.5)
+        for i in range(messages):
+            producer.send(destination=consumer.destination, body=f"message {i}")
+        done.wait(timeout)
+    finally:
+        producer.disconnect()
+        consumer.stop()
+        broker.stop()
+    return len(handled), dict(consumer.dispatcher.stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cumulative client ack regression check")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--ack-mode", default="client", choices=["client", "client-individual"])
+    parser.add_argument("--batch-size", type=int, default=0, help="Use a batch handler with this batch size")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    options = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    handled, stats = run_check(options.messages, options.max_in_flight, options.ack_mode,
+                               options.batch_size, options.timeout)
+    print(f"handled {handled}/{options.messages} good messages ({options.ack_mode}); dispatcher stats: {stats}")
+    return 0 if handled == options.messages else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
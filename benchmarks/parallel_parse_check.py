@@ -0,0 +1,76 @@
+"""
+Regression check: the parallel products parser matches the serial one.
+
+Generates an mms-products envelope whose Market and Product attributes
+contain ">" (legal in a quoted XML attribute value), parses it with
+products_parallel.parse_products_parallel and utils.parse_seed_products_soap,
+and exits 1 unless every frame is identical. Before the fix the range
+splitter ended a start tag at the first ">", so such payloads failed with
+"unclosed token" on the parallel path only.
+
+Usage (from the repository root):
+    python -m benchmarks.parallel_parse_check
+    python -m benchmarks.parallel_parse_check --products 5000 --markets 4 --task-bytes 4096
+"""
+import argparse
+import sys
+
+import utils
+from benchmarks.payload_generators import generate_products_soap
+from config import PARALLEL_PARSING
+from products_parallel import parse_products_parallel, reset_pool, split_products
+from utils import parse_seed_products_soap
+
+
+def _with_angle_brackets(envelope):
+    """Put a ">" into every market's and product's attributes (escaped, as in the VDIXML element)."""
+    return (envelope
+            .replace("CatalogSize=&quot;Full&quot;", "CatalogSize=&quot;Full&quot; Name=&quot;Snacks &gt; Drinks&quot;")
+            .replace("ProductName=&quot;", "ProductName=&quot;2 &gt; 1 "))
+
+
+def run_check(products=2000, markets=3, task_bytes=8192):
+    """
+    Compare both parsers on one generated payload.
+
+    Returns:
+        List of frame names that differ (empty when the parsers agree)
+    """
+    # A bare start tag with ">" in a value must split on its own, too
+    _, _, market_attribs, _ = split_products(
+        b'<VDITransaction><MarketsCollection><Market MarketID="m1" Name="Snacks > Drinks">'
+        b'</Market></MarketsCollection></VDITransaction>', task_bytes)
+    mismatched = [] if market_attribs == [{"MarketID": "m1", "Name": "Snacks > Drinks"}] else ["split_products"]
+
+    envelope = _with_angle_brackets(generate_products_soap(products, n_markets=markets))
+    PARALLEL_PARSING["task_bytes"] = task_bytes
+    try:
+        parallel = parse_products_parallel(envelope)
+    finally:
+        reset_pool()
+    serial = parse_seed_products_soap(envelope)
+    for name, df in serial.items():
+        other = parallel[name]
+        if list(df.columns) != list(other.columns) or df.astype(str).values.tolist() != other.astype(str).values.tolist():
+            mismatched.append(name)
+    return mismatched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel vs serial products parser check")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--markets", type=int, default=3)
+    parser.add_argument("--task-bytes", type=int, default=8192)
+    options = parser.parse_args(argv)
+    utils.dry_run = False
+
+    mismatched = run_check(options.products, options.markets, options.task_bytes)
+    if mismatched:
+        print(f"parallel and serial parsers differ in: {', '.join(mismatched)}")
+        return 1
+    print(f"parallel and serial parsers agree ({options.products} products, {options.markets} markets)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Synthetic SEED VDI payload generators for benchmarks.
+
+Each generator returns a complete SOAP envelope shaped like the samples in
+payloads/ (mms-markets, mms-products, mms-sales, mms-kiosks) at a
+configurable scale. Output is deterministic for a given seed.
+"""
+import io
+import random
+import uuid
+from xml.sax.saxutils import escape
+
+from sales_template import build_vdi_dataexchange_from_json
+from soap_helpers import wrap_in_soap
+
+SOAP_HEAD = """<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+	<s:Body>
+		<VDIDataExchange xmlns="urn:VDIDataExchangeService">
+			<VDIXMLVersion>1</VDIXMLVersion>
+			<VDIXMLType>{vdi_type}</VDIXMLType>
+			<ProviderID>{provider_id}</ProviderID>
+			<ApplicationID>SyncVdiMicromarkets.Uploader</ApplicationID>
+			<ApplicationVersion>240.0.7211.0</ApplicationVersion>
+			<TransactionID>{transaction_id}</TransactionID>
+			<TransactionTime>2025-11-14T18:34:10.7000000Z</TransactionTime>
+			<OperatorID>nm_swyft</OperatorID>
+			<CompressionType a:nil="true" xmlns:a="http://www.w3.org/2001/XMLSchema-instance"/>
+			<CompressionParam a:nil="true" xmlns:a="http://www.w3.org/2001/XMLSchema-instance"/>
+			<Encoding>utf-8</Encoding>
+			<VDIXML>"""
+
+SOAP_TAIL = """</VDIXML>
+			<UserData a:nil="true" xmlns:a="http://www.w3.org/2001/XMLSchema-instance"/>
+		</VDIDataExchange>
+	</s:Body>
+</s:Envelope>"""
+
+_ATTR_ENTITIES = {'"': "&quot;", "'": "&apos;"}
+
+CATEGORIES = ["Chips", "FLAVOURED MILK", "Soft Drinks", "Confectionery", "Sandwiches", "Fruit"]
+WORDS = ["SMITHS", "CRINKLE", "CHICKEN", "BARISTA", "BROS", "CHOCOLATE", "SALTED", "COLA",
+         "ORANGE", "ROLL", "HAM", "CHEESE", "LITE", "O'BRIEN", "NEW"]
+
+
+class _VDIXMLBuffer:
+    """Accumulates a VDITransaction and escapes it once for the VDIXML element."""
+
+    def __init__(self, vdi_type, provider_id, transaction_id):
+        self.vdi_type = vdi_type
+        self.provider_id = provider_id
+        self.transaction_id = transaction_id
+        self.inner = io.StringIO()
+        self.inner.write(
+            '<?xml version="1.0" encoding="utf-8"?><VDITransaction '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xmlns:xsd="http://www.w3.org/2001/XMLSchema" VDIXMLVersion="1" '
+            f'VDIXMLType="{vdi_type}" ProviderID="{provider_id}" '
+            'ApplicationID="SyncVdiMicromarkets.Uploader" ApplicationVersion="240.0.7211.0" '
+            f'OperatorID="nm_swyft" TransactionID="{transaction_id}" '
+            'TransactionTime="2025-11-14T18:34:10.7Z">'
+        )
+
+    def write(self, text):
+        self.inner.write(text)
+
+    def transaction(self):
+        """Close and return the plain VDITransaction XML."""
+        self.inner.write("</VDITransaction>")
+        return self.inner.getvalue()
+
+    def envelope(self):
+        """Close the VDITransaction and return it escaped inside a SOAP envelope."""
+        head = SOAP_HEAD.format(vdi_type=self.vdi_type, provider_id=self.provider_id,
+                                transaction_id=self.transaction_id)
+        return head + escape(self.transaction(), _ATTR_ENTITIES) + SOAP_TAIL
+
+
+def _attr(value):
+    return escape(str(value), _ATTR_ENTITIES)
+
+
+def _transaction_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_markets_soap(n_markets=10, seed=0):
+    """Generate an mms-markets envelope with n_markets markets."""
+    rng = random.Random(seed)
+    buf = _VDIXMLBuffer("mms-markets", "CANTALOUPE", _transaction_id(rng))
+    buf.write("<MarketsCollection>")
+    for market_id in range(1, n_markets + 1):
+        client_id = 1000 + rng.randint(0, max(1, n_markets // 4))
+        buf.write(
+            f'<Market MarketID="{market_id}" '
+            f'MarketName="{_attr(f"Location {market_id} - breakroom")}" '
+            f'MarketAddress="{_attr(f"{rng.randint(1, 999)} swyft st, swyft, GA, 30328")}" '
+            f'MarketLocation="Location {market_id}" ClientID="{client_id}" '
+            f'ClientName="{_attr(f"Customer {client_id}")}" />'
+        )
+    buf.write("</MarketsCollection>")
+    return buf.envelope()
+
+
+def generate_products_soap(n_products=1000, n_markets=1, codes=(1, 3), taxes=(1, 2), fees=(1, 2), seed=0):
+    """
+    Generate an mms-products envelope.
+
+    Args:
+        n_products: Total number of products, spread evenly over the markets
+        n_markets: Number of <Market> blocks
+        codes, taxes, fees: (min, max) number of barcodes, taxes and fees per product
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    buf = _VDIXMLBuffer("mms-products", "CANTALOUPE", _transaction_id(rng))
+    buf.write("<MarketsCollection>")
+    per_market, extra = divmod(n_products, max(1, n_markets))
+    product_id = 0
+    for market_index in range(max(1, n_markets)):
+        count = per_market + (1 if market_index < extra else 0)
+        buf.write(f'<Market MarketID="{market_index + 1}" CatalogSize="Full"><ProductsUpdate>')
+        for _ in range(count):
+            product_id += 1
+            name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4)))
+            buf.write(
+                f'<Product ProductID="{product_id}" ProductName="{_attr(name)} {rng.randint(10, 999)}G" '
+                f'Price="{rng.randint(50, 900) / 100:g}" Cost="{rng.randint(10, 500) / 1000:g}" '
+                f'ProductCode="{100000 + product_id}" Category="{_attr(rng.choice(CATEGORIES))}">'
+            )
+            buf.write("<Codes>")
+            for _ in range(rng.randint(*codes)):
+                buf.write(f"<Code>{rng.randint(10 ** 12, 10 ** 13 - 1)}</Code>")
+            buf.write("</Codes><Taxes>")
+            for tax_index in range(rng.randint(*taxes)):
+                rate = rng.choice([3, 5, 7, 10])
+                buf.write(f'<Tax ID="{300 + tax_index}" Name="{rate:.2f} % tax" '
+                          f'Rate="{rate / 100:.5f}" IncludedInPrice="{rng.randint(0, 1)}" />')
+            buf.write("</Taxes><Fees>")
+            for fee_index in range(rng.randint(*fees)):
+                value = rng.choice([0.1, 0.3, 0.5])
+                buf.write(f'<Fee ID="{3000 + fee_index}" Name="${value} bottle deposit" '
+                          f'Value="{value}" IsTaxable="{rng.choice(["true", "false"])}" />')
+            buf.write("</Fees></Product>")
+        buf.write("</ProductsUpdate></Market>")
+    buf.write("</MarketsCollection>")
+    return buf.envelope()
+
+
+def generate_sales_json(n_sales=100, items=(1, 4), taxes=(0, 2), seed=0):
+    """Generate a /send/sales JSON payload (as consumed by build_vdi_dataexchange_from_json)."""
+    rng = random.Random(seed)
+    sales = []
+    for sale_index in range(n_sales):
+        sale_items = []
+        for _ in range(rng.randint(*items)):
+            price = rng.randint(50, 900) / 100
+            quantity = rng.randint(1, 3)
+            item_taxes = [
+                {"Name": "Example Tax", "Rate": "0.07", "Value": round(price * 0.07, 2), "Count": quantity,
+                 "Total": round(price * 0.07 * quantity, 2)}
+                for _ in range(rng.randint(*taxes))
+            ]
+            item = {"ProductID": str(rng.randint(1, 5000)), "Code": str(rng.randint(100000, 999999)),
+                    "Quantity": quantity, "Price": price, "Cost": round(price / 3, 2),
+                    "Total": round(price * quantity, 2), "Fees": {"Total": "0.00"}}
+            if item_taxes:
+                item["Taxes"] = {"Tax": item_taxes}
+            sale_items.append(item)
+        total = round(sum(item["Total"] for item in sale_items), 2)
+        sales.append({
+            "MarketID": str(rng.randint(1, 50)),
+            "KioskID": f"{rng.randint(1, 50)}-K swyft",
+            "SaleID": _transaction_id(rng),
+            "SaleTime": "2025-11-18T09:32:26-04:00",
+            "Summary": {"Price": total, "Discount": "0.00", "Total": total,
+                        "Fees": {"Total": "0.00"}, "Taxes": {"Total": "0.00"}},
+            "Items": {"Item": sale_items},
+            "Tenders": {"Tender": [{"Type": rng.choice(["CARD", "CASH"]), "Amount": total}]},
+        })
+    return {"Sales": {"Sale": sales}, "transaction_id": _transaction_id(rng),
+            "transaction_time": "2025-11-18T07:04:06.4288410Z"}
+
+
+def generate_sales_soap(n_sales=100, items=(1, 4), taxes=(0, 2), seed=0):
+    """Generate an mms-sales envelope with n_sales sales."""
+    request_data = generate_sales_json(n_sales, items=items, taxes=taxes, seed=seed)
+    return wrap_in_soap(build_vdi_dataexchange_from_json(request_data, "mms-sales"))
+
+
+def _kiosks_buffer(n_kiosks, n_markets, seed):
+    rng = random.Random(seed)
+    n_markets = n_markets or max(1, n_kiosks // 5)
+    buf = _VDIXMLBuffer("mms-kiosks", "swyft", _transaction_id(rng))
+    buf.write("<KiosksCollection>")
+    for kiosk_index in range(n_kiosks):
+        market_id = rng.randint(1, n_markets)
+        buf.write(
+            f'<Kiosk MarketID="{market_id}" KioskID="{market_id}-K{kiosk_index}" '
+            f'KioskSN="PY{kiosk_index:06d}" LastSync="2025-11-18T07:04:06.4288410Z" '
+            'LastTransaction="2025-11-18T07:04:06.4288410Z" '
+            'CatalogVersion="2025-11-18T07:04:06.4288410Z" />'
+        )
+    buf.write("</KiosksCollection>")
+    return buf
+
+
+def generate_kiosks_transaction(n_kiosks=10, n_markets=None, seed=0):
+    """Generate a plain mms-kiosks VDITransaction (for building outbound VDIDataExchange)."""
+    return _kiosks_buffer(n_kiosks, n_markets, seed).transaction()
+
+
+def generate_kiosks_soap(n_kiosks=10, n_markets=None, seed=0):
+    """Generate an mms-kiosks envelope with n_kiosks kiosks."""
+    return _kiosks_buffer(n_kiosks, n_markets, seed).envelope()
+
+
+GENERATORS = {
+    "mms-markets": generate_markets_soap,
+    "mms-products": generate_products_soap,
+    "mms-sales": generate_sales_soap,
+    "mms-kiosks": generate_kiosks_soap,
+}
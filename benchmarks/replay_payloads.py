@@ -0,0 +1,427 @@
+"""
+Replay captured SEED envelopes through the /vdi/seed ingest path.
+
+Reads payloads from a payload archive (a directory with index.jsonl, see
+payload_archive.py) or a directory of .xml / .xml.gz / .xml.zst files and
+drives them at a controlled rate and concurrency, either in-process through
+ingest.process_vdi_payload ("inprocess" mode) or over HTTP against a running
+receiver ("http" mode). Reports throughput, latency percentiles and memory
+high-water marks, and can append the summary to a JSON-lines results file.
+
+Usage (from the repository root):
+    # In-process against a local warehouse stand-in, 5 payloads/s, 4 workers
+    python -m benchmarks.replay_payloads data/archive --rate 5 --concurrency 4
+
+    # Original arrival spacing, 10x faster, products only
+    python -m benchmarks.replay_payloads data/archive --speed 10 --vdi-type mms-products
+
+    # Against a running receiver, sampling its memory
+    python -m benchmarks.replay_payloads captures/ --mode http --url http://127.0.0.1:8080/vdi/seed \\
+        --server-pid $(pgrep -f "uvicorn main:app")
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import resource
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+
+import utils
+from benchmarks.bench_ingest import _git_revision, save_results
+from benchmarks.seed_load_test import percentile
+from benchmarks.seed_stub_server import LatencyModel
+from ingest import process_vdi_payload
+from vdi_parsers import APPEND_ONLY_TABLES, TABLE_KEYS
+from payload_archive import INDEX_FILE, PayloadArchive, envelope_metadata
+
+PAYLOAD_PATTERNS = ("*.xml", "*.xml.gz", "*.xml.zst")
+
+
+class Payload:
+    """A replayable payload; the body is read lazily so large archives are not held in memory."""
+
+    def __init__(self, name, load, received_at=None, vdi_type=None):
+        self.name = name
+        self.load = load
+        self.received_at = received_at
+        self.vdi_type = vdi_type
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".gz"):
+        return gzip.decompress(data)
+    if path.endswith(".zst"):
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def find_payloads(source, vdi_type=None, since=None, until=None, limit=None):
+    """
+    List payloads in an archive directory or a directory (or single file) of envelopes.
+
+    Args:
+        source: Archive directory, directory of envelopes or a single envelope file
+        vdi_type: Only include this VDIXMLType
+        since, until: ISO-8601 arrival time bounds (archives only)
+        limit: Maximum number of payloads
+    """
+    if os.path.isdir(source) and os.path.exists(os.path.join(source, INDEX_FILE)):
+        archive = PayloadArchive(source)
+        payloads = [
+            Payload(entry["sha256"][:12], lambda digest=entry["sha256"]: archive.read(digest),
+                    received_at=entry["received_at"], vdi_type=entry.get("vdi_type"))
+            for entry in archive.find(vdi_type=vdi_type, since=since, until=until)
+        ]
+    else:
+        if os.path.isdir(source):
+            paths = sorted({path for pattern in PAYLOAD_PATTERNS
+                            for path in glob.glob(os.path.join(source, "**", pattern), recursive=True)})
+        else:
+            paths = [source]
+        payloads = []
+        for path in paths:
+            payload = Payload(os.path.relpath(path, source) if os.path.isdir(source) else path,
+                              lambda path=path: _read_file(path))
+            if vdi_type is not None:
+                payload.vdi_type = envelope_metadata(payload.load())["vdi_type"]
+                if payload.vdi_type != vdi_type:
+                    continue
+            payloads.append(payload)
+    return payloads[:limit] if limit else payloads
+
+
+class LocalWarehouse:
+    """
+    In-memory stand-in for load_to_bigquery.
+
+    Applies the same insert-if-not-matched MERGE on the table's key columns
+    (append-only tables keep every row) and optionally sleeps for a sampled
+    load latency.
+    """
+
+    def __init__(self, latency="fixed:0"):
+        self.latency = LatencyModel(latency)
+        self._lock = threading.Lock()
+        self.keys = {}
+        self.rows_staged = Counter()
+        self.rows_inserted = Counter()
+
+    def load(self, table_name, df):
+        if df.empty:
+            return
+        time.sleep(self.latency.sample())
+        if table_name in APPEND_ONLY_TABLES:
+            with self._lock:
+                self.rows_staged[table_name] += len(df)
+                self.rows_inserted[table_name] += len(df)
+            return
+        columns = TABLE_KEYS[table_name]
+        incoming = set(df[columns].itertuples(index=False, name=None))
+        with self._lock:
+            existing = self.keys.setdefault(table_name, set())
+            new_keys = incoming - existing
+            existing |= new_keys
+            self.rows_staged[table_name] += len(df)
+            self.rows_inserted[table_name] += len(new_keys)
+
+    def load_chunks(self, table_name, chunks):
+        """Stage every chunk, then apply them as one MERGE (one sampled latency)."""
+        if table_name in APPEND_ONLY_TABLES:
+            for df in chunks:
+                self.load(table_name, df)
+            return
+        columns = TABLE_KEYS[table_name]
+        incoming, staged = set(), 0
+        for df in chunks:
+            incoming.update(df[columns].itertuples(index=False, name=None))
+            staged += len(df)
+        if not staged:
+            return
+        time.sleep(self.latency.sample())
+        with self._lock:
+            existing = self.keys.setdefault(table_name, set())
+            new_keys = incoming - existing
+            existing |= new_keys
+            self.rows_staged[table_name] += staged
+            self.rows_inserted[table_name] += len(new_keys)
+
+    def summary(self):
+        with self._lock:
+            return {"rows_staged": dict(self.rows_staged), "rows_inserted": dict(self.rows_inserted)}
+
+
+def _rss_kib(pid="self"):
+    """Return (VmRSS, VmHWM) in KiB for a process from /proc, or (None, None)."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    values[key] = int(value.split()[0])
+    except OSError:
+        return None, None
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+class MemorySampler:
+    """Samples a process's resident set size on a background thread and keeps the peak."""
+
+    def __init__(self, pid="self", interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.start_kib, _ = _rss_kib(pid)
+        self.peak_kib = self.start_kib
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss, _ = _rss_kib(self.pid)
+            if rss is not None and (self.peak_kib is None or rss > self.peak_kib):
+                self.peak_kib = rss
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        _, hwm = _rss_kib(self.pid)
+        return {"rss_start_kib": self.start_kib, "rss_peak_kib": self.peak_kib, "hwm_kib": hwm}
+
+
+class ReplayStats:
+    """Thread-safe accumulator for replay outcomes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.outcomes = Counter()
+        self.by_type = Counter()
+        self.bytes = 0
+        self.rows = 0
+        self.errors = []
+
+    def record(self, latency, size, outcome, vdi_type=None, rows=None, error=None):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes[str(outcome)] += 1
+            self.by_type[vdi_type or "unknown"] += 1
+            self.bytes += size
+            self.rows += rows or 0
+            if error is not None and len(self.errors) < 20:
+                self.errors.append(error)
+
+    def summary(self, elapsed):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                "payloads": len(latencies),
+                "elapsed_s": elapsed,
+                "throughput_per_s": len(latencies) / elapsed if elapsed else 0.0,
+                "mib_per_s": self.bytes / 2 ** 20 / elapsed if elapsed else 0.0,
+                "latency_s": {
+                    "p50": percentile(latencies, 50),
+                    "p90": percentile(latencies, 90),
+                    "p99": percentile(latencies, 99),
+                    "max": latencies[-1] if latencies else None,
+                },
+                "outcomes": dict(self.outcomes),
+                "by_type": dict(self.by_type),
+                "bytes": self.bytes,
+                "rows": self.rows,
+                "errors": list(self.errors),
+            }
+
+
+def _replay_inprocess(payload, loader, chunk_loader, stats):
+    body = payload.load()
+    start = time.perf_counter()
+    try:
+        result = process_vdi_payload(body.decode("utf-8"), loader, body_bytes=len(body),
+                                     chunk_loader=chunk_loader)
+        stats.record(time.perf_counter() - start, len(body), "ok", result["vdi_type"], result["rows"])
+    except Exception as e:
+        stats.record(time.perf_counter() - start, len(body), "error", payload.vdi_type,
+                     error=f"{payload.name}: {type(e).__name__}: {e}")
+
+
+def _replay_http(payload, session, options, stats):
+    body = payload.load()
+    data = gzip.compress(body) if options.gzip else body
+    headers = {"Content-Type": "text/xml; charset=utf-8"}
+    if options.gzip:
+        headers["Content-Encoding"] = "gzip"
+    start = time.perf_counter()
+    try:
+        response = session.post(options.url, data=data, headers=headers, timeout=options.timeout,
+                                auth=(options.user, options.password) if options.user else None)
+        stats.record(time.perf_counter() - start, len(body), response.status_code, payload.vdi_type,
+                     error=f"{payload.name}: HTTP {response.status_code}" if response.status_code >= 400 else None)
+    except Exception as e:
+        stats.record(time.perf_counter() - start, len(body), "error", payload.vdi_type,
+                     error=f"{payload.name}: {type(e).__name__}: {e}")
+
+
+def _arrival_offsets(payloads, speed):
+    """Seconds from the first arrival for each payload, divided by speed."""
+    times = [datetime.fromisoformat(p.received_at) if p.received_at else None for p in payloads]
+    if not times or any(t is None for t in times):
+        raise SystemExit("--speed needs an archive with arrival times")
+    first = min(times)
+    return [(t - first).total_seconds() / speed for t in times]
+
+
+def replay(payloads, options):
+    """Replay payloads according to options and return the summary dict."""
+    stats = ReplayStats()
+    warehouse = None
+    if options.mode == "inprocess":
+        if options.backend == "bigquery":
+            from gcp_utils import TABLES, load_chunks_to_bigquery, load_to_bigquery
+
+            def loader(table_name, df):
+                load_to_bigquery(TABLES.get(table_name), df)
+
+            def chunk_loader(table_name, chunks):
+                load_chunks_to_bigquery(TABLES.get(table_name), chunks)
+        elif options.backend == "local":
+            warehouse = LocalWarehouse(options.load_latency)
+            loader = warehouse.load
+            chunk_loader = warehouse.load_chunks
+        else:
+            def loader(table_name, df):
+                pass
+
+            def chunk_loader(table_name, chunks):
+                for _ in chunks:
+                    pass
+
+        def task(payload):
+            _replay_inprocess(payload, loader, chunk_loader, stats)
+    else:
+        import requests
+        session = requests.Session()
+
+        def task(payload):
+            _replay_http(payload, session, options, stats)
+
+    schedule = payloads * options.loops
+    if options.speed:
+        offsets = _arrival_offsets(payloads, options.speed)
+        span_s = (offsets[-1] if offsets else 0.0) + (1.0 / options.speed)
+        offsets = [offset + loop * span_s for loop in range(options.loops) for offset in offsets]
+    elif options.rate > 0:
+        offsets = [i / options.rate for i in range(len(schedule))]
+    else:
+        offsets = [0.0] * len(schedule)
+
+    sampler = MemorySampler()
+    server_sampler = MemorySampler(options.server_pid) if options.server_pid else None
+    with sampler, (server_sampler or nullcontext()):
+        with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+            start = time.perf_counter()
+            for payload, offset in zip(schedule, offsets):
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(task, payload)
+        elapsed = time.perf_counter() - start
+
+    summary = stats.summary(elapsed)
+    summary["memory"] = {
+        **sampler.summary(),
+        "ru_maxrss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if server_sampler is not None:
+        summary["server_memory"] = server_sampler.summary()
+    if warehouse is not None:
+        summary["warehouse"] = warehouse.summary()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured SEED envelopes through the ingest path")
+    parser.add_argument("source", help="Payload archive directory, directory of envelopes or a single file")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--backend", choices=["local", "bigquery", "none"], default="local",
+                        help="Where in-process replays load rows (local stand-in, BigQuery or discard)")
+    parser.add_argument("--load-latency", default="fixed:0",
+                        help="Simulated load latency for the local backend, e.g. lognormal:0,0.5")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/vdi/seed", help="Receiver URL for http mode")
+    parser.add_argument("--user", default=os.getenv("VDI_USER"), help="Basic auth user for http mode")
+    parser.add_argument("--password", default=os.getenv("VDI_PASS"), help="Basic auth password for http mode")
+    parser.add_argument("--gzip", action="store_true", help="Send bodies with Content-Encoding: gzip")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--server-pid", type=int, help="Sample this process's memory during http replays")
+    parser.add_argument("--rate", type=float, default=0.0, help="Payloads per second (0 = as fast as possible)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Follow archived arrival times, sped up by this factor (overrides --rate)")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--loops", type=int, default=1, help="Replay the payload set this many times")
+    parser.add_argument("--vdi-type", help="Only replay this VDIXMLType")
+    parser.add_argument("--since", help="Only archived payloads received at or after this ISO time")
+    parser.add_argument("--until", help="Only archived payloads received at or before this ISO time")
+    parser.add_argument("--limit", type=int, help="Maximum number of payloads")
+    parser.add_argument("--output", help="Append the summary to this JSON-lines file")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    options = parser.parse_args(argv)
+
+    payloads = find_payloads(options.source, options.vdi_type, options.since, options.until, options.limit)
+    if not payloads:
+        raise SystemExit(f"No payloads found in {options.source}")
+
+    # Parsers write CSVs to data/ in dry-run mode; keep that out of the replay
+    utils.dry_run = False
+
+    summary = replay(payloads, options)
+    summary.update({
+        "source": options.source, "mode": options.mode,
+        "backend": options.backend if options.mode == "inprocess" else None,
+        "rate": options.rate, "speed": options.speed, "concurrency": options.concurrency,
+        "loops": options.loops, "revision": _git_revision(), "started_at": datetime.now().isoformat(),
+    })
+    if options.output:
+        save_results([summary], options.output)
+
+    if options.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    def ms(value):
+        return f"{value * 1000:.1f}ms" if value is not None else "-"
+
+    latency, memory = summary["latency_s"], summary["memory"]
+    print(f"replayed {summary['payloads']} payloads ({summary['bytes'] / 2 ** 20:.1f} MiB) "
+          f"in {summary['elapsed_s']:.2f}s -> {summary['throughput_per_s']:.2f}/s, "
+          f"{summary['mib_per_s']:.2f} MiB/s")
+    print(f"latency p50 {ms(latency['p50'])} p90 {ms(latency['p90'])} p99 {ms(latency['p99'])} "
+          f"max {ms(latency['max'])}")
+    print(f"outcomes {summary['outcomes']} by type {summary['by_type']} rows {summary['rows']}")
+    print(f"memory rss start {memory['rss_start_kib']} KiB, peak {memory['rss_peak_kib']} KiB, "
+          f"high-water {memory['hwm_kib']} KiB")
+    if "server_memory" in summary:
+        server = summary["server_memory"]
+        print(f"server rss start {server['rss_start_kib']} KiB, peak {server['rss_peak_kib']} KiB, "
+              f"high-water {server['hwm_kib']} KiB")
+    if "warehouse" in summary:
+        print(f"warehouse {summary['warehouse']}")
+    for error in summary["errors"]:
+        print(f"error: {error}")
+
+
+if __name__ == "__main__":
+    main()
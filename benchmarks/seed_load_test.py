@@ -0,0 +1,232 @@
+"""
+Outbound load-test driver for the SEED send path.
+
+Pushes mms-sales and mms-kiosks messages at a target rate, either directly
+through seed_client ("client" mode) or through the Flask /send/sales
+endpoint ("http" mode), and reports throughput, latency percentiles, status
+codes and retry counts. Intended to run against the local SEED stand-in
+(benchmarks/seed_stub_server.py), never against Cantaloupe's environments:
+client mode refuses any --environment other than "local" unless
+--allow-remote is also given.
+
+Usage (from the repository root):
+    python -m benchmarks.seed_load_test --start-stub --stub-args="--latency exp:0.05 --error-rate 0.02" \\
+        --rate 50 --duration 30 --concurrency 16 --types sales,kiosks
+
+    # Flask app started with SEED_ENVIRONMENT=local
+    python -m benchmarks.seed_load_test --mode http --app-url http://127.0.0.1:5000 --rate 20 --duration 30
+"""
+import argparse
+import json
+import shlex
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from config import SEED_ENDPOINTS
+from seed_client import send_vdi_dataexchange
+from sales_template import build_vdi_dataexchange, build_vdi_dataexchange_from_json, escape_xml_for_cdata
+from benchmarks.payload_generators import generate_kiosks_transaction, generate_sales_json
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class LoadStats:
+    """Thread-safe accumulator for request outcomes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.statuses = Counter()
+        self.retries = Counter()
+        self.errors = Counter()
+
+    def record(self, latency, status):
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+
+    def record_retry(self, attempt, reason):
+        with self._lock:
+            self.retries[str(reason)] += 1
+
+    def record_error(self, latency, error):
+        with self._lock:
+            self.latencies.append(latency)
+            self.errors[type(error).__name__] += 1
+
+    def summary(self, elapsed):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            completed = len(latencies)
+            return {
+                "completed": completed,
+                "elapsed_s": elapsed,
+                "throughput_rps": completed / elapsed if elapsed else 0.0,
+                "latency_s": {
+                    "mean": statistics.fmean(latencies) if latencies else None,
+                    "p50": percentile(latencies, 50),
+                    "p90": percentile(latencies, 90),
+                    "p99": percentile(latencies, 99),
+                    "max": latencies[-1] if latencies else None,
+                },
+                "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+                "retries": dict(self.retries),
+                "retry_total": sum(self.retries.values()),
+                "errors": dict(self.errors),
+            }
+
+
+def build_messages(types, options):
+    """Pre-build one payload per message type so the run measures the send path."""
+    messages = {}
+    if "sales" in types:
+        sales_json = generate_sales_json(n_sales=options.sales_per_message, seed=options.seed)
+        messages["sales"] = {
+            "client": build_vdi_dataexchange_from_json(sales_json, "mms-sales", options.environment),
+            "http": sales_json,
+        }
+    if "kiosks" in types:
+        transaction = generate_kiosks_transaction(n_kiosks=options.kiosks_per_message, seed=options.seed)
+        messages["kiosks"] = {
+            "client": build_vdi_dataexchange("mms-kiosks", escape_xml_for_cdata(transaction)),
+            "http": None,
+        }
+    return messages
+
+
+def _send_client(message, options, stats):
+    start = time.perf_counter()
+    try:
+        status, _ = send_vdi_dataexchange(message["client"], environment=options.environment,
+                                          on_retry=stats.record_retry)
+        stats.record(time.perf_counter() - start, status)
+    except Exception as e:
+        stats.record_error(time.perf_counter() - start, e)
+
+
+def _send_http(message, options, stats, session):
+    start = time.perf_counter()
+    try:
+        response = session.post(f"{options.app_url.rstrip('/')}/send/sales", json=message["http"], timeout=60)
+        stats.record(time.perf_counter() - start, response.status_code)
+    except Exception as e:
+        stats.record_error(time.perf_counter() - start, e)
+
+
+def run_load(options):
+    """Issue requests on an open-loop schedule at options.rate and return the summary."""
+    types = [t.strip() for t in options.types.split(",") if t.strip()]
+    if options.mode == "http":
+        # The Flask service only exposes a JSON send endpoint for sales
+        types = [t for t in types if t == "sales"]
+    messages = build_messages(types, options)
+    if not messages:
+        raise SystemExit("No message types to send")
+
+    stats = LoadStats()
+    session = requests.Session()
+    total = options.requests or int(options.rate * options.duration)
+    interval = 1.0 / options.rate if options.rate > 0 else 0.0
+    order = [messages[t] for t in types if t in messages]
+
+    with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+        start = time.perf_counter()
+        for i in range(total):
+            due = start + i * interval
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            message = order[i % len(order)]
+            if options.mode == "client":
+                pool.submit(_send_client, message, options, stats)
+            else:
+                pool.submit(_send_http, message, options, stats, session)
+    elapsed = time.perf_counter() - start
+
+    summary = stats.summary(elapsed)
+    summary.update({"mode": options.mode, "types": types, "target_rps": options.rate,
+                    "requests": total, "concurrency": options.concurrency})
+    return summary
+
+
+def _stub_stats_url():
+    base = SEED_ENDPOINTS["local"].split("/", 3)
+    return f"{base[0]}//{base[2]}/stats"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SEED outbound load test")
+    parser.add_argument("--mode", choices=["client", "http"], default="client")
+    parser.add_argument("--environment", default="local", help="SEED_ENDPOINTS key used in client mode")
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="Allow an --environment other than local (sends load to a real SEED endpoint)")
+    parser.add_argument("--app-url", default="http://127.0.0.1:5000", help="Flask app URL for http mode")
+    parser.add_argument("--types", default="sales,kiosks", help="Comma-separated: sales, kiosks")
+    parser.add_argument("--rate", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sales-per-message", type=int, default=10)
+    parser.add_argument("--kiosks-per-message", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-stub", action="store_true", help="Run the SEED stand-in in this process")
+    parser.add_argument("--stub-args", default="", help="Arguments for the in-process stand-in")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    options = parser.parse_args(argv)
+
+    if options.environment != "local":
+        if not options.allow_remote:
+            parser.error(f"refusing to load-test SEED environment '{options.environment}'; "
+                         f"use --environment local, or pass --allow-remote to really send to it")
+        print(f"Warning: sending to SEED environment '{options.environment}' ({SEED_ENDPOINTS.get(options.environment)})")
+
+    stub = None
+    if options.start_stub:
+        from benchmarks.seed_stub_server import start_server
+        stub = start_server(shlex.split(options.stub_args), background=True)
+
+    try:
+        summary = run_load(options)
+        if options.environment == "local" or options.mode == "http":
+            try:
+                summary["stub"] = requests.get(_stub_stats_url(), timeout=5).json()
+            except (requests.RequestException, ValueError):
+                pass
+    finally:
+        if stub is not None:
+            stub.shutdown()
+            stub.server_close()
+
+    if options.json:
+        print(json.dumps(summary, indent=2))
+        return
+    latency = summary["latency_s"]
+
+    def fmt(value):
+        return f"{value * 1000:.1f}ms" if value is not None else "-"
+
+    print(f"mode={summary['mode']} types={','.join(summary['types'])} "
+          f"target={summary['target_rps']}/s concurrency={summary['concurrency']}")
+    print(f"completed {summary['completed']} in {summary['elapsed_s']:.2f}s "
+          f"-> {summary['throughput_rps']:.1f} req/s")
+    print(f"latency mean {fmt(latency['mean'])} p50 {fmt(latency['p50'])} p90 {fmt(latency['p90'])} "
+          f"p99 {fmt(latency['p99'])} max {fmt(latency['max'])}")
+    print(f"statuses {summary['statuses']} retries {summary['retry_total']} {summary['retries']} "
+          f"errors {summary['errors']}")
+    if "stub" in summary:
+        print(f"stand-in {summary['stub']}")
+
+
+if __name__ == "__main__":
+    main()
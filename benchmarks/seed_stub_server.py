@@ -0,0 +1,232 @@
+"""
+Local SEED SOAP stand-in for load tests.
+
+Accepts VDIDataExchange SOAP posts like the Cantaloupe SecureService.svc
+endpoints and answers with a VDIDataExchangeResponse, with configurable
+latency, error rate and throttling (with a Retry-After header). Point the
+client at it with SEED_ENVIRONMENT=local (see SEED_ENDPOINTS["local"]).
+
+Usage (from the repository root):
+    python -m benchmarks.seed_stub_server --port 8089 --latency lognormal:-3,0.5 --error-rate 0.01 \\
+        --throttle-rate 0.02 --retry-after 1
+
+GET /stats returns request counters as JSON; POST /stats/reset clears them.
+"""
+import argparse
+import base64
+import gzip
+import json
+import logging
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SUCCESS_RESPONSE = """<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+    <s:Body>
+        <VDIDataExchangeResponse xmlns="urn:VDIDataExchangeService">
+            <VDIDataExchangeResult>SUCCESS</VDIDataExchangeResult>
+        </VDIDataExchangeResponse>
+    </s:Body>
+</s:Envelope>"""
+
+FAULT_RESPONSE = """<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+    <s:Body>
+        <s:Fault>
+            <faultcode>s:Server</faultcode>
+            <faultstring>{message}</faultstring>
+        </s:Fault>
+    </s:Body>
+</s:Envelope>"""
+
+
+class LatencyModel:
+    """
+    Samples response latency in seconds from a spec string:
+
+        fixed:S | uniform:LOW,HIGH | exp:MEAN | lognormal:MU,SIGMA | normal:MEAN,STDDEV
+    """
+
+    def __init__(self, spec="fixed:0", seed=None):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        if self.kind not in ("fixed", "uniform", "exp", "lognormal", "normal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self):
+        with self._lock:
+            p = self.params
+            if self.kind == "fixed":
+                value = p[0] if p else 0.0
+            elif self.kind == "uniform":
+                value = self._rng.uniform(p[0], p[1])
+            elif self.kind == "exp":
+                value = self._rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+            elif self.kind == "lognormal":
+                value = self._rng.lognormvariate(p[0], p[1])
+            else:
+                value = self._rng.gauss(p[0], p[1])
+        return max(0.0, value) if math.isfinite(value) else 0.0
+
+
+class StubStats:
+    """Thread-safe request counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {"requests": 0, "success": 0, "errors": 0, "throttled": 0, "bytes_in": 0}
+            self.by_type = {}
+
+    def record(self, outcome, size, vdi_type):
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts[outcome] += 1
+            self.counts["bytes_in"] += size
+            if vdi_type:
+                self.by_type[vdi_type] = self.by_type.get(vdi_type, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.counts, "by_type": dict(self.by_type)}
+
+
+def _vdi_type(body):
+    start = body.find(b"<VDIXMLType>")
+    if start < 0:
+        return None
+    end = body.find(b"</VDIXMLType>", start)
+    return body[start + len(b"<VDIXMLType>"):end].decode("utf-8", "replace").strip() if end > 0 else None
+
+
+class SeedStubHandler(BaseHTTPRequestHandler):
+    server_version = "SeedStub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status, body, content_type="text/xml; charset=utf-8", headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send(200, json.dumps(self.server.stats.snapshot()), "application/json")
+        else:
+            self._send(404, "Not found", "text/plain")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if self.path.rstrip("/") == "/stats/reset":
+            self.server.stats.reset()
+            self._send(204, "")
+            return
+        if self.headers.get("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+
+        options = self.server.options
+        if options.username and self.headers.get("Authorization") != self.server.expected_auth:
+            self._send(401, FAULT_RESPONSE.format(message="Unauthorized"))
+            return
+
+        time.sleep(self.server.latency.sample())
+        vdi_type = _vdi_type(body)
+        roll = self.server.rng_random()
+        if roll < options.throttle_rate:
+            self.server.stats.record("throttled", len(body), vdi_type)
+            self._send(options.throttle_status, FAULT_RESPONSE.format(message="Server busy"),
+                       headers={"Retry-After": f"{options.retry_after:g}"})
+        elif roll < options.throttle_rate + options.error_rate:
+            self.server.stats.record("errors", len(body), vdi_type)
+            self._send(500, FAULT_RESPONSE.format(message="Simulated failure"))
+        else:
+            self.server.stats.record("success", len(body), vdi_type)
+            self._send(200, SUCCESS_RESPONSE)
+
+
+class SeedStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, options):
+        super().__init__((options.host, options.port), SeedStubHandler)
+        self.options = options
+        self.latency = LatencyModel(options.latency, seed=options.seed)
+        self.stats = StubStats()
+        rng = random.Random(options.seed)
+        lock = threading.Lock()
+
+        def rng_random():
+            with lock:
+                return rng.random()
+        self.rng_random = rng_random
+
+        self.expected_auth = None
+        if options.username:
+            token = base64.b64encode(f"{options.username}:{options.password}".encode()).decode()
+            self.expected_auth = f"Basic {token}"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Local SEED SOAP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0.05",
+                        help="fixed:S, uniform:LOW,HIGH, exp:MEAN, lognormal:MU,SIGMA or normal:MEAN,STDDEV")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with --throttle-status and Retry-After")
+    parser.add_argument("--throttle-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on throttled responses")
+    parser.add_argument("--username", default="", help="Require this Basic auth username")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
+
+def start_server(argv=None, background=False):
+    """Create the stub server; with background=True it is served from a daemon thread."""
+    options = build_parser().parse_args(argv)
+    server = SeedStubServer(options)
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    server = start_server(argv)
+    host, port = server.server_address[:2]
+    logger.info(f"SEED stand-in listening on http://{host}:{port}/VdiMicromarket/SecureService.svc "
+                f"(latency={server.options.latency}, error_rate={server.options.error_rate}, "
+                f"throttle_rate={server.options.throttle_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
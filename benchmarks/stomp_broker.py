@@ -0,0 +1,410 @@
+"""
+In-process STOMP broker stand-in for ActiveMQ consumer tests and benchmarks.
+
+Speaks enough STOMP 1.0 (and 1.1 without heartbeats) for ActiveMQConsumer
+and activemq_simple_test.py:
+
+- CONNECT / DISCONNECT with receipts
+- SEND to /topic/<name> and /queue/<name>
+- SUBSCRIBE with ack auto, client (cumulative) or client-individual, and
+  activemq.prefetchSize
+- Durable topic subscriptions keyed on client-id + activemq.subscriptionName;
+  messages published while the subscriber is away are kept and delivered on
+  reconnect
+- Shared queues with round-robin delivery, and ActiveMQ virtual topics
+  (/topic/VirtualTopic.X is copied to every /queue/Consumer.<group>.VirtualTopic.X)
+- Unacknowledged messages are redelivered (with redelivered:true) when the
+  consumer disconnects
+
+It keeps everything in memory and does no authentication. It is not a
+substitute for ActiveMQ, only for running the consumer without one.
+
+Usage (from the repository root):
+    python -m benchmarks.stomp_broker --port 61613
+"""
+import argparse
+import itertools
+import logging
+import queue
+import socketserver
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+VIRTUAL_TOPIC_PREFIX = "/topic/VirtualTopic."
+# Headers the broker sets itself on MESSAGE frames
+BROKER_HEADERS = ("message-id", "destination", "timestamp", "subscription", "redelivered", "content-length")
+
+
+def parse_frames(buffer: bytearray):
+    """
+    Pop complete frames off the front of buffer.
+
+    Returns a list of (command, headers, body bytes). Incomplete trailing data
+    stays in the buffer.
+    """
+    frames = []
+    while True:
+        # Skip heart-beat EOLs between frames
+        start = 0
+        while start < len(buffer) and buffer[start] in (0x0A, 0x0D):
+            start += 1
+        del buffer[:start]
+        header_end = buffer.find(b"\n\n")
+        if header_end < 0:
+            return frames
+        lines = buffer[:header_end].decode("utf-8").replace("\r", "").split("\n")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers.setdefault(name, value)
+        body_start = header_end + 2
+        if "content-length" in headers:
+            body_end = body_start + int(headers["content-length"])
+            if len(buffer) <= body_end:
+                return frames
+        else:
+            body_end = buffer.find(b"\x00", body_start)
+            if body_end < 0:
+                return frames
+        frames.append((lines[0], headers, bytes(buffer[body_start:body_end])))
+        del buffer[:body_end + 1]
+
+
+def encode_frame(command: str, headers: dict, body: bytes = b""):
+    head = "".join(f"{name}:{value}\n" for name, value in headers.items())
+    return f"{command}\n{head}\n".encode("utf-8") + body + b"\x00"
+
+
+class Message:
+    __slots__ = ("message_id", "destination", "headers", "body", "redelivered")
+
+    def __init__(self, message_id, destination, headers, body):
+        self.message_id = message_id
+        self.destination = destination
+        self.headers = headers
+        self.body = body
+        self.redelivered = False
+
+
+class Store:
+    """
+    Message backlog for one destination (queue) or one subscription
+    (topic, durable subscription), delivered round-robin to its consumers.
+    """
+
+    def __init__(self, name, durable=False):
+        self.name = name
+        self.durable = durable
+        self.backlog = deque()
+        self.consumers = []
+        self._next = 0
+
+    def pump(self):
+        """Deliver backlog messages to consumers with prefetch capacity. Call with the broker lock held."""
+        while self.backlog and self.consumers:
+            for offset in range(len(self.consumers)):
+                consumer = self.consumers[(self._next + offset) % len(self.consumers)]
+                if consumer.has_capacity():
+                    self._next = (self._next + offset + 1) % len(self.consumers)
+                    consumer.deliver(self.backlog.popleft())
+                    break
+            else:
+                return
+
+
+class Subscription:
+    """One SUBSCRIBE on a session, reading from a Store."""
+
+    def __init__(self, session, sub_id, store, ack, prefetch):
+        self.session = session
+        self.sub_id = sub_id
+        self.store = store
+        self.ack = ack
+        self.prefetch = prefetch
+        self.unacked = OrderedDict()
+
+    def has_capacity(self):
+        return self.ack == "auto" or self.prefetch <= 0 or len(self.unacked) < self.prefetch
+
+    def deliver(self, message):
+        headers = {
+            **message.headers,
+            "destination": message.destination,
+            "message-id": message.message_id,
+            "subscription": self.sub_id,
+        }
+        if message.redelivered:
+            headers["redelivered"] = "true"
+        if self.ack != "auto":
+            self.unacked[message.message_id] = message
+        self.session.broker.stats["delivered"] += 1
+        self.session.send("MESSAGE", headers, message.body)
+
+    def acknowledge(self, message_id):
+        """Acknowledge one message (client-individual) or everything up to it (client)."""
+        if message_id not in self.unacked:
+            return False
+        if self.ack == "client":
+            while self.unacked:
+                first_id, _ = self.unacked.popitem(last=False)
+                self.session.broker.stats["acked"] += 1
+                if first_id == message_id:
+                    break
+        else:
+            del self.unacked[message_id]
+            self.session.broker.stats["acked"] += 1
+        return True
+
+    def release(self):
+        """Return unacknowledged messages to the front of the store for redelivery."""
+        for message in reversed(self.unacked.values()):
+            message.redelivered = True
+            self.store.backlog.appendleft(message)
+            self.session.broker.stats["redelivered"] += 1
+        self.unacked.clear()
+
+
+class StompSession(socketserver.BaseRequestHandler):
+    """One client connection. Outgoing frames go through a writer thread so the broker lock never waits on a socket."""
+
+    def setup(self):
+        self.broker = self.server
+        self.broker.attach(self)
+        self.client_id = None
+        self.version = "1.0"
+        self.subscriptions = {}
+        self._outbox = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def send(self, command, headers, body=b""):
+        self._outbox.put(encode_frame(command, headers, body))
+
+    def _write_loop(self):
+        while True:
+            data = self._outbox.get()
+            if data is None:
+                return
+            try:
+                self.request.sendall(data)
+            except OSError:
+                return
+
+    def handle(self):
+        buffer = bytearray()
+        while True:
+            try:
+                chunk = self.request.recv(65536)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buffer.extend(chunk)
+            for command, headers, body in parse_frames(buffer):
+                if not self._on_frame(command, headers, body):
+                    return
+
+    def finish(self):
+        self.broker.detach(self)
+        self._outbox.put(None)
+        self._writer.join(timeout=5)
+
+    def _on_frame(self, command, headers, body):
+        """Handle one frame; returns False once the session should close."""
+        if command in ("CONNECT", "STOMP"):
+            self.client_id = headers.get("client-id")
+            connected = {"session": f"stub-session-{id(self)}"}
+            if "1.1" in headers.get("accept-version", "").split(","):
+                self.version = "1.1"
+                connected.update({"version": "1.1", "heart-beat": "0,0"})
+            self.send("CONNECTED", connected)
+        elif command == "SEND":
+            self.broker.publish(headers, body)
+        elif command == "SUBSCRIBE":
+            error = self.broker.subscribe(self, headers)
+            if error:
+                self.send("ERROR", {"message": error})
+        elif command == "UNSUBSCRIBE":
+            self.broker.unsubscribe(self, headers.get("id") or headers.get("destination"))
+        elif command == "ACK":
+            self.broker.acknowledge(self, headers.get("message-id") or headers.get("id"))
+        elif command == "DISCONNECT":
+            if "receipt" in headers:
+                self.send("RECEIPT", {"receipt-id": headers["receipt"]})
+            return False
+        elif command not in ("BEGIN", "COMMIT", "ABORT", "NACK"):
+            self.send("ERROR", {"message": f"Unsupported command {command}"})
+        if "receipt" in headers:
+            self.send("RECEIPT", {"receipt-id": headers["receipt"]})
+        return True
+
+
+class StompBroker(socketserver.ThreadingTCPServer):
+    """
+    The broker: destinations, durable subscriptions and the TCP listener.
+
+    Args:
+        host, port: Listen address (port 0 picks a free port)
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=61613):
+        super().__init__((host, port), StompSession)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.queues = {}
+        self.durables = {}
+        self.topic_subscriptions = {}
+        self.stats = Counter()
+        # Open client sessions; notified as they close
+        self.sessions = set()
+        self._sessions_changed = threading.Condition(self._lock)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve from a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, name="stomp-broker", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def _queue(self, destination):
+        store = self.queues.get(destination)
+        if store is None:
+            store = self.queues[destination] = Store(destination, durable=True)
+        return store
+
+    def publish(self, headers, body):
+        destination = headers.get("destination", "")
+        user_headers = {k: v for k, v in headers.items() if k not in BROKER_HEADERS and k != "receipt"}
+        user_headers.setdefault("timestamp", str(int(time.time() * 1000)))
+        with self._lock:
+            self.stats["published"] += 1
+            if destination.startswith("/queue/"):
+                targets = [self._queue(destination)]
+            else:
+                targets = list(self.topic_subscriptions.get(destination, ()))
+                targets += [store for (_, _, topic), store in self.durables.items() if topic == destination]
+                if destination.startswith(VIRTUAL_TOPIC_PREFIX):
+                    suffix = "." + destination[len("/topic/"):]
+                    targets += [store for name, store in self.queues.items()
+                                if name.startswith("/queue/Consumer.") and name.endswith(suffix)]
+            for store in targets:
+                message_id = f"ID:stub-broker-{next(self._ids)}"
+                store.backlog.append(Message(message_id, destination, dict(user_headers), body))
+                store.pump()
+
+    def subscribe(self, session, headers):
+        destination = headers.get("destination", "")
+        sub_id = headers.get("id") or destination
+        ack = headers.get("ack", "auto")
+        prefetch = int(headers.get("activemq.prefetchSize", "0") or 0)
+        durable_name = headers.get("activemq.subscriptionName") or headers.get("activemq.durableSubscriptionName")
+        with self._lock:
+            if destination.startswith("/queue/"):
+                store = self._queue(destination)
+            elif durable_name:
+                if not session.client_id:
+                    return "Durable subscriptions require a client-id"
+                key = (session.client_id, durable_name, destination)
+                store = self.durables.get(key)
+                if store is None:
+                    store = self.durables[key] = Store(f"{destination} ({durable_name})", durable=True)
+                if store.consumers:
+                    return f"Durable subscription {durable_name} already has an active consumer"
+            else:
+                store = Store(destination)
+                self.topic_subscriptions.setdefault(destination, set()).add(store)
+            subscription = Subscription(session, sub_id, store, ack, prefetch)
+            session.subscriptions[sub_id] = subscription
+            store.consumers.append(subscription)
+            store.pump()
+        return None
+
+    def _remove(self, subscription):
+        store = subscription.store
+        subscription.release()
+        store.consumers.remove(subscription)
+        if not store.durable:
+            # Non-durable topic stores are named after their topic
+            self.topic_subscriptions.get(store.name, set()).discard(store)
+        store.pump()
+
+    def unsubscribe(self, session, sub_id):
+        with self._lock:
+            subscription = session.subscriptions.pop(sub_id, None)
+            if subscription is not None:
+                self._remove(subscription)
+
+    def acknowledge(self, session, message_id):
+        with self._lock:
+            for subscription in session.subscriptions.values():
+                if subscription.acknowledge(message_id):
+                    subscription.store.pump()
+                    return
+
+    def attach(self, session):
+        with self._lock:
+            self.sessions.add(session)
+
+    def detach(self, session):
+        """Session closed: requeue its unacknowledged messages and drop its subscriptions."""
+        with self._lock:
+            for subscription in session.subscriptions.values():
+                self._remove(subscription)
+            session.subscriptions.clear()
+            self.sessions.discard(session)
+            self._sessions_changed.notify_all()
+
+    def wait_closed(self, timeout=10.0):
+        """
+        Wait until every client session has closed, so the frames they sent
+        before disconnecting (e.g. the last ACKs) are counted in stats.
+
+        Returns:
+            True if no session is left open
+        """
+        with self._lock:
+            return self._sessions_changed.wait_for(lambda: not self.sessions, timeout)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "queues": {name: len(store.backlog) for name, store in self.queues.items()},
+                "durable_subscriptions": {f"{client}/{name}": len(store.backlog)
+                                          for (client, name, _), store in self.durables.items()},
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-process STOMP broker stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=61613)
+    options = parser.parse_args(argv)
+
+    broker = StompBroker(options.host, options.port)
+    logger.info(f"STOMP stand-in listening on {options.host}:{broker.port}")
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        logger.info(f"Shutting down ({broker.snapshot()})")
+    finally:
+        broker.server_close()
+
+
+if __name__ == "__main__":
+    main()
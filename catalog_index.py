@@ -0,0 +1,356 @@
+"""
+In-process product catalog index for barcode and ProductID lookups.
+
+Every loaded mms-products message also feeds the index, so the kiosk-facing
+lookup endpoints in main.py answer from memory instead of querying BigQuery.
+The index is built from the parsed product, code, tax and fee frames (see
+ingest.process_vdi_payload), not the merged vdi_products rows, whose inner
+joins drop products without a barcode, tax or fee. Each product is stored
+once per market with its barcodes, taxes and fees, and is reachable by
+(MarketID, ProductID) and by (MarketID, Code).
+
+An mms-products message replaces the catalogs of the markets it carries.
+The new index is built beside the current one and swapped in with a single
+reference assignment, so readers never see a half-loaded market. After each
+swap a background thread writes a zstd-compressed JSON snapshot when
+CATALOG_INDEX["snapshot_path"] is set. The index is reloaded from it on
+startup, so point it at a persistent volume to keep it across restarts.
+
+A message is grouped per product before it is swapped in, which holds about
+2 KiB per product for the whole load, even when the load itself is chunked.
+Messages with more than CATALOG_INDEX["max_products"] products are therefore
+not indexed; their markets keep the catalogs they had.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+import zstandard
+
+from config import CATALOG_INDEX
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Entries hold tuples in these field orders; lookups return them as dicts
+PRODUCT_FIELDS = ("ProductID", "ProductName", "Price", "Cost", "ProductCode", "Category")
+TAX_FIELDS = ("TaxID", "TaxName", "TaxRate", "IncludedInPrice")
+FEE_FIELDS = ("FeeID", "FeeName", "FeeValue", "IsTaxable")
+
+
+class MarketCatalog:
+    """
+    One market's products: ProductID -> (product, codes, taxes, fees) tuples, plus a barcode map.
+
+    Args:
+        transaction_id: TransactionID of the mms-products message it came from
+        loaded_at: ISO-8601 time the message was loaded
+        products: {ProductID: (product fields, codes, taxes, fees)}
+    """
+
+    __slots__ = ("transaction_id", "loaded_at", "products", "codes")
+
+    def __init__(self, transaction_id, loaded_at, products):
+        self.transaction_id = transaction_id
+        self.loaded_at = loaded_at
+        self.products = products
+        # A barcode shared by two products resolves to the later one
+        self.codes = {code: product_id for product_id, entry in products.items() for code in entry[1]}
+
+
+class CatalogIndex:
+    """Immutable snapshot of every indexed market; replaced, never modified, on each load."""
+
+    def __init__(self, markets=None):
+        self.markets = markets or {}
+
+    def product(self, market_id: str, product_id: str):
+        """Return the product as a dict, or None."""
+        market = self.markets.get(market_id)
+        if market is None:
+            return None
+        entry = market.products.get(product_id)
+        return _product_dict(market_id, market, entry) if entry is not None else None
+
+    def by_code(self, market_id: str, code: str):
+        """Return the product carrying barcode code in market_id as a dict, or None."""
+        market = self.markets.get(market_id)
+        if market is None:
+            return None
+        product_id = market.codes.get(code)
+        return self.product(market_id, product_id) if product_id is not None else None
+
+    def stats(self):
+        return {
+            "markets": len(self.markets),
+            "products": sum(len(m.products) for m in self.markets.values()),
+            "codes": sum(len(m.codes) for m in self.markets.values()),
+            "market_transactions": {market_id: {"transaction_id": m.transaction_id, "loaded_at": m.loaded_at}
+                                    for market_id, m in self.markets.items()},
+        }
+
+
+def _product_dict(market_id, market, entry):
+    product, codes, taxes, fees = entry
+    return {
+        "MarketID": market_id,
+        "TransactionID": market.transaction_id,
+        **dict(zip(PRODUCT_FIELDS, product)),
+        "Codes": list(codes),
+        "Taxes": [dict(zip(TAX_FIELDS, tax)) for tax in taxes],
+        "Fees": [dict(zip(FEE_FIELDS, fee)) for fee in fees],
+    }
+
+
+def _records(df, columns):
+    """Distinct rows of df[columns] as tuples of Python values (None where missing)."""
+    df = df.reindex(columns=list(columns)).drop_duplicates()
+    df = df.astype(object).where(df.notna(), None)
+    return zip(*(df[column].tolist() for column in columns))
+
+
+class CatalogBuilder:
+    """
+    Groups parsed mms-products frames per product into MarketCatalogs.
+
+    Built from the per-product frames parse_seed_products_soap returns, not
+    the merged vdi_products rows, so products without a barcode, tax or fee
+    are indexed too. A message parsed in chunks is added chunk by chunk.
+
+    Args:
+        loaded_at: Load time recorded on each market (defaults to now, UTC)
+        max_products: Stop indexing the message, dropping what was added,
+            once it has more than this many products (None or 0: no limit)
+    """
+
+    def __init__(self, loaded_at=None, max_products=None):
+        self.loaded_at = loaded_at
+        self.max_products = max_products
+        # Set once the message has exceeded max_products; markets() is then empty
+        self.skipped = False
+        # MarketID -> TransactionID, and (MarketID, ProductID) -> [product, codes, taxes, fees];
+        # codes, taxes and fees are dicts so they keep first-seen order without repeats
+        self._transactions = {}
+        self._entries = {}
+
+    def add(self, data):
+        """
+        Add one parse result.
+
+        Args:
+            data: dict with the products, product_codes, product_taxes and
+                product_fees DataFrames, as parse_seed_products_soap returns
+        """
+        entries = self._entries
+        products = data["products"]
+        if self.skipped or products.empty:
+            return
+        for market_id, transaction_id, *product in _records(products, ("MarketID", "TransactionID") + PRODUCT_FIELDS):
+            self._transactions.setdefault(market_id, transaction_id)
+            entries.setdefault((market_id, product[0]), [tuple(product), {}, {}, {}])
+        if self.max_products and len(entries) > self.max_products:
+            logger.warning("Catalog index: message has more than %d products; not indexing it "
+                           "(its markets keep their previous catalogs)", self.max_products)
+            self.skipped = True
+            self._transactions.clear()
+            entries.clear()
+            return
+        # Codes, taxes and fees are grouped under their product; any without one are ignored
+        for market_id, product_id, code in _records(data["product_codes"], ("MarketID", "ProductID", "Code")):
+            entry = entries.get((market_id, product_id))
+            if entry is not None and code:
+                entry[1][code] = None
+        for market_id, product_id, *tax in _records(data["product_taxes"], ("MarketID", "ProductID") + TAX_FIELDS):
+            entry = entries.get((market_id, product_id))
+            if entry is not None:
+                entry[2][tuple(tax)] = None
+        for market_id, product_id, *fee in _records(data["product_fees"], ("MarketID", "ProductID") + FEE_FIELDS):
+            entry = entries.get((market_id, product_id))
+            if entry is not None:
+                entry[3][tuple(fee)] = None
+
+    def markets(self):
+        """Return {MarketID: MarketCatalog} for the markets added so far."""
+        loaded_at = self.loaded_at or datetime.now(timezone.utc).isoformat()
+        products = {market_id: {} for market_id in self._transactions}
+        for (market_id, product_id), (product, codes, taxes, fees) in self._entries.items():
+            products[market_id][product_id] = (product, tuple(codes), tuple(taxes), tuple(fees))
+        return {market_id: MarketCatalog(transaction_id, loaded_at, products[market_id])
+                for market_id, transaction_id in self._transactions.items()}
+
+
+def build_markets(parsed, loaded_at=None, max_products=None):
+    """
+    Build MarketCatalogs from parsed mms-products data.
+
+    Args:
+        parsed: Iterable of parse_seed_products_soap results; a market may
+            span several of them
+        loaded_at: Load time recorded on each market (defaults to now, UTC)
+        max_products: Product limit, as for CatalogBuilder
+
+    Returns:
+        {MarketID: MarketCatalog} for the markets present (empty when over
+        max_products)
+    """
+    builder = CatalogBuilder(loaded_at, max_products)
+    for data in parsed:
+        builder.add(data)
+    return builder.markets()
+
+
+class CatalogStore:
+    """
+    Holds the current CatalogIndex, swaps in updates and snapshots it to disk.
+
+    Args:
+        snapshot_path: zstd JSON snapshot file (None disables snapshots)
+        level: zstd compression level
+        max_products: Messages with more products are not indexed (None or 0: no limit)
+    """
+
+    def __init__(self, snapshot_path=None, level=10, max_products=None):
+        self.snapshot_path = snapshot_path
+        self.level = level
+        self.max_products = max_products
+        self.index = CatalogIndex()
+        self._update_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = False
+        self._closing = False
+        self._thread = None
+
+    # ---------- updates ----------
+    def builder(self):
+        """Return a CatalogBuilder for one message; commit() it once the message has loaded."""
+        return CatalogBuilder(max_products=self.max_products)
+
+    def update(self, parsed):
+        """Index parsed mms-products data, replacing the markets it carries, and return the new index."""
+        return self.commit(build_markets(parsed, max_products=self.max_products))
+
+    def commit(self, built):
+        """
+        Swap in the markets of a CatalogBuilder (or a {MarketID: MarketCatalog} dict).
+
+        Returns:
+            The new CatalogIndex
+        """
+        if isinstance(built, CatalogBuilder):
+            built = built.markets()
+        if not built:
+            return self.index
+        with self._update_lock:
+            markets = dict(self.index.markets)
+            markets.update(built)
+            # Readers hold on to whichever index they started with
+            self.index = CatalogIndex(markets)
+        logger.info("Catalog index: replaced %d market(s)", len(built))
+        if self.snapshot_path:
+            self._ensure_started()
+            self._pending = True
+            self._wake.set()
+        return self.index
+
+    # ---------- snapshots ----------
+    def save_snapshot(self, path=None):
+        """Write the current index to path (default: snapshot_path) atomically."""
+        path = path or self.snapshot_path
+        index = self.index
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+            "markets": {
+                market_id: {
+                    "transaction_id": market.transaction_id,
+                    "loaded_at": market.loaded_at,
+                    "products": list(market.products.values()),
+                }
+                for market_id, market in index.markets.items()
+            },
+        }
+        body = zstandard.ZstdCompressor(level=self.level).compress(
+            json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        return len(body)
+
+    def load_snapshot(self, path=None):
+        """
+        Replace the index with the snapshot at path (default: snapshot_path).
+
+        Returns:
+            True if a snapshot was loaded; a missing or unreadable one leaves
+            the index as it is
+        """
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(zstandard.ZstdDecompressor().decompress(f.read()))
+            if data.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported snapshot version {data.get('version')!r}")
+            markets = {
+                market_id: MarketCatalog(market["transaction_id"], market["loaded_at"], {
+                    product[0]: (tuple(product), tuple(codes), tuple(map(tuple, taxes)), tuple(map(tuple, fees)))
+                    for product, codes, taxes, fees in market["products"]
+                })
+                for market_id, market in data["markets"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, zstandard.ZstdError):
+            logger.exception("Could not load catalog snapshot %s", path)
+            return False
+        with self._update_lock:
+            self.index = CatalogIndex(markets)
+        logger.info("Catalog index: loaded %d market(s) from %s", len(markets), path)
+        return True
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._update_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="catalog-snapshot", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        # Snapshots coalesce: loads arriving during a write are covered by the next one
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._pending:
+                self._pending = False
+                try:
+                    size = self.save_snapshot()
+                    logger.debug("Catalog snapshot written (%d bytes)", size)
+                except Exception:
+                    logger.exception("Failed to write catalog snapshot")
+            if self._closing and not self._pending:
+                return
+
+    def close(self):
+        """Write any pending snapshot and stop the background thread."""
+        if self._thread is None:
+            return
+        self._closing = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self._closing = False
+
+
+# Shared index used by the FastAPI receiver (None when disabled)
+catalog_index = CatalogStore(
+    CATALOG_INDEX["snapshot_path"] or None,
+    level=CATALOG_INDEX["level"],
+    max_products=CATALOG_INDEX["max_products"],
+) if CATALOG_INDEX["enabled"] else None
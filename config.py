@@ -2,9 +2,14 @@ import os
 
 SEED_ENDPOINTS = {
     "test": "https://qacore.mycantaloupe.com/VdiMicromarket.NewMarkets/SecureService.svc",
-    "prod": "https://mkt.mycantaloupe.com/VdiMicromarket/SecureService.svc"
+    "prod": "https://mkt.mycantaloupe.com/VdiMicromarket/SecureService.svc",
+    # Local SEED stand-in (benchmarks/seed_stub_server.py) for load tests
+    "local": os.getenv("SEED_LOCAL_ENDPOINT", "http://127.0.0.1:8089/VdiMicromarket/SecureService.svc")
 }
 
+# SEED environment used by the Flask send endpoints
+SEED_ENVIRONMENT = os.getenv("SEED_ENVIRONMENT", "test")
+
 AUTH = {
     "username": os.getenv("SEED_USERNAME", "micromarket.swyft@cantaloupe.com"),
     "password": os.getenv("SEED_PASSWORD", "032p0rK71Q00")
@@ -19,6 +24,67 @@ VDI_CONFIG = {
     "encoding": "utf-8"
 }
 
+# VDIXML compression per environment (VDI CompressionType)
+# type: None (plain escaped XML), "gzip" or "deflate"; content is base64 encoded.
+# Payloads smaller than min_size (characters) are always sent uncompressed.
+VDI_COMPRESSION = {
+    "test": {
+        "type": os.getenv("VDI_COMPRESSION_TEST") or None,
+        "min_size": int(os.getenv("VDI_COMPRESSION_MIN_SIZE", "8192"))
+    },
+    "prod": {
+        "type": os.getenv("VDI_COMPRESSION_PROD") or None,
+        "min_size": int(os.getenv("VDI_COMPRESSION_MIN_SIZE", "8192"))
+    },
+    "local": {
+        "type": os.getenv("VDI_COMPRESSION_LOCAL") or None,
+        "min_size": int(os.getenv("VDI_COMPRESSION_MIN_SIZE", "8192"))
+    }
+}
+
+# HTTP body compression for the FastAPI and Flask services
+# Inbound bodies with Content-Encoding gzip/deflate (and compressed VDIXML
+# content) are decompressed up to max_request_size bytes; uncompressed bodies
+# are not limited here. Responses of at least min_size bytes are gzipped
+# for clients that accept it.
+HTTP_COMPRESSION = {
+    "min_size": int(os.getenv("HTTP_COMPRESSION_MIN_SIZE", "1024")),
+    "level": int(os.getenv("HTTP_COMPRESSION_LEVEL", "6")),
+    "max_request_size": int(os.getenv("HTTP_MAX_REQUEST_SIZE", str(64 * 1024 * 1024)))
+}
+
+# XML parser backend for inbound VDI messages (see xml_backend.py):
+# "etree" (standard library) or "lxml". huge_tree lifts lxml's 10 MB text
+# node limit, which the VDIXML text of a full products catalog exceeds.
+XML_PARSER = {
+    "backend": os.getenv("XML_PARSER_BACKEND", "etree"),
+    "huge_tree": os.getenv("XML_HUGE_TREE", "true").lower() in ("1", "true", "yes")
+}
+
+# Chunked, memory-bounded parsing of large inbound messages (mms-products;
+# see products_chunked.py). Payloads of at least min_bytes are processed
+# chunk_records products (or one market) at a time; finished chunks beyond
+# memory_budget_mb are spilled to Parquet files in spill_dir (default: the
+# system temp dir) until the message has parsed and is loaded.
+CHUNKED_PARSING = {
+    "enabled": os.getenv("CHUNKED_PARSING_ENABLED", "false").lower() in ("1", "true", "yes"),
+    "min_bytes": int(os.getenv("CHUNKED_PARSING_MIN_BYTES", str(8 * 1024 * 1024))),
+    "chunk_records": int(os.getenv("CHUNKED_PARSING_CHUNK_RECORDS", "5000")),
+    "memory_budget_mb": int(os.getenv("CHUNKED_PARSING_MEMORY_BUDGET_MB", "256")),
+    "spill_dir": os.getenv("CHUNKED_PARSING_SPILL_DIR") or None
+}
+
+# Process-pool parsing of large mms-products messages (see products_parallel.py).
+# Payloads of at least min_bytes are split into per-market slices of about
+# task_bytes and parsed on `workers` processes (default: one per CPU; fewer
+# than two keeps parsing in-process).
+PARALLEL_PARSING = {
+    "enabled": os.getenv("PARALLEL_PARSING_ENABLED", "false").lower() in ("1", "true", "yes"),
+    "min_bytes": int(os.getenv("PARALLEL_PARSING_MIN_BYTES", str(2 * 1024 * 1024))),
+    "workers": int(os.getenv("PARALLEL_PARSING_WORKERS", "0")) or os.cpu_count() or 1,
+    "task_bytes": int(os.getenv("PARALLEL_PARSING_TASK_BYTES", str(1024 * 1024)))
+}
+
 # Default Operator ID
 DEFAULT_OPERATOR_ID = "nm_swyft"
 
@@ -41,5 +107,94 @@ ACTIVEMQ_CONFIG = {
     "password": os.getenv("ACTIVEMQ_PASSWORD", ""),
     "topic": os.getenv("ACTIVEMQ_TOPIC", "com.zoomsystems.common.PythonConsumerTopic"),
     "client_id": os.getenv("ACTIVEMQ_CLIENT_ID", "python-consumer-client"),
-    "subscription_name": os.getenv("ACTIVEMQ_SUBSCRIPTION_NAME", "python-consumer-durable-sub")
-}
\ No newline at end of file
+    "subscription_name": os.getenv("ACTIVEMQ_SUBSCRIPTION_NAME", "python-consumer-durable-sub"),
+    # Message processing: handlers run on a pool of `workers` threads with at
+    # most `max_in_flight` unacknowledged messages. ack_mode is
+    # "client-individual" (ack each message after its handler succeeds),
+    # "client" (cumulative acks, issued in delivery order) or "auto".
+    "ack_mode": os.getenv("ACTIVEMQ_ACK_MODE", "client-individual"),
+    "workers": int(os.getenv("ACTIVEMQ_WORKERS", "4")),
+    "max_in_flight": int(os.getenv("ACTIVEMQ_MAX_IN_FLIGHT", "8")),
+    # Handler attempts per message before it is redirected to failure_destination
+    # (default /queue/DLQ.<topic>); set failure_destination to "none" to leave
+    # failed messages unacknowledged for redelivery instead (with cumulative
+    # "client" acks the next successful ack covers them, so they are only
+    # redelivered if the session ends first)
+    "max_attempts": int(os.getenv("ACTIVEMQ_MAX_ATTEMPTS", "3")),
+    "failure_destination": os.getenv("ACTIVEMQ_FAILURE_DESTINATION", ""),
+    # Micro-batch delivery (batch_handler): a batch is handed over once it has
+    # batch_size messages or its oldest message has waited batch_timeout_ms
+    "batch_size": int(os.getenv("ACTIVEMQ_BATCH_SIZE", "100")),
+    "batch_timeout_ms": int(os.getenv("ACTIVEMQ_BATCH_TIMEOUT_MS", "500")),
+    # Failover list "host:port,host:port" (or "failover:(tcp://h1:p,tcp://h2:p)"),
+    # tried in order; empty uses host/stomp_port
+    "brokers": os.getenv("ACTIVEMQ_BROKERS", ""),
+    # STOMP heartbeat interval; 0 stays on STOMP 1.0 and relies on TCP keepalive,
+    # >0 switches to STOMP 1.1 so the broker and client detect dead connections
+    "heartbeat_ms": int(os.getenv("ACTIVEMQ_HEARTBEAT_MS", "0")),
+    # Reconnect backoff in seconds (doubles per attempt, jittered);
+    # max_attempts 0 retries until stopped
+    "reconnect_initial_delay": float(os.getenv("ACTIVEMQ_RECONNECT_INITIAL_DELAY", "1")),
+    "reconnect_max_delay": float(os.getenv("ACTIVEMQ_RECONNECT_MAX_DELAY", "60")),
+    "reconnect_max_attempts": int(os.getenv("ACTIVEMQ_RECONNECT_MAX_ATTEMPTS", "0")),
+    # consume_mode: "durable" (single durable topic subscriber), "queue" (consume
+    # `queue`, default the topic name) or "virtual-topic" (consume
+    # Consumer.<consumer_group>.VirtualTopic.<topic>). The shared modes let
+    # several processes split the load (see activemq_workers.py).
+    "consume_mode": os.getenv("ACTIVEMQ_CONSUME_MODE", "durable"),
+    "queue": os.getenv("ACTIVEMQ_QUEUE", ""),
+    "consumer_group": os.getenv("ACTIVEMQ_CONSUMER_GROUP", "python-consumer"),
+    # activemq_workers.py: consumer processes (0 = one per CPU) and how long
+    # stopping workers may take to finish and ack in-flight messages
+    "processes": int(os.getenv("ACTIVEMQ_PROCESSES", "0")),
+    "drain_timeout": float(os.getenv("ACTIVEMQ_DRAIN_TIMEOUT", "30")),
+    # Port the consumer serves Prometheus /metrics on (0 disables);
+    # activemq_workers.py gives worker N port metrics_port + N
+    "metrics_port": int(os.getenv("ACTIVEMQ_METRICS_PORT", "0"))
+}
+# ActiveMQ -> SEED mms-sales bridge (see sales_bridge.py)
+SALES_BRIDGE = {
+    "environment": os.getenv("SALES_BRIDGE_ENVIRONMENT", SEED_ENVIRONMENT),
+    "max_sales_per_transaction": int(os.getenv("SALES_BRIDGE_MAX_SALES", "500"))
+}
+
+# Tracing (see tracing.py)
+# exporters: comma-separated "otlp" and/or "jsonl"; empty disables tracing.
+# The OTLP exporter reads OTEL_EXPORTER_OTLP_ENDPOINT / OTEL_EXPORTER_OTLP_HEADERS.
+TRACING = {
+    "exporters": [e.strip() for e in os.getenv("TRACING_EXPORTERS", "").split(",") if e.strip()],
+    "jsonl_path": os.getenv("TRACING_JSONL_PATH", "data/traces.jsonl"),
+    "sample_ratio": float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+}
+
+# In-process catalog index behind the /catalog lookup endpoints (see
+# catalog_index.py). When snapshot_path is set (CATALOG_INDEX_SNAPSHOT, on a
+# persistent volume: on Cloud Run the local filesystem is in memory), the
+# index is snapshotted there (zstd JSON) after each products load and
+# reloaded from it on startup; by default it is kept in memory only.
+# Indexing a message holds about 2 KiB per product until it has loaded, so
+# messages with more than max_products products (0: no limit) are not indexed.
+CATALOG_INDEX = {
+    "enabled": os.getenv("CATALOG_INDEX_ENABLED", "true").lower() in ("1", "true", "yes"),
+    "snapshot_path": os.getenv("CATALOG_INDEX_SNAPSHOT", ""),
+    "level": int(os.getenv("CATALOG_INDEX_LEVEL", "10")),
+    "max_products": int(os.getenv("CATALOG_INDEX_MAX_PRODUCTS", "100000"))
+}
+
+# Archive of raw inbound /vdi/seed payloads (see payload_archive.py)
+# Bodies are zstd-compressed under their SHA-256 in dir/objects and indexed
+# in dir/index.jsonl by TransactionID, VDIXMLType and arrival time. Off unless
+# PAYLOAD_ARCHIVE_DIR is set: on Cloud Run the local filesystem is in memory,
+# so point it at a persistent volume. Entries older than max_age_days are
+# deleted, then the oldest until the objects fit in max_bytes (0 disables
+# either limit); retention runs every prune_interval seconds.
+PAYLOAD_ARCHIVE = {
+    "enabled": bool(os.getenv("PAYLOAD_ARCHIVE_DIR"))
+               and os.getenv("PAYLOAD_ARCHIVE_ENABLED", "true").lower() in ("1", "true", "yes"),
+    "dir": os.getenv("PAYLOAD_ARCHIVE_DIR", ""),
+    "level": int(os.getenv("PAYLOAD_ARCHIVE_LEVEL", "10")),
+    "max_queued_bytes": int(os.getenv("PAYLOAD_ARCHIVE_MAX_QUEUED_BYTES", str(256 * 1024 * 1024))),
+    "max_age_days": float(os.getenv("PAYLOAD_ARCHIVE_MAX_AGE_DAYS", "30")),
+    "max_bytes": int(os.getenv("PAYLOAD_ARCHIVE_MAX_BYTES", str(2 * 1024 * 1024 * 1024))),
+    "prune_interval": float(os.getenv("PAYLOAD_ARCHIVE_PRUNE_INTERVAL", "3600"))
+}
@@ -2,6 +2,11 @@ from google.cloud import bigquery
 from google.oauth2 import service_account
 from pandas_gbq import to_gbq
 from datetime import datetime, timezone
+import uuid
+
+from metrics import BIGQUERY_SECONDS, ROWS_LOADED, observe_seconds
+from tracing import span
+from vdi_parsers import APPEND_ONLY_TABLES, TABLE_KEYS, TABLE_SCHEMAS
 
 import firebase_admin
 from firebase_admin import auth as firebase_auth
@@ -15,6 +20,18 @@ KEY_PATH = "/Users/praveenkumar/Projects/Swyft/platform/misc/zoom-shops-dev-SA.j
 MAKETS_TABLE = "vdi_markets_info"
 PRODUCTS_TABLE = "vdi_products"
 
+# VDI type label for metrics per loaded table
+TABLE_VDI_TYPES = {
+    MAKETS_TABLE: "mms-markets",
+    PRODUCTS_TABLE: "mms-products",
+    "vdi_kiosks": "mms-kiosks",
+    "vdi_collections": "mms-collections",
+    "vdi_sales": "mms-sales",
+    "vdi_sale_items": "mms-sales",
+    "vdi_sale_item_taxes": "mms-sales",
+    "vdi_sale_tenders": "mms-sales",
+}
+
 if not firebase_admin._apps:
     cred = credentials.Certificate(KEY_PATH)
     firebase_admin.initialize_app(cred)
@@ -24,7 +41,8 @@ client = bigquery.Client(project=PROJECT_ID)
 TABLES = {
     "vdi_markets_info": f"{PROJECT_ID}.{SEED_DATASET_ID}.vdi_markets_info",
     "vdi_products": f"{PROJECT_ID}.{SEED_DATASET_ID}.vdi_products",
-    "vdi_store_market_mapping": f"{PROJECT_ID}.{SEED_DATASET_ID}.vdi_store_market_mapping"
+    "vdi_store_market_mapping": f"{PROJECT_ID}.{SEED_DATASET_ID}.vdi_store_market_mapping",
+    **{name: f"{PROJECT_ID}.{SEED_DATASET_ID}.{name}" for name in TABLE_SCHEMAS},
 }
 
 SCHEMA_DATA = {
@@ -81,29 +99,119 @@ SCHEMA_DATA = {
 
 }
 
+# Tables filled by the vdi_parsers column batches (kiosks, collections, sales)
+SCHEMA_DATA.update({
+    name: [bigquery.SchemaField(column, field_type) for column, field_type in columns]
+    for name, columns in TABLE_SCHEMAS.items()
+})
+
+# Rows per insertAll request for append-only tables
+APPEND_CHUNK_ROWS = 500
+
+# Append-only tables already checked by create_table in this process
+_append_tables_ready = set()
+
+# Suffix of the view over an append-only table that keeps one row per TABLE_KEYS key
+DEDUP_VIEW_SUFFIX = "_dedup"
+
+
 def load_to_bigquery(table_id, df):
     if df.empty:
         return
-    
-    # ensure table exists before adding data
-    create_table(table_id)
 
-    # add the data into temp table before merging it into actual
-    temp_table_id = f"{table_id}_temp"
+    table_name = table_id.split(".")[-1]
+    vdi_type = TABLE_VDI_TYPES.get(table_name, "other")
+    with span("bigquery.load_to_bigquery", {"bigquery.table": table_id, "vdi.type": vdi_type,
+                                            "bigquery.rows": len(df)}):
+        if table_name in APPEND_ONLY_TABLES:
+            append_to_bigquery(table_id, df, vdi_type)
+        else:
+            _load_to_bigquery(table_id, [df], vdi_type)
+
+def load_chunks_to_bigquery(table_id, chunks):
+    """
+    Stage an iterable of DataFrames in one temp table and commit them with a single MERGE.
 
-    # STEP 1: Upload dataframe to temporary table
-    df.to_gbq(
-        temp_table_id,
-        project_id=PROJECT_ID,
-        if_exists="replace"   # <-- creates it automatically
-    )
+    Chunks are uploaded one at a time, so only one is held in memory here;
+    nothing reaches table_id until every chunk is staged. Each load stages
+    into its own uniquely named temp table, deleted once the load ends.
+    """
+    table_name = table_id.split(".")[-1]
+    vdi_type = TABLE_VDI_TYPES.get(table_name, "other")
+    with span("bigquery.load_chunks_to_bigquery", {"bigquery.table": table_id, "vdi.type": vdi_type}):
+        if table_name in APPEND_ONLY_TABLES:
+            for df in chunks:
+                append_to_bigquery(table_id, df, vdi_type)
+        else:
+            _load_to_bigquery(table_id, chunks, vdi_type)
+
+def append_to_bigquery(table_id, df, vdi_type="other"):
+    """
+    Stream rows into an append-only table (no temp table, no MERGE).
+
+    Each row's insert ID is built from the table's TABLE_KEYS columns.
+    BigQuery's insert ID deduplication is best effort and only covers about
+    a minute, so a message SEED retries later is appended again; read the
+    <table>_dedup view (see create_dedup_view), which keeps one row per key.
+
+    Raises:
+        RuntimeError: If BigQuery rejects any row
+    """
+    table_name = table_id.split(".")[-1]
+    if table_id not in _append_tables_ready:
+        with span("bigquery.create_table", {"bigquery.table": table_id}):
+            create_table(table_id)
+            create_dedup_view(table_id)
+        _append_tables_ready.add(table_id)
+
+    key_columns = TABLE_KEYS[table_name]
+    rows = df.astype(object).where(df.notna(), None).to_dict("records")
+    row_ids = [":".join(str(row[col]) for col in key_columns) for row in rows]
+
+    with span("bigquery.insert_rows", {"bigquery.table": table_id, "bigquery.rows": len(rows)}), \
+            observe_seconds(BIGQUERY_SECONDS, vdi_type, "append"):
+        for start in range(0, len(rows), APPEND_CHUNK_ROWS):
+            errors = client.insert_rows_json(table_id, rows[start:start + APPEND_CHUNK_ROWS],
+                                             row_ids=row_ids[start:start + APPEND_CHUNK_ROWS])
+            if errors:
+                raise RuntimeError(f"BigQuery rejected rows for {table_id}: {errors[:5]}")
+    ROWS_LOADED.labels(vdi_type, "append").inc(len(rows))
+
+def _load_to_bigquery(table_id, chunks, vdi_type):
+    # ensure table exists before adding data
+    with span("bigquery.create_table", {"bigquery.table": table_id}):
+        create_table(table_id)
+
+    # add the data into a temp table of this load's own before merging it into actual,
+    # so concurrent loads of the same table never stage into each other's rows
+    temp_table_id = f"{table_id}_temp_{uuid.uuid4().hex}"
+    try:
+        _stage_and_merge(table_id, temp_table_id, chunks, vdi_type)
+    finally:
+        with span("bigquery.delete_temp", {"bigquery.table": temp_table_id}):
+            client.delete_table(temp_table_id, not_found_ok=True)
+        print("Deleted the temp table: %s" % temp_table_id)
+
+def _stage_and_merge(table_id, temp_table_id, chunks, vdi_type):
+    # STEP 1: Upload the dataframe chunks to the temporary table
+    staged = 0
+    for df in chunks:
+        if df.empty:
+            continue
+        with span("bigquery.to_gbq", {"bigquery.table": temp_table_id, "bigquery.rows": len(df)}), \
+                observe_seconds(BIGQUERY_SECONDS, vdi_type, "load"):
+            df.to_gbq(
+                temp_table_id,
+                project_id=PROJECT_ID,
+                if_exists="append" if staged else "fail"   # <-- the first chunk creates it
+            )
+        staged += 1
+        ROWS_LOADED.labels(vdi_type, "load").inc(len(df))
+    if not staged:
+        return
 
     # STEP 2: MERGE
-    key_columns = None
-    if MAKETS_TABLE in table_id:
-        key_columns = ['MarketID']
-    elif PRODUCTS_TABLE in table_id:
-        key_columns = ['MarketID', 'ProductID']
+    key_columns = TABLE_KEYS.get(table_id.split(".")[-1])
     if key_columns is None:
         print("could not identify the key column for table id: %s" % table_id)
         return
@@ -120,11 +228,30 @@ def load_to_bigquery(table_id, df):
       INSERT ROW;
     """
 
-    client.query(merge_sql).result()
+    with span("bigquery.merge", {"bigquery.table": table_id}) as merge_span, \
+            observe_seconds(BIGQUERY_SECONDS, vdi_type, "merge"):
+        merge_job = client.query(merge_sql)
+        merge_job.result()
+        merge_span.set_attribute("bigquery.job_id", merge_job.job_id)
+        merge_span.set_attribute("bigquery.rows_inserted", merge_job.num_dml_affected_rows or 0)
+    ROWS_LOADED.labels(vdi_type, "merge").inc(merge_job.num_dml_affected_rows or 0)
     print("Composite-key MERGE complete.")
 
-    client.delete_table(temp_table_id, not_found_ok=True)
-    print("Deleted the temp table: %s" % temp_table_id)
+def create_dedup_view(table_id: str):
+    """
+    Creates the <table>_dedup view over an append-only table if it does not exist.
+
+    The view keeps one row per TABLE_KEYS key, so rows a retried message
+    appended after the insert ID window are not counted twice.
+    """
+    key_columns = TABLE_KEYS[table_id.split(".")[-1]]
+    view = bigquery.Table(f"{table_id}{DEDUP_VIEW_SUFFIX}")
+    view.view_query = f"""
+    SELECT * FROM `{table_id}`
+    WHERE TRUE
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY {", ".join(key_columns)} ORDER BY TransactionID) = 1
+    """
+    client.create_table(view, exists_ok=True)
 
 def create_table(table_id: str):
     """
@@ -286,6 +413,5 @@ def get_store_market_mappings_current():
     return [dict(r) for r in rows]
 
 if __name__ == "__main__":
-    create_table(f"{PROJECT_ID}.{SEED_DATASET_ID}.vdi_markets_info")
-    create_table(f"{PROJECT_ID}.{SEED_DATASET_ID}.vdi_products")
-    create_table(f"{PROJECT_ID}.{SEED_DATASET_ID}.vdi_store_market_mapping")
+    for table_id in TABLES.values():
+        create_table(table_id)
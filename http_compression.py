@@ -0,0 +1,146 @@
+"""
+HTTP request/response body compression shared by main.py (FastAPI) and app.py (Flask).
+
+Inbound bodies sent with Content-Encoding gzip or deflate are decompressed
+incrementally as they are read, and rejected once the decompressed size
+exceeds HTTP_COMPRESSION["max_request_size"]. Uncompressed bodies are passed
+through without that limit, as they were before compression support. Responses are gzipped when
+the client accepts it and the body is at least HTTP_COMPRESSION["min_size"].
+"""
+import gzip
+import io
+import zlib
+
+from config import HTTP_COMPRESSION
+
+# zlib wbits per Content-Encoding (47 auto-detects a gzip or zlib header)
+_WBITS = {
+    "identity": None,
+    "gzip": 31,
+    "x-gzip": 31,
+    "deflate": 47,
+}
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+
+class BodyDecodeError(Exception):
+    """Raised when a request body cannot be decoded; carries the HTTP status to return."""
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.message = message
+        super().__init__(message)
+
+
+class BodyDecoder:
+    """
+    Incrementally decodes a request body according to its Content-Encoding.
+
+    Args:
+        content_encoding: Value of the Content-Encoding header (may be None)
+        max_size: Maximum decompressed body size in bytes; identity bodies
+            are not limited
+    """
+
+    def __init__(self, content_encoding=None, max_size=None):
+        encoding = (content_encoding or "identity").strip().lower()
+        if encoding not in _WBITS:
+            raise BodyDecodeError(415, f"Unsupported Content-Encoding: {content_encoding}")
+        wbits = _WBITS[encoding]
+        self._decompressor = zlib.decompressobj(wbits) if wbits else None
+        self.max_size = max_size or HTTP_COMPRESSION["max_request_size"]
+        self._body = bytearray()
+
+    def _append(self, data):
+        self._body += data
+        if len(self._body) > self.max_size:
+            raise BodyDecodeError(413, f"Request body exceeds {self.max_size} bytes")
+
+    def feed(self, chunk: bytes):
+        """Decode the next chunk of the raw request body."""
+        if self._decompressor is None:
+            self._body += chunk
+            return
+        try:
+            # Bound each step so a small compressed chunk cannot expand unchecked
+            data = chunk
+            while data:
+                remaining = self.max_size - len(self._body) + 1
+                self._append(self._decompressor.decompress(data, remaining))
+                data = self._decompressor.unconsumed_tail
+        except zlib.error as e:
+            raise BodyDecodeError(400, f"Invalid compressed request body: {e}")
+
+    def finish(self) -> bytes:
+        """Return the decoded body."""
+        if self._decompressor is not None:
+            try:
+                self._append(self._decompressor.flush())
+            except zlib.error as e:
+                raise BodyDecodeError(400, f"Invalid compressed request body: {e}")
+            if not self._decompressor.eof:
+                raise BodyDecodeError(400, "Truncated compressed request body")
+        return bytes(self._body)
+
+
+async def read_request_body(request) -> bytes:
+    """Read and decode a Starlette/FastAPI request body as it streams in."""
+    decoder = BodyDecoder(request.headers.get("content-encoding"))
+    async for chunk in request.stream():
+        decoder.feed(chunk)
+    return decoder.finish()
+
+
+def accepts_gzip(accept_encoding) -> bool:
+    """Return True if an Accept-Encoding header allows gzip."""
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def install_flask_compression(app):
+    """Register Flask hooks that decode compressed requests and gzip large responses."""
+    from flask import jsonify, request
+    from werkzeug.wsgi import get_input_stream
+
+    @app.before_request
+    def _decode_request_body():
+        encoding = request.headers.get("Content-Encoding")
+        if not encoding or encoding.strip().lower() == "identity":
+            return None
+        try:
+            decoder = BodyDecoder(encoding)
+            stream = get_input_stream(request.environ)
+            while True:
+                chunk = stream.read(_READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                decoder.feed(chunk)
+            body = decoder.finish()
+        except BodyDecodeError as e:
+            return jsonify({"error": e.message}), e.status_code
+
+        # Hand the decoded body to the view as if it had been sent uncompressed
+        request.environ["wsgi.input"] = io.BytesIO(body)
+        request.environ["CONTENT_LENGTH"] = str(len(body))
+        request.environ.pop("HTTP_CONTENT_ENCODING", None)
+        request.environ.pop("wsgi.input_terminated", None)
+        return None
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.direct_passthrough
+                or response.status_code < 200
+                or "Content-Encoding" in response.headers
+                or not accepts_gzip(request.headers.get("Accept-Encoding"))):
+            return response
+        data = response.get_data()
+        if len(data) < HTTP_COMPRESSION["min_size"]:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=HTTP_COMPRESSION["level"]))
+        response.headers["Content-Encoding"] = "gzip"
+        response.headers.add("Vary", "Accept-Encoding")
+        return response
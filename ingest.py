@@ -0,0 +1,118 @@
+"""
+Inbound SEED VDIDataExchange processing shared by /vdi/seed and the replay tool.
+
+process_vdi_payload() parses the envelope, looks up the VDIXMLType's parser
+in vdi_parsers.PARSERS, runs its parse and merge steps and hands each
+resulting table's DataFrame to a loader. The loader decides where rows go:
+main.py loads into BigQuery, the replay tool can substitute a local stand-in.
+Large payloads of types with a chunked parser are instead parsed into
+memory-bounded chunk spools and handed to a chunk loader (CHUNKED_PARSING).
+"""
+import xml_backend
+from config import CHUNKED_PARSING
+from metrics import MERGE_SECONDS, PARSE_SECONDS, REQUEST_BODY_BYTES, observe_seconds, vdi_type_label
+from tracing import set_span_attributes, span
+from vdi_envelope import read_header
+from vdi_parsers import PARSERS, get_parser
+
+# VDIXMLType -> short names of the tables its rows are loaded into
+VDI_TABLES = {vdi_type: parser.tables for vdi_type, parser in PARSERS.items()}
+
+# VDI type whose parsed (unmerged) frames feed the catalog index
+CATALOG_VDI_TYPE = "mms-products"
+
+
+def read_envelope_header(root):
+    """
+    Return (vdi_type, transaction_id) from a parsed VDIDataExchange envelope.
+
+    Raises:
+        ValueError: If the envelope has no <VDIXMLType>
+    """
+    vdixml_type_el = xml_backend.find_envelope(root, "VDIXMLType")
+    if vdixml_type_el is None:
+        raise ValueError("Cannot find <VDIXMLType> inside SOAP response")
+    transaction_id_el = xml_backend.find_envelope(root, "TransactionID")
+    transaction_id = (transaction_id_el.text or "") if transaction_id_el is not None else ""
+    return vdixml_type_el.text, transaction_id
+
+
+def process_vdi_payload(xml_str, loader, body_bytes=None, chunk_loader=None, catalog=None):
+    """
+    Parse, merge and load one VDIDataExchange SOAP envelope.
+
+    Args:
+        xml_str: Decoded SOAP envelope
+        loader: Callable(table_name, df) that stores the rows, e.g. into BigQuery;
+            called once per table the VDI type produces
+        body_bytes: Size of the request body for metrics (defaults to len(xml_str))
+        chunk_loader: Optional callable(table_name, chunks) that stages an iterable
+            of DataFrames and commits them at once; enables chunked parsing
+        catalog: Optional catalog_index.CatalogStore; mms-products messages are
+            indexed from their parsed product, code, tax and fee frames, and
+            swapped in once every table has loaded (messages over the store's
+            max_products are not indexed)
+
+    Returns:
+        dict with vdi_type, transaction_id, rows (total rows handed to the
+        loader, None for unhandled VDI types) and tables (rows per table)
+    """
+    # Ensure proper XML formatting
+    xml_str = xml_str.strip()
+
+    # Large payloads may be parsed in chunks: read the header without building
+    # the envelope tree, whose VDIXML text alone is as large as the payload
+    chunked = (chunk_loader is not None and CHUNKED_PARSING["enabled"]
+               and len(xml_str) >= CHUNKED_PARSING["min_bytes"])
+
+    # Parse SOAP envelope
+    with span("vdi.parse_envelope", {"vdi.envelope_bytes": len(xml_str)}):
+        if chunked:
+            vdi_type, transaction_id = read_header(xml_str)
+        else:
+            vdi_type, transaction_id = read_envelope_header(xml_backend.fromstring(xml_str))
+    print(f"📩 Received VDI Type: {vdi_type} TransactionID: {transaction_id} "
+          f"({body_bytes if body_bytes is not None else len(xml_str)} bytes)")
+    set_span_attributes({"vdi.type": vdi_type or "", "vdi.transaction_id": transaction_id})
+    type_label = vdi_type_label(vdi_type)
+    REQUEST_BODY_BYTES.labels(type_label).observe(body_bytes if body_bytes is not None else len(xml_str))
+
+    parser = get_parser(vdi_type)
+    if parser is None:
+        print(f"⚠️ Unknown VDI Type: {vdi_type}")
+        return {"vdi_type": vdi_type, "transaction_id": transaction_id, "rows": None, "tables": {}}
+
+    builder = catalog.builder() if catalog is not None and vdi_type == CATALOG_VDI_TYPE else None
+
+    if chunked and parser.chunked is not None:
+        with span("vdi.parse", {"vdi.type": vdi_type, "vdi.chunked": True}), \
+                observe_seconds(PARSE_SECONDS, type_label):
+            spools = parser.chunked(xml_str, on_parsed=builder.add if builder is not None else None)
+        tables = {}
+        try:
+            for table_name, spool in spools.items():
+                print(f"🧩 {table_name}: {spool.rows} rows in {spool.chunks} chunks ({spool.spilled} spilled)")
+                chunk_loader(table_name, spool)
+                tables[table_name] = spool.rows
+        finally:
+            for spool in spools.values():
+                spool.close()
+        if builder is not None:
+            catalog.commit(builder)
+        return {"vdi_type": vdi_type, "transaction_id": transaction_id, "rows": sum(tables.values()), "tables": tables}
+
+    with span("vdi.parse", {"vdi.type": vdi_type}), observe_seconds(PARSE_SECONDS, type_label):
+        frames = parser.parse(xml_str)
+    if builder is not None:
+        builder.add(frames)
+    if parser.merge is not None:
+        with span("vdi.merge", {"vdi.type": vdi_type}), observe_seconds(MERGE_SECONDS, type_label):
+            frames = parser.merge(frames)
+
+    tables = {}
+    for table_name, df in frames.items():
+        loader(table_name, df)
+        tables[table_name] = len(df)
+    if builder is not None:
+        catalog.commit(builder)
+    return {"vdi_type": vdi_type, "transaction_id": transaction_id, "rows": sum(tables.values()), "tables": tables}
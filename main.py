@@ -1,7 +1,8 @@
 import os
-import xml.etree.ElementTree as ET
+import time
 
 from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.responses import Response
 from fastapi.templating import Jinja2Templates
@@ -9,18 +10,46 @@ from fastapi.staticfiles import StaticFiles
 from firebase_admin import auth as firebase_auth
 
 from dotenv import load_dotenv
-from utils import parse_seed_markets_soap, parse_seed_products_soap
-from gcp_utils import TABLES, load_to_bigquery, bq_get_markets, bq_get_stores, save_store_market_mapping, get_store_market_mappings_current, delete_store_market_mapping
+from config import HTTP_COMPRESSION
+from http_compression import BodyDecodeError, read_request_body
+from payload_archive import payload_archive
+from catalog_index import catalog_index
+from metrics import record_http_response, render_latest
+from tracing import configure_tracing, span
+from ingest import process_vdi_payload
+from vdi_compression import VDIXMLSizeError
+from gcp_utils import TABLES, load_to_bigquery, load_chunks_to_bigquery, bq_get_markets, bq_get_stores, save_store_market_mapping, get_store_market_mappings_current, delete_store_market_mapping
 
 load_dotenv()
+configure_tracing("seed-vdi-receiver")
+if catalog_index is not None:
+    # Serve lookups from the last snapshot until the next products load
+    catalog_index.load_snapshot()
 
 app = FastAPI(title="Seed VDI Receiver", version="1.0")
+app.add_middleware(GZipMiddleware, minimum_size=HTTP_COMPRESSION["min_size"],
+                   compresslevel=HTTP_COMPRESSION["level"])
 
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 security = HTTPBasic()
 
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Use the route pattern, not the raw path, to bound cardinality
+        route = request.scope.get("route")
+        record_http_response("receiver", getattr(route, "path", "unmatched"), request.method, status,
+                             time.perf_counter() - start)
+
 VALID_USER = os.getenv("VDI_USER")
 VALID_PASS = os.getenv("VDI_PASS")
 
@@ -90,60 +119,32 @@ def delete_mapping(request: Request, payload: dict):
 
 
 # ---------- SOAP HANDLER ----------
+def load_table(table_name, df):
+    """Loader for process_vdi_payload: MERGE rows into the BigQuery table table_name (sales tables are appended)."""
+    load_to_bigquery(TABLES.get(table_name), df)
+
+def load_table_chunks(table_name, chunks):
+    """Chunk loader for process_vdi_payload: stage every chunk, then commit them with one MERGE."""
+    load_chunks_to_bigquery(TABLES.get(table_name), chunks)
+
 @app.post("/vdi/seed", response_class=Response)
 async def receive_vdi(request: Request, user: str = Depends(verify_auth)):
-    body = await request.body()
+    try:
+        body = await read_request_body(request)
+    except BodyDecodeError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    if payload_archive is not None:
+        # Raw body goes to the archive off the request path instead of stdout
+        payload_archive.submit(body, content_encoding=request.headers.get("content-encoding"))
     xml_str = body.decode("utf-8")
-    print(xml_str)
 
-    try:
-        # Ensure proper XML formatting
-        xml_str = xml_str.strip()
-
-        # Parse SOAP envelope
-        root = ET.fromstring(xml_str)
-            # Namespaces
-        ns = {
-            "s": "http://schemas.xmlsoap.org/soap/envelope/",
-            "v": "urn:VDIDataExchangeService"
-        }
-        # Extract the inner <VDIXML> block from SOAP
-        vdixml_type_el = root.find(".//v:VDIXMLType", ns)
-        if vdixml_type_el is None:
-            raise ValueError("Cannot find <VDIXMLType> inside SOAP response")
-
-        vdi_type = vdixml_type_el.text
-        print(f"📩 Received VDI Type: {vdi_type}")
-
-        if vdi_type == "mms-markets":
-            data = parse_seed_markets_soap(xml_str)
-            markets_df = data['markets']
-            table_id = TABLES.get("vdi_markets_info")
-            load_to_bigquery(table_id, markets_df)
-
-        elif vdi_type == "mms-products":
-            data = parse_seed_products_soap(xml_str)
-            products_df = data["products"]
-            product_codes = data["product_codes"]
-            product_taxes = data["product_taxes"]
-            product_fees = data['product_fees']
-
-            keys = ["MarketID", "ProductID", "TransactionID"]
-            
-            merge_df = products_df.merge(product_codes, on=keys, how="inner")
-            merge_df = merge_df.merge(product_taxes, on=keys, how="inner")
-            merge_df = merge_df.merge(product_fees, on=keys, how="inner")
-            # do type-conversions
-            merge_df['FeeID'] = merge_df['FeeID'].astype(str)
-            merge_df['TaxID'] = merge_df['TaxID'].astype(str)
-            # get table id
-            table_id = TABLES.get("vdi_products")
-            load_to_bigquery(table_id, merge_df)
-        else:
-            print(f"⚠️ Unknown VDI Type: {vdi_type}")
-
-        # Respond OK
-        response_xml = """
+    with span("vdi.receive", {"vdi.body_bytes": len(body)}) as receive_span:
+        try:
+            process_vdi_payload(xml_str, load_table, body_bytes=len(body), chunk_loader=load_table_chunks,
+                                catalog=catalog_index)
+
+            # Respond OK
+            response_xml = """
         <s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
             <s:Body>
                 <VDIDataExchangeResponse xmlns="urn:VDIDataExchangeService">
@@ -153,10 +154,45 @@ async def receive_vdi(request: Request, user: str = Depends(verify_auth)):
         </s:Envelope>
         """
 
-        return Response(content=response_xml, media_type="text/xml")
-    except Exception as e:
-        print("❌ XML Parse Error:", e)
-        raise HTTPException(status_code=400, detail="Invalid XML")
+            return Response(content=response_xml, media_type="text/xml")
+        except VDIXMLSizeError as e:
+            receive_span.record_exception(e)
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            print("❌ XML Parse Error:", e)
+            receive_span.record_exception(e)
+            raise HTTPException(status_code=400, detail="Invalid XML")
+
+
+# ---------- CATALOG LOOKUPS ----------
+def current_catalog():
+    if catalog_index is None:
+        raise HTTPException(status_code=503, detail="Catalog index disabled")
+    return catalog_index.index
+
+@app.get("/catalog")
+def catalog_stats(user: str = Depends(verify_auth)):
+    return current_catalog().stats()
+
+@app.get("/catalog/{market_id}/products/{product_id}")
+def catalog_product(market_id: str, product_id: str, user: str = Depends(verify_auth)):
+    product = current_catalog().product(market_id, product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@app.get("/catalog/{market_id}/codes/{code}")
+def catalog_code(market_id: str, code: str, user: str = Depends(verify_auth)):
+    product = current_catalog().by_code(market_id, code)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Code not found")
+    return product
+
+
+@app.get("/metrics", response_class=Response)
+def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
 
 
 @app.get("/")
@@ -0,0 +1,152 @@
+"""
+Prometheus metrics shared by main.py (FastAPI) and app.py (Flask).
+
+Stage histograms are labelled by VDI type so the latency budget of an
+inbound message can be split into body size, parse, merge and BigQuery
+load/MERGE time, and outbound SEED sends into request latency and retries.
+Both services expose the default registry at GET /metrics; the ActiveMQ
+consumer serves it from its own port (ACTIVEMQ_CONFIG["metrics_port"]).
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, start_http_server
+
+from config import VDI_TYPES
+
+# Label used for VDI types that are missing or not in VDI_TYPES, so client
+# input cannot grow label cardinality
+OTHER_VDI_TYPE = "other"
+
+_KNOWN_VDI_TYPES = frozenset(VDI_TYPES.values())
+
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600, 14400)
+
+REQUEST_BODY_BYTES = Histogram(
+    "vdi_request_body_bytes", "Decoded inbound VDI request body size",
+    ["vdi_type"], buckets=SIZE_BUCKETS
+)
+PARSE_SECONDS = Histogram(
+    "vdi_parse_seconds", "Time to parse a VDI SOAP payload into DataFrames",
+    ["vdi_type"], buckets=STAGE_BUCKETS
+)
+MERGE_SECONDS = Histogram(
+    "vdi_merge_seconds", "Time to merge parsed VDI DataFrames into load rows",
+    ["vdi_type"], buckets=STAGE_BUCKETS
+)
+BIGQUERY_SECONDS = Histogram(
+    "vdi_bigquery_seconds", "BigQuery staging load, MERGE and append time",
+    ["vdi_type", "stage"], buckets=STAGE_BUCKETS
+)
+ROWS_LOADED = Counter(
+    "vdi_bigquery_rows_total", "Rows staged to, inserted by MERGE into or appended to BigQuery",
+    ["vdi_type", "stage"]
+)
+SEED_SEND_SECONDS = Histogram(
+    "seed_send_seconds", "SEED SOAP send latency including retries",
+    ["vdi_type", "environment"], buckets=STAGE_BUCKETS
+)
+SEED_SEND_RESPONSES = Counter(
+    "seed_send_responses_total", "SEED SOAP send results by final status code",
+    ["vdi_type", "environment", "status"]
+)
+SEED_SEND_RETRIES = Counter(
+    "seed_send_retries_total", "SEED SOAP send retries by reason",
+    ["vdi_type", "environment", "reason"]
+)
+HTTP_RESPONSES = Counter(
+    "vdi_http_responses_total", "HTTP responses by service, route and status code",
+    ["service", "route", "method", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "vdi_http_request_seconds", "HTTP request handling time",
+    ["service", "route", "method"], buckets=STAGE_BUCKETS
+)
+
+# ActiveMQ consumer, labelled by the subscribed destination
+ACTIVEMQ_RECEIVED = Counter(
+    "activemq_messages_received_total", "Messages received from the broker",
+    ["destination"]
+)
+ACTIVEMQ_REDELIVERED = Counter(
+    "activemq_messages_redelivered_total", "Received messages flagged as redelivered by the broker",
+    ["destination"]
+)
+ACTIVEMQ_OUTCOMES = Counter(
+    "activemq_messages_processed_total", "Messages by outcome (handled, redirected, unacknowledged)",
+    ["destination", "outcome"]
+)
+ACTIVEMQ_IN_FLIGHT = Gauge(
+    "activemq_messages_in_flight", "Messages received but not yet handled and acknowledged",
+    ["destination"]
+)
+ACTIVEMQ_HANDLER_SECONDS = Histogram(
+    "activemq_handler_seconds", "Handler call time per attempt (one call per message or batch)",
+    ["destination"], buckets=STAGE_BUCKETS
+)
+ACTIVEMQ_END_TO_END_SECONDS = Histogram(
+    "activemq_end_to_end_seconds", "Time from the broker timestamp header to handler completion",
+    ["destination"], buckets=LAG_BUCKETS
+)
+
+_metrics_server_started = set()
+
+
+def serve_metrics(port):
+    """Serve the default registry on port from a background thread (once per port)."""
+    if port and port not in _metrics_server_started:
+        start_http_server(port)
+        _metrics_server_started.add(port)
+
+
+def vdi_type_label(vdi_type):
+    """Return vdi_type if it is a known VDI type, otherwise OTHER_VDI_TYPE."""
+    return vdi_type if vdi_type in _KNOWN_VDI_TYPES else OTHER_VDI_TYPE
+
+
+@contextmanager
+def observe_seconds(histogram, *labels):
+    """Observe the duration of the with-block on histogram.labels(*labels)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - start)
+
+
+def record_http_response(service, route, method, status, seconds):
+    HTTP_RESPONSES.labels(service, route, method, str(status)).inc()
+    HTTP_REQUEST_SECONDS.labels(service, route, method).observe(seconds)
+
+
+def render_latest():
+    """Return (body, content_type) for a /metrics response."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def install_flask_metrics(app, service="send"):
+    """Record per-route response counters for a Flask app and serve GET /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_response(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            # Use the route pattern, not the raw path, to bound cardinality
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            record_http_response(service, route, request.method, response.status_code,
+                                 time.perf_counter() - start)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        body, content_type = render_latest()
+        return Response(body, content_type=content_type)
+
+    return app
@@ -0,0 +1,301 @@
+"""
+Content-addressed archive of raw inbound VDI payloads.
+
+Each body is zstd-compressed and stored once under its SHA-256 hash:
+
+    <dir>/objects/ab/abcdef....xml.zst
+
+and every arrival is appended to <dir>/index.jsonl with its hash,
+TransactionID, VDIXMLType, arrival time and sizes. Hashing, compression and
+writes happen on a background thread so the request path only enqueues the
+body. Point PAYLOAD_ARCHIVE["dir"] at a persistent volume (e.g. a Cloud
+Storage FUSE mount on Cloud Run) to keep payloads across instances; the
+archive is off until it is set.
+
+The same thread applies the retention limits every prune_interval seconds:
+index entries older than max_age are dropped, then the oldest ones until the
+objects still referenced fit in max_bytes, and objects no remaining entry
+refers to are deleted. Pruning rewrites index.jsonl, so only one process
+should write to an archive directory.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import zstandard
+
+from config import PAYLOAD_ARCHIVE
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.jsonl"
+OBJECTS_DIR = "objects"
+OBJECT_SUFFIX = ".xml.zst"
+
+# Envelope fields are read with a bounded regex on the raw bytes, so a
+# malformed body is still archived with whatever metadata can be found
+_ENVELOPE_FIELD = {
+    "transaction_id": re.compile(rb"<(?:\w+:)?TransactionID>\s*([^<\s]+)\s*</"),
+    "vdi_type": re.compile(rb"<(?:\w+:)?VDIXMLType>\s*([^<\s]+)\s*</"),
+}
+_HEADER_SCAN_BYTES = 4096
+
+
+def envelope_metadata(body):
+    """Return {"transaction_id", "vdi_type"} read from the SOAP header fields of body."""
+    head = body[:_HEADER_SCAN_BYTES]
+    metadata = {}
+    for key, pattern in _ENVELOPE_FIELD.items():
+        match = pattern.search(head)
+        metadata[key] = match.group(1).decode("utf-8", "replace") if match else None
+    return metadata
+
+
+class PayloadArchive:
+    """
+    Writes raw payloads to a content-addressed zstd archive from a background thread.
+
+    Args:
+        root_dir: Archive directory (objects/ and index.jsonl live here)
+        level: zstd compression level
+        max_queued_bytes: Bodies are dropped (and logged) rather than queued once
+            this many bytes are waiting to be written
+        max_age_days: Entries older than this are pruned (None or 0: no limit)
+        max_bytes: Oldest entries are pruned until the compressed objects
+            fit in this many bytes (None or 0: no limit)
+        prune_interval: Seconds between retention passes on the background thread
+    """
+
+    def __init__(self, root_dir, level=10, max_queued_bytes=256 * 1024 * 1024,
+                 max_age_days=None, max_bytes=None, prune_interval=3600):
+        self.root_dir = root_dir
+        self.level = level
+        self.max_queued_bytes = max_queued_bytes
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._queue = queue.Queue()
+        self._queued_bytes = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dropped = 0
+
+    # ---------- writing ----------
+    def submit(self, body, received_at=None, **extra):
+        """
+        Queue a raw body for archiving without blocking; returns False if it had to be dropped.
+
+        Args:
+            body: Raw request body bytes
+            received_at: Arrival time (defaults to now, UTC)
+            extra: Additional JSON-serializable fields stored in the index entry
+        """
+        self._ensure_started()
+        received_at = received_at or datetime.now(timezone.utc)
+        with self._lock:
+            if self._queued_bytes + len(body) > self.max_queued_bytes:
+                self.dropped += 1
+                logger.error("Payload archive backlog full; dropped %d byte payload", len(body))
+                return False
+            self._queued_bytes += len(body)
+        self._queue.put((bytes(body), received_at, extra))
+        return True
+
+    def write(self, body, received_at=None, **extra):
+        """Archive body synchronously and return its index entry."""
+        received_at = received_at or datetime.now(timezone.utc)
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(digest)
+        compressed_size = None
+        if not os.path.exists(path):
+            data = zstandard.ZstdCompressor(level=self.level).compress(body)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            compressed_size = len(data)
+
+        entry = {
+            "sha256": digest,
+            **envelope_metadata(body),
+            "received_at": received_at.isoformat(),
+            "size": len(body),
+            "compressed_size": compressed_size if compressed_size is not None else os.path.getsize(path),
+            **extra,
+        }
+        os.makedirs(self.root_dir, exist_ok=True)
+        # One write() per line keeps concurrent appends from interleaving
+        with open(os.path.join(self.root_dir, INDEX_FILE), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="payload-archive", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            self._maybe_prune()
+            try:
+                # Wake up for the next retention pass even when no payloads arrive
+                item = self._queue.get(timeout=max(self.prune_interval, 1) if self._retains() else None)
+            except queue.Empty:
+                continue
+            try:
+                if item is None:
+                    return
+                body, received_at, extra = item
+                try:
+                    entry = self.write(body, received_at, **extra)
+                finally:
+                    with self._lock:
+                        self._queued_bytes -= len(body)
+                logger.debug("Archived payload %s (%s)", entry["sha256"][:12], entry["transaction_id"])
+            except Exception:
+                logger.exception("Failed to archive payload")
+            finally:
+                self._queue.task_done()
+
+    def _retains(self):
+        return bool(self.max_age_days or self.max_bytes)
+
+    def _maybe_prune(self):
+        if not self._retains() or time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + self.prune_interval
+        try:
+            entries, objects = self.prune()
+            if entries:
+                logger.info("Payload archive: pruned %d entries and %d objects", entries, objects)
+        except Exception:
+            logger.exception("Failed to prune payload archive")
+
+    # ---------- retention ----------
+    def prune(self, now=None):
+        """
+        Apply max_age_days and max_bytes to the archive.
+
+        Drops index entries older than max_age_days, then the oldest entries
+        until the objects the rest refer to total at most max_bytes, and
+        deletes the objects no remaining entry refers to. Runs on the
+        background thread; call it directly only when nothing else is writing.
+
+        Args:
+            now: Reference time for max_age_days (defaults to now, UTC)
+
+        Returns:
+            (entries removed, objects deleted)
+        """
+        entries = list(self.entries())
+        keep = entries
+        if self.max_age_days:
+            cutoff = ((now or datetime.now(timezone.utc)) - timedelta(days=self.max_age_days)).isoformat()
+            keep = [entry for entry in keep if entry["received_at"] >= cutoff]
+        if self.max_bytes:
+            # An object stays as long as any kept entry refers to it
+            references = Counter(entry["sha256"] for entry in keep)
+            sizes = {entry["sha256"]: entry.get("compressed_size") or 0 for entry in keep}
+            total = sum(sizes.values())
+            start = 0
+            while total > self.max_bytes and start < len(keep):
+                digest = keep[start]["sha256"]
+                references[digest] -= 1
+                if not references[digest]:
+                    total -= sizes[digest]
+                start += 1
+            keep = keep[start:]
+        if len(keep) == len(entries):
+            return 0, 0
+
+        index_path = os.path.join(self.root_dir, INDEX_FILE)
+        tmp_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in keep)
+        os.replace(tmp_path, index_path)
+
+        removed = {entry["sha256"] for entry in entries} - {entry["sha256"] for entry in keep}
+        for digest in removed:
+            try:
+                os.remove(self.object_path(digest))
+            except FileNotFoundError:
+                pass
+        return len(entries) - len(keep), len(removed)
+
+    def flush(self):
+        """Block until every queued body has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Write out queued bodies and stop the background thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    # ---------- reading ----------
+    def object_path(self, digest):
+        return os.path.join(self.root_dir, OBJECTS_DIR, digest[:2], digest + OBJECT_SUFFIX)
+
+    def read(self, digest):
+        """Return the raw payload bytes stored under digest."""
+        with open(self.object_path(digest), "rb") as f:
+            return zstandard.ZstdDecompressor().decompress(f.read())
+
+    def entries(self):
+        """Yield index entries in arrival order."""
+        path = os.path.join(self.root_dir, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def find(self, transaction_id=None, vdi_type=None, since=None, until=None):
+        """
+        Return index entries matching every given filter.
+
+        Args:
+            transaction_id: Exact TransactionID
+            vdi_type: Exact VDIXMLType
+            since, until: ISO-8601 UTC arrival time bounds (inclusive), compared as strings
+        """
+        matches = []
+        for entry in self.entries():
+            if transaction_id is not None and entry.get("transaction_id") != transaction_id:
+                continue
+            if vdi_type is not None and entry.get("vdi_type") != vdi_type:
+                continue
+            if since is not None and entry["received_at"] < since:
+                continue
+            if until is not None and entry["received_at"] > until:
+                continue
+            matches.append(entry)
+        return matches
+
+
+# Shared archive used by the FastAPI receiver (None when disabled)
+payload_archive = PayloadArchive(
+    PAYLOAD_ARCHIVE["dir"],
+    level=PAYLOAD_ARCHIVE["level"],
+    max_queued_bytes=PAYLOAD_ARCHIVE["max_queued_bytes"],
+    max_age_days=PAYLOAD_ARCHIVE["max_age_days"],
+    max_bytes=PAYLOAD_ARCHIVE["max_bytes"],
+    prune_interval=PAYLOAD_ARCHIVE["prune_interval"],
+) if PAYLOAD_ARCHIVE["enabled"] else None
@@ -0,0 +1,90 @@
+"""
+Cached, precompiled VDI payload templates.
+
+Payload files under payloads/ contain {{KEY}} placeholders that are filled
+from the VDI configuration before sending. Each file is read once, split into
+literal and placeholder segments, and re-read only when its mtime changes.
+"""
+import os
+import re
+import threading
+
+PAYLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "payloads")
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+
+class PayloadTemplate:
+    """A payload pre-split into literal text and {{KEY}} placeholders."""
+
+    def __init__(self, text):
+        parts = PLACEHOLDER_PATTERN.split(text)
+        # re.split alternates literal, key, literal, key, ..., literal
+        self.literals = parts[0::2]
+        self.keys = parts[1::2]
+
+    def render(self, config_data):
+        """Fill placeholders from config_data and return the payload."""
+        pieces = [self.literals[0]]
+        for key, literal in zip(self.keys, self.literals[1:]):
+            if key not in config_data:
+                raise KeyError(f"Missing config value for {key}")
+            pieces.append(str(config_data[key]))
+            pieces.append(literal)
+        return "".join(pieces)
+
+
+class PayloadTemplateRegistry:
+    """
+    Loads payload templates from a base directory and caches them by path.
+
+    Cached entries are invalidated when the file's mtime or size changes.
+    Paths outside the base directory are rejected.
+    """
+
+    def __init__(self, base_dir=PAYLOADS_DIR):
+        self.base_dir = os.path.realpath(base_dir)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, payload_file):
+        """Resolve payload_file (relative to the repo or base dir) inside base_dir."""
+        candidate = payload_file
+        if not os.path.isabs(candidate):
+            # Accept both "payloads/x.xml" and "x.xml"
+            head, _, tail = candidate.replace("\\", "/").partition("/")
+            if head == os.path.basename(self.base_dir) and tail:
+                candidate = tail
+            candidate = os.path.join(self.base_dir, candidate)
+        path = os.path.realpath(candidate)
+        if os.path.commonpath([path, self.base_dir]) != self.base_dir:
+            raise ValueError(f"Payload file must be inside {os.path.basename(self.base_dir)}/: {payload_file}")
+        return path
+
+    def get(self, payload_file):
+        """Return the PayloadTemplate for payload_file, loading it if stale or missing."""
+        path = self.resolve(payload_file)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        with open(path, "r") as file:
+            template = PayloadTemplate(file.read())
+        with self._lock:
+            self._cache[path] = (version, template)
+        return template
+
+    def render(self, payload_file, config_data):
+        """Load (or reuse) payload_file and render it with config_data."""
+        return self.get(payload_file).render(config_data)
+
+    def clear(self):
+        """Drop all cached templates."""
+        with self._lock:
+            self._cache.clear()
+
+
+# Shared registry used by the Flask send endpoints
+payload_templates = PayloadTemplateRegistry()
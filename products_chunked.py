@@ -0,0 +1,197 @@
+"""
+Chunked, memory-bounded mms-products processing.
+
+parse_seed_products_soap builds every product, code, tax and fee row of a
+message before merging them, so its memory grows with the catalog. Here the
+VDIXML text is streamed out of the envelope (vdi_envelope.iter_vdixml_bytes)
+into a pull parser, the VDITransaction is read one <Product> at a time, and
+the rows are
+merged into vdi_products rows every chunk_records products and at each
+market boundary. Each finished chunk goes to a ChunkSpool, which keeps
+chunks in memory up to a budget and spills the oldest to Parquet files
+beyond it.
+
+The loader reads the chunks back one at a time only once the whole message
+has parsed. A malformed catalog therefore loads nothing, and a valid one is
+staged chunk by chunk and committed with a single MERGE (see
+gcp_utils.load_chunks_to_bigquery).
+"""
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+import xml_backend
+from config import CHUNKED_PARSING
+from tracing import set_span_attributes
+from utils import append_product_rows, merge_products_data, new_product_rows
+from vdi_envelope import iter_vdixml_bytes
+
+
+class ChunkSpool:
+    """
+    Ordered DataFrame chunks, kept in memory up to a budget and spilled to Parquet beyond it.
+
+    Args:
+        memory_budget_bytes: In-memory chunk bytes above which the oldest chunks are spilled
+        spill_dir: Parent directory for spill files (default: the system temp dir)
+    """
+
+    def __init__(self, memory_budget_bytes: int, spill_dir: str = None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.spill_dir = spill_dir
+        self.rows = 0
+        self.chunks = 0
+        self.spilled = 0
+        self.in_memory_bytes = 0
+        # [DataFrame or spill file path, in-memory bytes] in chunk order
+        self._entries = []
+        self._dir = None
+
+    def add(self, df: pd.DataFrame):
+        """Append a chunk, spilling the oldest in-memory chunks while over budget."""
+        if df.empty:
+            return
+        size = int(df.memory_usage(deep=True).sum())
+        self._entries.append([df, size])
+        self.rows += len(df)
+        self.chunks += 1
+        self.in_memory_bytes += size
+        for entry in self._entries:
+            if self.in_memory_bytes <= self.memory_budget_bytes:
+                break
+            if isinstance(entry[0], pd.DataFrame):
+                entry[0] = self._spill(entry[0])
+                self.in_memory_bytes -= entry[1]
+
+    def _spill(self, df):
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="vdi-chunks-", dir=self.spill_dir)
+        path = os.path.join(self._dir, f"chunk-{self.spilled:05d}.parquet")
+        df.to_parquet(path, index=False)
+        self.spilled += 1
+        return path
+
+    def __iter__(self):
+        """Yield the chunks in order, reading spilled ones back one at a time."""
+        for data, _ in self._entries:
+            yield pd.read_parquet(data) if isinstance(data, str) else data
+
+    def close(self):
+        """Drop the chunks and delete any spill files."""
+        self._entries = []
+        self.in_memory_bytes = 0
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _merge_chunk(rows, on_parsed=None):
+    """Merge one chunk's rows into vdi_products rows (empty if any part is empty, as the inner joins give)."""
+    frames = {name: pd.DataFrame(table_rows) for name, table_rows in rows.items()}
+    if on_parsed is not None:
+        on_parsed(frames)
+    if any(df.empty for df in frames.values()):
+        return pd.DataFrame()
+    return merge_products_data(frames)
+
+
+def _iter_transaction_events(xml_text: str):
+    """Yield (event, element) start/end events for the VDITransaction inside an envelope."""
+    parser = xml_backend.pullparser(events=("start", "end"))
+    for piece in iter_vdixml_bytes(xml_text):
+        parser.feed(piece)
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+def iter_product_chunks(xml_text: str, chunk_records: int, on_parsed=None):
+    """
+    Yield merged vdi_products DataFrames for an mms-products envelope, chunk by chunk.
+
+    A chunk holds at most chunk_records products and never spans two markets.
+    on_parsed, if given, is called with each chunk's unmerged products,
+    product_codes, product_taxes and product_fees frames.
+
+    Raises:
+        ValueError: If the VDITransaction has no <MarketsCollection>
+    """
+    depth = 0
+    transaction_id = market_id = None
+    markets_el = market_el = products_update_el = None
+    rows = new_product_rows()
+    count = 0
+    for event, element in _iter_transaction_events(xml_text):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                transaction_id = element.get("TransactionID")
+                set_span_attributes({"vdi.transaction_id": transaction_id, "vdi.type": element.get("VDIXMLType")})
+            elif depth == 2 and element.tag == "MarketsCollection":
+                markets_el = element
+            elif depth == 3 and markets_el is not None and element.tag == "Market":
+                market_el, market_id = element, element.get("MarketID")
+            elif depth == 4 and market_el is not None and element.tag == "ProductsUpdate":
+                products_update_el = element
+            continue
+
+        depth -= 1
+        if depth == 4 and products_update_el is not None and element.tag == "Product":
+            append_product_rows(transaction_id, market_id, element, rows)
+            # Parsed products are dropped from the tree so it never holds the catalog
+            products_update_el.remove(element)
+            count += 1
+            if count >= chunk_records:
+                yield _merge_chunk(rows, on_parsed)
+                rows, count = new_product_rows(), 0
+        elif depth == 3 and element is products_update_el:
+            products_update_el = None
+        elif depth == 2 and element is market_el:
+            if count:
+                yield _merge_chunk(rows, on_parsed)
+                rows, count = new_product_rows(), 0
+            markets_el.remove(element)
+            market_el = None
+
+    if markets_el is None:
+        raise ValueError("No <MarketsCollection> in the inner VDI XML")
+
+
+def parse_products_chunked(xml_text: str, chunk_records: int = None, memory_budget_mb: int = None,
+                           spill_dir: str = None, on_parsed=None):
+    """
+    Parse and merge an mms-products envelope into a ChunkSpool of vdi_products chunks.
+
+    Args:
+        xml_text: VDIDataExchange SOAP envelope
+        chunk_records: Products per chunk (defaults to config)
+        memory_budget_mb: In-memory budget for finished chunks (defaults to config)
+        spill_dir: Parent directory for Parquet spill files (defaults to config)
+        on_parsed: Optional callable(frames) given each chunk's unmerged
+            per-product frames (e.g. CatalogBuilder.add)
+
+    Returns:
+        {"vdi_products": ChunkSpool}; the caller closes the spool once loaded
+    """
+    if chunk_records is None:
+        chunk_records = CHUNKED_PARSING["chunk_records"]
+    if memory_budget_mb is None:
+        memory_budget_mb = CHUNKED_PARSING["memory_budget_mb"]
+    spool = ChunkSpool(memory_budget_mb * 1024 * 1024, spill_dir or CHUNKED_PARSING["spill_dir"])
+    try:
+        for df in iter_product_chunks(xml_text, chunk_records, on_parsed):
+            spool.add(df)
+    except BaseException:
+        spool.close()
+        raise
+    set_span_attributes({"vdi.rows.merged": spool.rows, "vdi.chunks": spool.chunks,
+                         "vdi.chunks_spilled": spool.spilled})
+    return {"vdi_products": spool}
@@ -0,0 +1,231 @@
+"""
+Process-pool parsing of large, multi-market mms-products messages.
+
+parse_seed_products_soap walks every <Market> one after another on a single
+core. Markets, and the products within them, are independent, so here the
+VDITransaction is split into byte ranges of whole <Product> elements (about
+task_bytes long, never spanning two markets) that a process pool parses in
+parallel. Each worker returns its range's product, code, tax and fee frames,
+and they are concatenated in document order, so the result is the same as
+parse_seed_products_soap's and goes through the same merge step.
+
+The ranges are located by scanning for the <Market>, <ProductsUpdate> and
+<Product> tags instead of parsing, which is exact for VDI XML (it carries no
+comments or CDATA sections); start tags are matched attribute by attribute,
+so a ">" inside a quoted value does not end them. Every range is still
+parsed strictly by its worker.
+"""
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from xml.etree import ElementTree as ET
+
+import pandas as pd
+
+import utils
+import xml_backend
+from config import PARALLEL_PARSING
+from tracing import set_span_attributes, span
+from utils import append_product_rows, new_product_rows
+from vdi_envelope import iter_vdixml_bytes
+
+_TRANSACTION_TAG = re.compile(rb"<VDITransaction[\s/>]")
+_MARKETS_TAG = re.compile(rb"<MarketsCollection[\s/>]")
+_MARKETS_END_TAG = re.compile(rb"</MarketsCollection\s*>")
+_MARKET_TAG = re.compile(rb"<Market[\s/>]")
+_MARKET_END_TAG = re.compile(rb"</Market\s*>")
+_PRODUCTS_UPDATE_TAG = re.compile(rb"<ProductsUpdate[\s/>]")
+_PRODUCTS_UPDATE_END_TAG = re.compile(rb"</ProductsUpdate\s*>")
+_PRODUCT_TAG = re.compile(rb"<Product[\s/>]")
+# A whole start tag; quoted attribute values may contain ">" (only "<" must be escaped)
+_START_TAG = re.compile(rb"""<[^\s/>]+(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|'[^']*'))*\s*/?>""")
+_XMLNS_ATTR = re.compile(rb"""\sxmlns(?::[\w.-]+)?=(?:"[^"]*"|'[^']*')""")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def use_parallel_parsing(size: int) -> bool:
+    """Return True when a payload of size characters should be parsed in the process pool."""
+    return (PARALLEL_PARSING["enabled"] and PARALLEL_PARSING["workers"] > 1
+            and size >= PARALLEL_PARSING["min_bytes"])
+
+
+def get_pool():
+    """Return the shared parsing pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Worker processes must not fork the server's threads
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=PARALLEL_PARSING["workers"],
+                                        mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def reset_pool():
+    """Shut the parsing pool down; the next parse starts a new one."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _start_tag(data: bytes, start: int):
+    """Return (start tag bytes, index after its '>') for the tag at data[start]."""
+    found = _START_TAG.match(data, start)
+    # A malformed tag is cut at its first ">" and rejected when its attributes are parsed
+    end = found.end() if found is not None else data.index(b">", start) + 1
+    return data[start:end], end
+
+
+def _tag_attrib(tag: bytes) -> dict:
+    """Attributes of a start tag, parsed on its own."""
+    if not tag.endswith(b"/>"):
+        tag = tag[:-1] + b"/>"
+    return dict(xml_backend.fromstring(tag).attrib)
+
+
+def split_products(data: bytes, task_bytes: int):
+    """
+    Split VDITransaction XML into per-market ranges of whole <Product> elements.
+
+    Args:
+        data: mms-products VDITransaction XML (UTF-8)
+        task_bytes: Approximate size of each range; a range always holds at
+            least one product and never spans two markets
+
+    Returns:
+        (transaction attrib, namespace declarations, market attribs, tasks)
+        where tasks is a list of (MarketID, range bytes) in document order
+
+    Raises:
+        ValueError: If there is no <VDITransaction> or <MarketsCollection>
+    """
+    found = _TRANSACTION_TAG.search(data)
+    if found is None:
+        raise ValueError("No <VDITransaction> in the inner VDI XML")
+    tag, pos = _start_tag(data, found.start())
+    transaction = _tag_attrib(tag)
+    # Ranges are parsed outside the VDITransaction, so they need its namespace declarations
+    namespaces = b"".join(_XMLNS_ATTR.findall(tag))
+
+    found = _MARKETS_TAG.search(data, pos)
+    if found is None:
+        raise ValueError("No <MarketsCollection> in the inner VDI XML")
+    tag, pos = _start_tag(data, found.start())
+    found = _MARKETS_END_TAG.search(data, pos)
+    end = pos if tag.endswith(b"/>") or found is None else found.start()
+
+    markets, tasks = [], []
+    while True:
+        found = _MARKET_TAG.search(data, pos, end)
+        if found is None:
+            break
+        tag, pos = _start_tag(data, found.start())
+        market = _tag_attrib(tag)
+        markets.append(market)
+        if tag.endswith(b"/>"):
+            continue
+        market_end = _MARKET_END_TAG.search(data, pos, end)
+        if market_end is None:
+            raise ValueError(f"Unterminated <Market MarketID={market.get('MarketID')!r}>")
+
+        # Only the first <ProductsUpdate> is read, as in parse_seed_products_soap
+        update = _PRODUCTS_UPDATE_TAG.search(data, pos, market_end.start())
+        if update is not None:
+            tag, region_start = _start_tag(data, update.start())
+            update_end = _PRODUCTS_UPDATE_END_TAG.search(data, region_start, market_end.start())
+            if not tag.endswith(b"/>") and update_end is not None:
+                region_end = update_end.start()
+                first = _PRODUCT_TAG.search(data, region_start, region_end)
+                cut = first.start() if first is not None else region_end
+                while cut < region_end:
+                    # Cut at the first product starting task_bytes or more past the last cut
+                    found = _PRODUCT_TAG.search(data, cut + task_bytes, region_end)
+                    next_cut = found.start() if found is not None else region_end
+                    tasks.append((market.get("MarketID"), data[cut:next_cut]))
+                    cut = next_cut
+        pos = market_end.end()
+    return transaction, namespaces, markets, tasks
+
+
+def _parse_range(backend: str, namespaces: bytes, transaction_id, market_id, fragment: bytes):
+    """Pool task: parse one range of <Product> elements into product, code, tax and fee frames."""
+    try:
+        root = xml_backend.get_backend(backend).fromstring(
+            b"<ProductsUpdate" + namespaces + b">" + fragment + b"</ProductsUpdate>")
+    except xml_backend.XML_PARSE_ERRORS as e:
+        # lxml's errors do not pickle back to the parent process
+        raise ET.ParseError(f"Market {market_id}: {e}") from None
+    rows = new_product_rows()
+    for prod_el in root.findall("Product"):
+        append_product_rows(transaction_id, market_id, prod_el, rows)
+    return {name: pd.DataFrame(table_rows) for name, table_rows in rows.items()}
+
+
+def _concat(frames):
+    frames = [df for df in frames if not df.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def parse_products_parallel(xml_text: str):
+    """
+    Parse a SEED mms-products envelope in the process pool.
+
+    Args:
+        xml_text: VDIDataExchange SOAP envelope
+
+    Returns:
+        dict shaped like parse_seed_products_soap's (transaction, markets,
+        products, product_codes, product_taxes, product_fees)
+    """
+    # expat's streaming unescape is about twice as fast as building the envelope tree
+    data = b"".join(iter_vdixml_bytes(xml_text))
+    with span("vdi.split_products", {"vdi.inner_bytes": len(data)}) as split_span:
+        transaction, namespaces, markets, tasks = split_products(data, PARALLEL_PARSING["task_bytes"])
+        split_span.set_attribute("vdi.parallel_tasks", len(tasks))
+    del data
+
+    transaction_id = transaction.get("TransactionID")
+    set_span_attributes({"vdi.transaction_id": transaction_id, "vdi.type": transaction.get("VDIXMLType")})
+    tx = {name: transaction.get(name) for name in (
+        "VDIXMLVersion", "VDIXMLType", "ProviderID", "ApplicationID", "ApplicationVersion",
+        "OperatorID", "TransactionID", "TransactionTime")}
+
+    backend = xml_backend.get_backend().name
+    try:
+        results = list(get_pool().map(_parse_range, repeat(backend), repeat(namespaces), repeat(transaction_id),
+                                      [market_id for market_id, _ in tasks], [fragment for _, fragment in tasks]))
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start a fresh pool for the next message
+        reset_pool()
+        raise
+
+    frames = {
+        "transaction": pd.DataFrame([tx]),
+        "markets": pd.DataFrame([{"TransactionID": transaction_id, "MarketID": market.get("MarketID"),
+                                  "CatalogSize": market.get("CatalogSize")} for market in markets]),
+    }
+    for name in new_product_rows():
+        frames[name] = _concat(result[name] for result in results)
+    set_span_attributes({
+        "vdi.rows.markets": len(frames["markets"]),
+        "vdi.rows.products": len(frames["products"]),
+        "vdi.rows.codes": len(frames["product_codes"]),
+        "vdi.rows.taxes": len(frames["product_taxes"]),
+        "vdi.rows.fees": len(frames["product_fees"]),
+    })
+
+    if utils.dry_run:
+        utils.save_df(frames["transaction"], 'mms-products-transaction')
+        utils.save_df(frames["markets"], 'mms-products-markets')
+        utils.save_df(frames["products"], 'mms-products-products')
+        utils.save_df(frames["product_codes"], 'mms-products-codes')
+        utils.save_df(frames["product_taxes"], 'mms-products-taxes')
+        utils.save_df(frames["product_fees"], 'mms-products-fees')
+    return frames
@@ -0,0 +1,209 @@
+"""
+ActiveMQ -> SEED mms-sales bridge.
+
+Kiosk sale events arrive on the ActiveMQ topic as JSON, either a single sale
+in the /send/sales Sale shape ({"MarketID": ..., "KioskID": ..., "Items": ...})
+or any payload /send/sales accepts ({"sale": {...}}, {"sales": [...]},
+{"Sales": {"Sale": [...]}}). An optional "operator_id" field, or the
+operator-id message header, selects the SEED operator.
+
+SalesBridge.handle_batch() is an ActiveMQConsumer batch handler. It groups
+a micro-batch of events by operator, builds one mms-sales VDIDataExchange per
+group (split at max_sales_per_transaction) and sends them to SEED. It returns
+only once SEED has accepted every transaction, so the batch is acknowledged
+only after that. While SEED is unreachable, throttling or answering 5xx, the
+handler raises SeedUnavailableError (a RetryMessages) and the consumer
+retries the batch until SEED is back, never sending it to the failure
+destination. Events that can never be sent (bad JSON, sales failing
+validation, or transactions SEED rejects with a 4xx or a SOAP Fault) are
+rejected to the failure destination and do not hold up the rest of the batch.
+
+Resends are avoided only within one process: accepted TransactionIDs are
+remembered in memory, and a TransactionID is derived from the exact message
+ids in its transaction. Messages redelivered after a restart or reconnect
+arrive in batches split differently, get new TransactionIDs and are sent
+again, so SEED can receive a sale twice in that case.
+
+Usage:
+    python sales_bridge.py
+    python activemq_workers.py --handler sales_bridge:handle_batch --batch
+"""
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+import requests
+
+from activemq_consumer import ActiveMQConsumer, RejectMessages, RetryMessages
+from config import DEFAULT_OPERATOR_ID, SALES_BRIDGE
+from sales_schema import SalesValidationError, normalize_sales, sales_list
+from sales_template import build_vdi_dataexchange_from_json
+from seed_client import RETRY_STATUSES, send_vdi_dataexchange
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Namespace for TransactionIDs derived from the message ids in a transaction
+TRANSACTION_NAMESPACE = uuid.UUID("6f1c1f0e-3b55-4c36-9a55-2f0d8c1f5a11")
+
+
+class SeedUnavailableError(RetryMessages):
+    """SEED could not be reached or failed transiently; the batch is retried until it accepts."""
+
+
+class SalesBridge:
+    """
+    Batch handler that forwards sale events from ActiveMQ to SEED.
+
+    Args:
+        environment: SEED_ENDPOINTS key to send to (defaults to config)
+        max_sales_per_transaction: Maximum sales in one mms-sales transaction (defaults to config)
+        remember_sent: Number of accepted TransactionIDs remembered so a retried
+            batch does not resend transactions SEED already accepted (in this
+            process only, and only for a batch with the same messages)
+    """
+
+    def __init__(self, environment: str = None, max_sales_per_transaction: int = None,
+                 remember_sent: int = 10000):
+        self.environment = environment or SALES_BRIDGE["environment"]
+        self.max_sales_per_transaction = max_sales_per_transaction or SALES_BRIDGE["max_sales_per_transaction"]
+        self.remember_sent = remember_sent
+        self._sent = OrderedDict()
+        self._sent_lock = threading.Lock()
+
+    def parse_message(self, headers: dict, body):
+        """
+        Return (operator_id, list of sale dicts) for one message.
+
+        Raises:
+            ValueError: If the body is not JSON or contains no sales
+        """
+        event = json.loads(body)
+        if isinstance(event, list):
+            return headers.get("operator-id") or DEFAULT_OPERATOR_ID, event
+        if not isinstance(event, dict):
+            raise ValueError("Sale event must be a JSON object or list")
+        operator_id = event.get("operator_id") or headers.get("operator-id") or DEFAULT_OPERATOR_ID
+        sales = sales_list(event)
+        if not sales and ("MarketID" in event or "market_id" in event):
+            sales = [event]
+        if not sales:
+            raise ValueError("No sales in event")
+        return operator_id, sales
+
+    def handle_batch(self, batch):
+        """
+        Send a batch of (headers, body) sale events to SEED.
+
+        Raises:
+            SeedUnavailableError: If SEED fails transiently (the whole batch is
+                retried; transactions already accepted are skipped)
+            RejectMessages: After everything else was sent, for events that can
+                never be sent or that SEED rejected
+        """
+        rejected = []
+        groups = OrderedDict()
+        for index, (headers, body) in enumerate(batch):
+            try:
+                operator_id, sales = self.parse_message(headers, body)
+            except ValueError as e:
+                rejected.append((index, f"Invalid sale event: {e}"))
+                continue
+            groups.setdefault(operator_id, []).append((index, headers.get("message-id", ""), sales))
+
+        with span("bridge.sales_batch", {"bridge.messages": len(batch), "bridge.operators": len(groups)}):
+            for operator_id, events in groups.items():
+                for chunk in self._chunks(events):
+                    rejected.extend(self._send_chunk(operator_id, chunk))
+
+        if rejected:
+            raise RejectMessages(rejected)
+
+    def _chunks(self, events):
+        """Split events into runs of at most max_sales_per_transaction sales (an event is never split)."""
+        chunk, count = [], 0
+        for event in events:
+            if chunk and count + len(event[2]) > self.max_sales_per_transaction:
+                yield chunk
+                chunk, count = [], 0
+            chunk.append(event)
+            count += len(event[2])
+        if chunk:
+            yield chunk
+
+    def _send_chunk(self, operator_id, chunk):
+        """Validate and send one transaction; returns (index, reason) for events rejected by validation or SEED."""
+        rejected = []
+        try:
+            normalize_sales({"sales": [sale for _, _, sales in chunk for sale in sales]})
+        except SalesValidationError:
+            # Find the offending events; the rest are sent without them
+            valid = []
+            for event in chunk:
+                try:
+                    normalize_sales({"sales": event[2]})
+                    valid.append(event)
+                except SalesValidationError as e:
+                    rejected.append((event[0], f"Invalid sales: {e}"))
+            chunk = valid
+        if not chunk:
+            return rejected
+
+        # Same messages -> same TransactionID, so a retried batch can be recognised
+        transaction_id = str(uuid.uuid5(TRANSACTION_NAMESPACE, ",".join(message_id for _, message_id, _ in chunk)))
+        with self._sent_lock:
+            already_sent = transaction_id in self._sent
+        if already_sent:
+            logger.info(f"Skipping mms-sales transaction {transaction_id} already accepted by SEED")
+            return rejected
+
+        sales = [sale for _, _, event_sales in chunk for sale in event_sales]
+        request_data = {"sales": sales, "operator_id": operator_id, "transaction_id": transaction_id}
+        xml = build_vdi_dataexchange_from_json(request_data, "mms-sales", self.environment)
+        try:
+            status, response = send_vdi_dataexchange(xml, self.environment)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            raise SeedUnavailableError(f"SEED unreachable for transaction {transaction_id}: {e}") from e
+        if status >= 500 or status in RETRY_STATUSES:
+            raise SeedUnavailableError(f"SEED returned {status} for transaction {transaction_id}: {response[:500]}")
+        if not 200 <= status < 300 or "Fault>" in response:
+            # SEED answered and refused this transaction; resending it would not help
+            reason = f"SEED rejected transaction {transaction_id} with {status}: {response[:500]}"
+            logger.error(reason)
+            return rejected + [(index, reason) for index, _, _ in chunk]
+
+        with self._sent_lock:
+            self._sent[transaction_id] = True
+            while len(self._sent) > self.remember_sent:
+                self._sent.popitem(last=False)
+        logger.info(f"SEED accepted mms-sales transaction {transaction_id} "
+                    f"({len(sales)} sales from {len(chunk)} messages, operator {operator_id})")
+        return rejected
+
+
+_default_bridge = None
+_default_bridge_lock = threading.Lock()
+
+
+def handle_batch(batch):
+    """Batch handler using a process-wide SalesBridge (for activemq_workers.py --batch)."""
+    global _default_bridge
+    with _default_bridge_lock:
+        if _default_bridge is None:
+            _default_bridge = SalesBridge()
+    _default_bridge.handle_batch(batch)
+
+
+def main():
+    logger.info(f"Starting sales bridge to SEED ({SALES_BRIDGE['environment']})")
+    consumer = ActiveMQConsumer(batch_handler=handle_batch)
+    try:
+        consumer.start(blocking=True)
+    finally:
+        consumer.stop()
+
+
+if __name__ == "__main__":
+    main()
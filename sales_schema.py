@@ -0,0 +1,332 @@
+"""
+Schema-driven normalizer for mms-sales JSON payloads.
+
+Sales JSON accepts several spellings for each field (e.g. "MarketID" or
+"market_id") and both singular and plural collection shapes. The key maps
+below are compiled once at import time, so each source dict is read with a
+fixed set of lookups and converted into typed records that the VDI XML
+writer consumes. Validation errors are collected across the whole batch and raised
+together.
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+class SalesValidationError(ValueError):
+    """Raised when a sales payload fails validation; carries every error found."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors))
+
+
+@dataclass(slots=True)
+class TaxRecord:
+    name: str
+    rate: str
+    value: str
+    count: str
+    total: str
+
+
+@dataclass(slots=True)
+class ItemRecord:
+    product_id: str
+    code: str
+    quantity: str
+    price: str
+    cost: str
+    total: str
+    fees_total: Optional[str] = None
+    taxes_total: Optional[str] = None
+    taxes: List[TaxRecord] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class TenderRecord:
+    type: str
+    amount: str
+
+
+@dataclass(slots=True)
+class SaleRecord:
+    market_id: str
+    kiosk_id: str
+    sale_id: str
+    sale_time: str
+    price: str
+    discount: str
+    total: str
+    consumer_id: Optional[str] = None
+    fees_total: Optional[str] = None
+    taxes_total: Optional[str] = None
+    items: List[ItemRecord] = field(default_factory=list)
+    tenders: List[TenderRecord] = field(default_factory=list)
+
+
+def format_decimal(value):
+    """Format numeric value to 2 decimal places for currency fields"""
+    if value is None:
+        return "0.00"
+    try:
+        num = float(value)
+        return f"{num:.2f}"
+    except (ValueError, TypeError):
+        return str(value)
+
+
+def _normalize_list(data, singular_key):
+    """Normalize data that may be a dict with a singular key or already a list."""
+    if data is None:
+        return []
+    if isinstance(data, dict) and singular_key in data:
+        values = data[singular_key]
+    else:
+        values = data
+    if values is None:
+        return []
+    if isinstance(values, list):
+        return values
+    return [values]
+
+
+# Field kinds
+_TEXT = "text"          # str(value); present unless None or ""
+_DECIMAL = "decimal"    # format_decimal(value); present unless None or ""
+_OBJECT = "object"      # value returned as-is; present when truthy
+_TOTAL = "total"        # formatted Total of a truthy Fees/Taxes container ("0.00" without one)
+
+_TOTAL_KEYS = ("Total", "total")
+
+_EMPTY_GET = {}.get
+
+
+def _first_value(get, keys):
+    """First candidate value that is not None or "" (None when there is none)."""
+    for key in keys:
+        value = get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+class _RecordSchema:
+    """
+    Precompiled key map for one record type.
+
+    Args:
+        label: Prefix used in error messages (e.g. "Sale")
+        fields: Sequence of (name, candidate_keys, kind, required) tuples.
+                Earlier candidate keys take precedence over later ones.
+    """
+
+    def __init__(self, label, fields):
+        self.label = label
+        self.fields = [
+            (tuple(keys), kind, f"{label}.{name}" if required else None)
+            for name, keys, kind, required in fields
+        ]
+
+    def extract(self, source, location, errors):
+        """
+        Extract field values from source.
+
+        Returns a list of values in field order (None where absent). Missing
+        required fields are appended to errors.
+        """
+        get = source.get if isinstance(source, dict) else _EMPTY_GET
+        values = []
+        for keys, kind, required_name in self.fields:
+            if kind is _OBJECT or kind is _TOTAL:
+                # First truthy candidate
+                value = None
+                for key in keys:
+                    value = get(key)
+                    if value:
+                        break
+                else:
+                    value = None
+                if kind is _TOTAL and value is not None:
+                    # format_decimal turns a missing Total into "0.00"
+                    total_get = value.get if isinstance(value, dict) else _EMPTY_GET
+                    value = format_decimal(_first_value(total_get, _TOTAL_KEYS))
+            else:
+                value = _first_value(get, keys)
+                if value is not None:
+                    value = str(value) if kind is _TEXT else format_decimal(value)
+            if value is None and required_name is not None:
+                errors.append(f"{location}: Missing required field '{required_name}'")
+            values.append(value)
+        return values
+
+
+_SALE_SCHEMA = _RecordSchema("Sale", [
+    ("MarketID", ("MarketID", "market_id"), _TEXT, True),
+    ("KioskID", ("KioskID", "kiosk_id"), _TEXT, True),
+    ("ConsumerID", ("ConsumerID", "consumer_id"), _OBJECT, False),
+    ("SaleID", ("SaleID", "sale_id"), _TEXT, True),
+    ("SaleTime", ("SaleTime", "sale_time"), _TEXT, True),
+    ("Summary", ("Summary", "summary"), _OBJECT, False),
+    ("Items", ("Items", "items"), _OBJECT, False),
+    ("Tenders", ("Tenders", "tenders"), _OBJECT, False),
+])
+
+_SUMMARY_SCHEMA = _RecordSchema("Summary", [
+    ("Price", ("Price", "price"), _DECIMAL, True),
+    ("Discount", ("Discount", "discount"), _DECIMAL, True),
+    ("Total", ("Total", "total"), _DECIMAL, True),
+    ("FeesTotal", ("Fees", "fees"), _TOTAL, False),
+    ("TaxesTotal", ("Taxes", "taxes"), _TOTAL, False),
+])
+
+_ITEM_SCHEMA = _RecordSchema("Item", [
+    ("ProductID", ("ProductID", "product_id"), _TEXT, True),
+    ("Code", ("Code", "code"), _TEXT, True),
+    ("Quantity", ("Quantity", "quantity"), _TEXT, True),
+    ("Price", ("Price", "price"), _DECIMAL, True),
+    ("Cost", ("Cost", "cost"), _DECIMAL, True),
+    ("Total", ("Total", "total"), _DECIMAL, True),
+    ("FeesTotal", ("Fees", "fees"), _TOTAL, False),
+    ("Taxes", ("Taxes", "taxes"), _OBJECT, False),
+])
+
+_TAX_SCHEMA = _RecordSchema("Item.Taxes.Tax", [
+    ("Name", ("Name", "name"), _TEXT, True),
+    ("Rate", ("Rate", "rate"), _DECIMAL, True),
+    ("Value", ("Value", "value"), _DECIMAL, True),
+    ("Count", ("Count", "count"), _TEXT, True),
+    ("Total", ("Total", "total"), _TEXT, True),
+])
+
+_TENDER_SCHEMA = _RecordSchema("Tender", [
+    ("Type", ("Type", "type"), _TEXT, True),
+    ("Amount", ("Amount", "amount"), _DECIMAL, True),
+])
+
+# An item Taxes container's own Total (None when absent)
+_TOTAL_SCHEMA = _RecordSchema("Total", [
+    ("Total", _TOTAL_KEYS, _DECIMAL, False),
+])
+
+
+def _normalize_tax_list(taxes_data):
+    """Item taxes: a list, a single Tax, or a {Total, Tax} container."""
+    if isinstance(taxes_data, dict) and "Tax" not in taxes_data:
+        # A bare {Total: ...} container carries no individual taxes
+        return []
+    return _normalize_list(taxes_data, "Tax")
+
+
+def _normalize_item(item, location, errors):
+    if not isinstance(item, dict):
+        errors.append(f"{location}: Each item must be an object")
+        return None
+    (product_id, code, quantity, price, cost, total,
+     fees_total, taxes_data) = _ITEM_SCHEMA.extract(item, location, errors)
+
+    raw_taxes = []
+    for tax_index, tax in enumerate(_normalize_tax_list(taxes_data)):
+        raw_taxes.append(_TAX_SCHEMA.extract(tax, f"{location}.Tax[{tax_index}]", errors))
+
+    taxes_total = None
+    if isinstance(taxes_data, dict):
+        taxes_total = _TOTAL_SCHEMA.extract(taxes_data, location, [])[0]
+    if taxes_total is None and raw_taxes:
+        try:
+            taxes_total = format_decimal(sum(float(tax[4]) for tax in raw_taxes if tax[4] is not None))
+        except ValueError:
+            errors.append(f"{location}: Invalid value for 'Item.Taxes.Tax.Total'")
+    taxes = [TaxRecord(name, rate, value, count, format_decimal(tax_total))
+             for name, rate, value, count, tax_total in raw_taxes]
+
+    return ItemRecord(
+        product_id=product_id, code=code, quantity=quantity,
+        price=price, cost=cost, total=total,
+        fees_total=fees_total,
+        taxes_total=taxes_total,
+        taxes=taxes,
+    )
+
+
+def _normalize_sale(sale, location, errors):
+    if not isinstance(sale, dict):
+        errors.append(f"{location}: Each sale must be an object")
+        return None
+    (market_id, kiosk_id, consumer_id, sale_id, sale_time,
+     summary, items_data, tenders_data) = _SALE_SCHEMA.extract(sale, location, errors)
+
+    price = discount = total = fees_total = taxes_total = None
+    if isinstance(summary, dict):
+        price, discount, total, fees_total, taxes_total = _SUMMARY_SCHEMA.extract(
+            summary, f"{location}.Summary", errors)
+    else:
+        errors.append(f"{location}: Summary data is required")
+
+    items = []
+    item_list = _normalize_list(items_data, "Item")
+    for item_index, item in enumerate(item_list):
+        record = _normalize_item(item, f"{location}.Item[{item_index}]", errors)
+        if record is not None:
+            items.append(record)
+    if not item_list:
+        errors.append(f"{location}: At least one item is required (Items.Item)")
+
+    tenders = []
+    tender_list = _normalize_list(tenders_data, "Tender")
+    for tender_index, tender in enumerate(tender_list):
+        tender_location = f"{location}.Tender[{tender_index}]"
+        if not isinstance(tender, dict):
+            errors.append(f"{tender_location}: Each tender must be an object")
+            continue
+        tender_type, amount = _TENDER_SCHEMA.extract(tender, tender_location, errors)
+        tenders.append(TenderRecord(tender_type, amount))
+    if not tender_list:
+        errors.append(f"{location}: At least one tender is required (Tenders.Tender)")
+
+    return SaleRecord(
+        market_id=market_id, kiosk_id=kiosk_id, sale_id=sale_id, sale_time=sale_time,
+        price=price, discount=discount, total=total,
+        consumer_id=str(consumer_id) if consumer_id else None,
+        fees_total=fees_total, taxes_total=taxes_total,
+        items=items, tenders=tenders,
+    )
+
+
+def sales_list(request_data):
+    """Extract the list of sales from the request payload (Sales.Sale, sales or sale)."""
+    sales = []
+    for data in (request_data.get("Sales"), request_data.get("sales")):
+        if data is None:
+            continue
+        sales = _normalize_list(data, "Sale")
+        if sales:
+            break
+
+    if not sales:
+        single_sale = request_data.get("sale") or request_data.get("Sale")
+        if single_sale is not None:
+            sales = [single_sale]
+    return sales
+
+
+def normalize_sales(request_data) -> List[SaleRecord]:
+    """
+    Normalize a sales JSON payload into typed SaleRecords in one pass.
+
+    Raises:
+        SalesValidationError: with every validation error found in the batch
+    """
+    sales = sales_list(request_data)
+    if not sales:
+        raise SalesValidationError(["At least one sale is required (Sales.Sale or sales)"])
+
+    errors = []
+    records = []
+    for sale_index, sale in enumerate(sales):
+        record = _normalize_sale(sale, f"Sale[{sale_index}]", errors)
+        if record is not None:
+            records.append(record)
+
+    if errors:
+        raise SalesValidationError(errors)
+    return records
@@ -1,51 +1,114 @@
 """VDI template and helper functions for building VDI XML (sales, kiosks, etc.)"""
 from config import VDI_CONFIG, DEFAULT_OPERATOR_ID
+from sales_schema import normalize_sales
+from vdi_compression import StreamingCompressor, compression_elements, select_compression
+import sys
 import uuid
 from datetime import datetime
-from xml.sax.saxutils import escape
-
-
-def _get_field(source, candidate_keys, field_name, required=True, default=None):
-    """Fetch value from dict supporting multiple candidate keys."""
-    if isinstance(source, dict):
-        for key in candidate_keys:
-            if key in source and source[key] not in (None, ""):
-                return str(source[key])
-    if required:
-        raise ValueError(f"Missing required field '{field_name}'")
-    return default
-
-
-def _normalize_list(data, singular_key):
-    """Normalize data that may be a dict with a singular key or already a list."""
-    if data is None:
-        return []
-    if isinstance(data, dict) and singular_key in data:
-        values = data[singular_key]
-    else:
-        values = data
-    if values is None:
-        return []
-    if isinstance(values, list):
-        return values
-    return [values]
+from functools import lru_cache
+
+# Characters escaped in XML attribute values
+_XML_ESCAPES = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&apos;"}
+
+# Single-pass translation tables. Values embedded in VDIXML are escaped twice
+# (once as an attribute, once for the VDIXML element), so the second table
+# maps each character straight to its doubly escaped form.
+_ATTR_ESCAPE_TABLE = str.maketrans(_XML_ESCAPES)
+_VDIXML_ATTR_ESCAPE_TABLE = str.maketrans({
+    char: entity.translate(_ATTR_ESCAPE_TABLE) for char, entity in _XML_ESCAPES.items()
+})
+
+# Default size of the chunks yielded by iter_vdi_dataexchange_from_json
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+# Markup of the repeated <Sale> parts as format strings, one "{}" per
+# attribute value (an optional ConsumerID attribute goes in SALE_OPEN's third)
+_PLAIN_TEMPLATES = {
+    "SALE_OPEN": '    <Sale MarketID="{}" KioskID="{}"{} SaleID="{}" SaleTime="{}">\n'
+                 '      <Summary Price="{}" Discount="{}" Total="{}">',
+    "CONSUMER": ' ConsumerID="{}"',
+    "SALE_FEES": '\n        <Fees Total="{}"/>',
+    "SALE_TAXES": '\n        <Taxes Total="{}"/>',
+    "ITEMS_OPEN": "\n      </Summary>\n\n      <Items>",
+    "ITEM_OPEN": '\n        <Item ProductID="{}" Code="{}" Quantity="{}" Price="{}" Cost="{}" Total="{}">',
+    "ITEM_FEES": '\n          <Fees Total="{}"/>',
+    "ITEM_TAXES_OPEN": '\n          <Taxes Total="{}">',
+    "TAX": '\n            <Tax Name="{}" Rate="{}" Value="{}" Count="{}" Total="{}"/>',
+    "ITEM_TAXES_CLOSE": "\n          </Taxes>",
+    "ITEM_TAXES": '\n          <Taxes Total="{}"/>',
+    "ITEM_CLOSE": "\n        </Item>",
+    "TENDERS_OPEN": "\n      </Items>\n\n      <Tenders>\n",
+    "FIRST_TENDER": '        <Tender Type="{}" Amount="{}"/>',
+    "TENDER": '\n        <Tender Type="{}" Amount="{}"/>',
+    "SALE_CLOSE": "\n      </Tenders>\n\n    </Sale>",
+}
 
+# The same templates with the markup escaped for embedding in VDIXML
+_ESCAPED_TEMPLATES = {name: text.translate(_ATTR_ESCAPE_TABLE) for name, text in _PLAIN_TEMPLATES.items()}
 
-def build_vdi_dataexchange(vdi_type, vdi_xml_content, request_data=None):
+
+@lru_cache(maxsize=256)
+def _escape_markup(text):
+    """Escape a constant markup fragment for embedding in VDIXML (cached)."""
+    return text.translate(_ATTR_ESCAPE_TABLE)
+
+
+class VDITransactionWriter:
     """
-    Generic function to build VDIDataExchange XML for any VDI type
-    
+    Collects VDITransaction XML as a list of text fragments, joined once by drain().
+
+    Markup comes from templates escaped ahead of time for the target context,
+    and attribute values are escaped in one pass via translation tables, so
+    the document is only copied when it is joined.
+
     Args:
-        vdi_type: VDI type (e.g., "mms-sales", "mms-kiosks")
-        vdi_xml_content: The escaped VDITransaction XML content to embed in VDIXML
-        request_data: Optional dict with configuration overrides
-    
-    Returns:
-        VDIDataExchange XML string
+        escaped: If True, output is escaped for embedding in the VDIXML element;
+                 otherwise plain VDITransaction XML is produced.
     """
-    if request_data is None:
-        request_data = {}
-    
+
+    def __init__(self, escaped=True):
+        self.escaped = escaped
+        self.parts = []
+        self.templates = _ESCAPED_TEMPLATES if escaped else _PLAIN_TEMPLATES
+        self._attr_table = _VDIXML_ATTR_ESCAPE_TABLE if escaped else _ATTR_ESCAPE_TABLE
+        # Characters in parts[:_counted], so size() only measures new fragments
+        self._size = 0
+        self._counted = 0
+
+    def write(self, text):
+        """Append text that is already in the output form (escaped markup or a filled template)."""
+        self.parts.append(text)
+
+    def markup(self, text):
+        """Write a markup fragment (tags, attribute names, whitespace)."""
+        self.parts.append(_escape_markup(text) if self.escaped else text)
+
+    def value(self, value):
+        """Return an attribute value escaped for the target context ("" for None)."""
+        return "" if value is None else str(value).translate(self._attr_table)
+
+    def attr(self, value):
+        """Write an attribute value, escaping it for the target context."""
+        if value is not None:
+            self.parts.append(str(value).translate(self._attr_table))
+
+    def size(self):
+        """Number of characters currently buffered."""
+        self._size += sum(map(len, self.parts[self._counted:]))
+        self._counted = len(self.parts)
+        return self._size
+
+    def drain(self):
+        """Return the buffered text and reset the buffer."""
+        text = "".join(self.parts)
+        self.parts = []
+        self._size = self._counted = 0
+        return text
+
+
+def _vdi_dataexchange_head(vdi_type, request_data, compression_type=None):
+    """Build the VDIDataExchange XML preceding the VDIXML content."""
     # Get configuration from request or use defaults from config.py
     operator_id = request_data.get("operator_id", DEFAULT_OPERATOR_ID)
     provider_id = request_data.get("provider_id", VDI_CONFIG["provider_id"])
@@ -53,14 +116,14 @@ def build_vdi_dataexchange(vdi_type, vdi_xml_content, request_data=None):
     application_version = request_data.get("application_version", VDI_CONFIG["application_version"])
     vdi_xml_version = request_data.get("vdi_xml_version", VDI_CONFIG["vdi_xml_version"])
     encoding = request_data.get("encoding", VDI_CONFIG["encoding"])
-    
+
     # Generate transaction ID and time if not provided
     transaction_id = request_data.get("transaction_id", str(uuid.uuid4()))
-    transaction_time = request_data.get("transaction_time", 
+    transaction_time = request_data.get("transaction_time",
                                         datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"))
-    
-    # Build VDIDataExchange XML
-    vdi_dataexchange = f"""<VDIDataExchange xmlns="urn:VDIDataExchangeService" xmlns:ns2="http://schemas.microsoft.com/2003/10/Serialization/">
+    compression_type_xml, compression_param_xml = compression_elements(compression_type)
+
+    return f"""<VDIDataExchange xmlns="urn:VDIDataExchangeService" xmlns:ns2="http://schemas.microsoft.com/2003/10/Serialization/">
     <VDIXMLVersion>{vdi_xml_version}</VDIXMLVersion>
     <VDIXMLType>{vdi_type}</VDIXMLType>
     <ProviderID>{escape_xml_attr(provider_id)}</ProviderID>
@@ -69,220 +132,222 @@ def build_vdi_dataexchange(vdi_type, vdi_xml_content, request_data=None):
     <TransactionID>{escape_xml_attr(transaction_id)}</TransactionID>
     <TransactionTime>{escape_xml_attr(transaction_time)}</TransactionTime>
     <OperatorID>{escape_xml_attr(operator_id)}</OperatorID>
-    <CompressionType xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:nil="true"/>
-    <CompressionParam xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:nil="true"/>
+    {compression_type_xml}
+    {compression_param_xml}
     <Encoding>{escape_xml_attr(encoding)}</Encoding>
-    <VDIXML xmlns:ns3="urn:VDIDataExchangeService">{vdi_xml_content}</VDIXML>
+    <VDIXML xmlns:ns3="urn:VDIDataExchangeService">"""
+
+
+_VDI_DATAEXCHANGE_TAIL = """</VDIXML>
     <UserData xmlns:ns3="urn:VDIDataExchangeService" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:nil="true"/>
 </VDIDataExchange>"""
-    
-    return vdi_dataexchange
 
 
-def build_vdi_dataexchange_from_json(request_data, vdi_type):
-    """Build VDIDataExchange XML from JSON payload (sales-specific)"""
+def build_vdi_dataexchange(vdi_type, vdi_xml_content, request_data=None, compression_type=None):
+    """
+    Generic function to build VDIDataExchange XML for any VDI type
+
+    Args:
+        vdi_type: VDI type (e.g., "mms-sales", "mms-kiosks")
+        vdi_xml_content: The escaped VDITransaction XML content to embed in VDIXML,
+                         or base64 compressed content when compression_type is set
+        request_data: Optional dict with configuration overrides
+        compression_type: Optional VDI CompressionType of vdi_xml_content ("gzip"/"deflate")
+
+    Returns:
+        VDIDataExchange XML string
+    """
+    if request_data is None:
+        request_data = {}
+
+    return (_vdi_dataexchange_head(vdi_type, request_data, compression_type)
+            + vdi_xml_content + _VDI_DATAEXCHANGE_TAIL)
+
+
+def _resolve_transaction_data(request_data):
+    """Resolve header values shared by the envelope and the VDITransaction."""
     # Get configuration from request or use defaults from config.py
-    operator_id = request_data.get("operator_id", DEFAULT_OPERATOR_ID)
-    provider_id = request_data.get("provider_id", VDI_CONFIG["provider_id"])
-    application_id = request_data.get("application_id", VDI_CONFIG["application_id"])
-    application_version = request_data.get("application_version", VDI_CONFIG["application_version"])
-    
-    # Generate transaction ID and time if not provided
-    transaction_id = request_data.get("transaction_id", str(uuid.uuid4()))
-    transaction_time = request_data.get("transaction_time", 
-                                        datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"))
-    
-    # Build VDITransaction XML from sales data
-    vdi_transaction_xml = build_vdi_transaction_xml(request_data, vdi_type, provider_id, 
-                                                   application_id, application_version,
-                                                   operator_id, transaction_id, transaction_time)
-    
-    # Escape the VDITransaction XML for embedding in VDIXML
-    escaped_vdi_xml = escape_xml_for_cdata(vdi_transaction_xml)
-    
-    # Use the generic template function
-    return build_vdi_dataexchange(vdi_type, escaped_vdi_xml, request_data)
-
-
-def build_vdi_transaction_xml(request_data, vdi_type, provider_id, application_id, 
+    return {
+        **request_data,
+        "operator_id": request_data.get("operator_id", DEFAULT_OPERATOR_ID),
+        "provider_id": request_data.get("provider_id", VDI_CONFIG["provider_id"]),
+        "application_id": request_data.get("application_id", VDI_CONFIG["application_id"]),
+        "application_version": request_data.get("application_version", VDI_CONFIG["application_version"]),
+        # Generate transaction ID and time if not provided
+        "transaction_id": request_data.get("transaction_id", str(uuid.uuid4())),
+        "transaction_time": request_data.get("transaction_time",
+                                             datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")),
+    }
+
+
+def _iter_transaction(writer, data, vdi_type):
+    """Write the VDITransaction for resolved request data, yielding after each sale."""
+    yield from _write_vdi_transaction(
+        writer, data, vdi_type, data["provider_id"], data["application_id"],
+        data["application_version"], data["operator_id"], data["transaction_id"],
+        data["transaction_time"]
+    )
+
+
+def build_vdi_dataexchange_from_json(request_data, vdi_type, environment="test"):
+    """Build VDIDataExchange XML from JSON payload (sales-specific)"""
+    return "".join(iter_vdi_dataexchange_from_json(request_data, vdi_type,
+                                                   chunk_size=sys.maxsize, environment=environment))
+
+
+def iter_vdi_dataexchange_from_json(request_data, vdi_type, chunk_size=STREAM_CHUNK_SIZE, environment="test"):
+    """
+    Stream VDIDataExchange XML from JSON payload (sales-specific) in chunks.
+
+    Produces the same document as build_vdi_dataexchange_from_json, but yields
+    it in pieces of roughly chunk_size characters so it can be used as a
+    streaming HTTP body. The sales are validated before the first chunk is
+    yielded, so a SalesValidationError never leaves a partial body behind.
+
+    When VDI_COMPRESSION enables compression for the environment and the
+    VDITransaction reaches the configured min_size, the VDIXML content is
+    compressed and base64 encoded as it is written.
+    """
+    data = _resolve_transaction_data(request_data)
+    compression_type = select_compression(sys.maxsize, environment)
+
+    if compression_type is None:
+        # Collect the envelope and escaped VDITransaction in one writer, joined once
+        writer = VDITransactionWriter(escaped=True)
+        writer.write(_vdi_dataexchange_head(vdi_type, data))
+        for _ in _iter_transaction(writer, data, vdi_type):
+            if writer.size() >= chunk_size:
+                yield writer.drain()
+        writer.write(_VDI_DATAEXCHANGE_TAIL)
+        yield writer.drain()
+        return
+
+    # Buffer plain XML until it is large enough to be worth compressing
+    writer = VDITransactionWriter(escaped=False)
+    transaction = _iter_transaction(writer, data, vdi_type)
+    for _ in transaction:
+        if select_compression(writer.size(), environment):
+            break
+    else:
+        xml_text = writer.drain()
+        if select_compression(len(xml_text), environment) is None:
+            yield _vdi_dataexchange_head(vdi_type, data) + escape_xml_for_cdata(xml_text) + _VDI_DATAEXCHANGE_TAIL
+            return
+        writer.write(xml_text)
+
+    compressor = StreamingCompressor(compression_type)
+    pending = [_vdi_dataexchange_head(vdi_type, data, compression_type), compressor.feed(writer.drain())]
+    pending_size = sum(map(len, pending))
+    for _ in transaction:
+        if writer.size() >= chunk_size:
+            chunk = compressor.feed(writer.drain())
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= chunk_size:
+                yield "".join(pending)
+                pending, pending_size = [], 0
+    pending.append(compressor.feed(writer.drain()))
+    pending.append(compressor.finish())
+    pending.append(_VDI_DATAEXCHANGE_TAIL)
+    yield "".join(pending)
+
+
+def build_vdi_transaction_xml(request_data, vdi_type, provider_id, application_id,
                               application_version, operator_id, transaction_id, transaction_time):
     """Build VDITransaction XML from JSON payload"""
+    writer = VDITransactionWriter(escaped=False)
+    for _ in _write_vdi_transaction(writer, request_data, vdi_type, provider_id, application_id,
+                                    application_version, operator_id, transaction_id, transaction_time):
+        pass
+    return writer.drain()
+
+
+def _write_vdi_transaction(writer, request_data, vdi_type, provider_id, application_id,
+                           application_version, operator_id, transaction_id, transaction_time):
+    """Write a VDITransaction document to writer, yielding after each sale."""
     vdi_xml_version = request_data.get("vdi_xml_version", VDI_CONFIG["vdi_xml_version"])
-    
-    sales_list = []
-    sales_sources = [
-        (request_data.get("Sales"), "Sale"),
-        (request_data.get("sales"), "Sale"),
-    ]
-    for data, singular_key in sales_sources:
-        if data is None:
-            continue
-        sales_list = _normalize_list(data, singular_key)
-        if sales_list:
-            break
+    # Validate the whole batch up front so every error is reported at once
+    sales = normalize_sales(request_data)
+
+    # Header values are inserted unescaped, as in the original template
+    writer.markup(f'<?xml version="1.0" encoding="utf-8"?>\n'
+                  f'<VDITransaction xmlns:xsd="http://www.w3.org/2001/XMLSchema" '
+                  f'VDIXMLVersion="{vdi_xml_version}" VDIXMLType="{vdi_type}" ProviderID="')
+    writer.attr(provider_id)
+    writer.markup('" ApplicationID="')
+    writer.attr(application_id)
+    writer.markup('" ApplicationVersion="')
+    writer.attr(application_version)
+    writer.markup('" TransactionID="')
+    writer.attr(transaction_id)
+    writer.markup('" TransactionTime="')
+    writer.attr(transaction_time)
+    writer.markup('" OperatorID="')
+    writer.attr(operator_id)
+    writer.markup('">\n    <Sales>\n')
+
+    for index, sale in enumerate(sales):
+        if index:
+            writer.markup("\n")
+        _write_sale(writer, sale)
+        yield
+
+    writer.markup("\n  </Sales>\n</VDITransaction>")
+
+
+def _write_sale(writer, sale):
+    """Write a single <Sale> block from a SaleRecord."""
+    t = writer.templates
+    value = writer.value
+    # One fragment per sale keeps the writer's list short
+    parts = []
+    write = parts.append
+    consumer = t["CONSUMER"].format(value(sale.consumer_id)) if sale.consumer_id else ""
+    write(t["SALE_OPEN"].format(value(sale.market_id), value(sale.kiosk_id), consumer, value(sale.sale_id),
+                                value(sale.sale_time), value(sale.price), value(sale.discount), value(sale.total)))
+    if sale.fees_total is not None:
+        write(t["SALE_FEES"].format(value(sale.fees_total)))
+    if sale.taxes_total is not None:
+        write(t["SALE_TAXES"].format(value(sale.taxes_total)))
+    write(t["ITEMS_OPEN"])
+
+    for item in sale.items:
+        _write_item(t, value, write, item)
+
+    write(t["TENDERS_OPEN"])
+    for index, tender in enumerate(sale.tenders):
+        write((t["TENDER"] if index else t["FIRST_TENDER"]).format(value(tender.type), value(tender.amount)))
+    write(t["SALE_CLOSE"])
+    writer.write("".join(parts))
+
+
+def _write_item(t, value, write, item):
+    """Write a single <Item> block, including its fees and taxes, from an ItemRecord."""
+    write(t["ITEM_OPEN"].format(value(item.product_id), value(item.code), value(item.quantity),
+                                value(item.price), value(item.cost), value(item.total)))
+    if item.fees_total is not None:
+        write(t["ITEM_FEES"].format(value(item.fees_total)))
+
+    if item.taxes:
+        write(t["ITEM_TAXES_OPEN"].format(value(item.taxes_total)))
+        for tax in item.taxes:
+            write(t["TAX"].format(value(tax.name), value(tax.rate), value(tax.value),
+                                  value(tax.count), value(tax.total)))
+        write(t["ITEM_TAXES_CLOSE"])
+    elif item.taxes_total is not None:
+        write(t["ITEM_TAXES"].format(value(item.taxes_total)))
+
+    write(t["ITEM_CLOSE"])
 
-    if not sales_list:
-        single_sale = request_data.get("sale") or request_data.get("Sale")
-        if single_sale is not None:
-            sales_list = [single_sale]
-
-    if not sales_list:
-        raise ValueError("At least one sale is required (Sales.Sale or sales)")
-    
-    sale_blocks = []
-    for sale in sales_list:
-        if not isinstance(sale, dict):
-            raise ValueError("Each sale must be an object")
-        
-        market_id = escape_xml_attr(_get_field(sale, ["MarketID", "market_id"], "Sale.MarketID"))
-        kiosk_id = escape_xml_attr(_get_field(sale, ["KioskID", "kiosk_id"], "Sale.KioskID"))
-        consumer_id = sale.get("ConsumerID") or sale.get("consumer_id")
-        sale_id = escape_xml_attr(_get_field(sale, ["SaleID", "sale_id"], "Sale.SaleID"))
-        sale_time = escape_xml_attr(_get_field(sale, ["SaleTime", "sale_time"], "Sale.SaleTime"))
-        
-        summary = sale.get("Summary") or sale.get("summary")
-        if not isinstance(summary, dict):
-            raise ValueError("Summary data is required")
-        
-        summary_price = escape_xml_attr(format_decimal(_get_field(summary, ["Price", "price"], "Summary.Price")))
-        summary_discount = escape_xml_attr(format_decimal(_get_field(summary, ["Discount", "discount"], "Summary.Discount")))
-        summary_total = escape_xml_attr(format_decimal(_get_field(summary, ["Total", "total"], "Summary.Total")))
-        
-        fees_obj = summary.get("Fees") or summary.get("fees")
-        fees_total = escape_xml_attr(format_decimal(_get_field(fees_obj, ["Total", "total"], "Summary.Fees.Total", required=False))) if fees_obj else None
-        
-        taxes_obj = summary.get("Taxes") or summary.get("taxes")
-        taxes_total = escape_xml_attr(format_decimal(_get_field(taxes_obj, ["Total", "total"], "Summary.Taxes.Total", required=False))) if taxes_obj else None
-        
-        summary_lines = [f'<Summary Price="{summary_price}" Discount="{summary_discount}" Total="{summary_total}">']
-        if fees_total is not None:
-            summary_lines.append(f'        <Fees Total="{fees_total}"/>')
-        if taxes_total is not None:
-            summary_lines.append(f'        <Taxes Total="{taxes_total}"/>')
-        summary_lines.append("      </Summary>")
-        summary_xml = "\n".join(summary_lines)
-        
-        items_data = sale.get("Items") or sale.get("items")
-        items = _normalize_list(items_data, "Item")
-        if not items:
-            raise ValueError("At least one item is required (Items.Item)")
-        
-        item_entries = []
-        for item in items:
-            if not isinstance(item, dict):
-                raise ValueError("Each item must be an object")
-            
-            item_product_id = escape_xml_attr(_get_field(item, ["ProductID", "product_id"], "Item.ProductID"))
-            item_code = escape_xml_attr(_get_field(item, ["Code", "code"], "Item.Code"))
-            item_quantity = escape_xml_attr(_get_field(item, ["Quantity", "quantity"], "Item.Quantity"))
-            item_price = escape_xml_attr(format_decimal(_get_field(item, ["Price", "price"], "Item.Price")))
-            item_cost = escape_xml_attr(format_decimal(_get_field(item, ["Cost", "cost"], "Item.Cost")))
-            item_total = escape_xml_attr(format_decimal(_get_field(item, ["Total", "total"], "Item.Total")))
-            
-            item_fees_obj = item.get("Fees") or item.get("fees")
-            item_fees_total = escape_xml_attr(format_decimal(_get_field(item_fees_obj, ["Total", "total"], "Item.Fees.Total", required=False))) if item_fees_obj else None
-            
-            item_taxes_data = item.get("Taxes") or item.get("taxes")
-            item_taxes = _normalize_list(item_taxes_data, "Tax")
-            taxes_total_val = None
-            if isinstance(item_taxes_data, dict):
-                taxes_total_val = _get_field(item_taxes_data, ["Total", "total"], "Item.Taxes.Total", required=False)
-            
-            taxes_lines = []
-            if item_taxes:
-                if taxes_total_val is None:
-                    taxes_total_val = format_decimal(sum(float(_get_field(t, ['Total', 'total'], 'Item.Taxes.Tax.Total')) for t in item_taxes))
-                else:
-                    taxes_total_val = format_decimal(taxes_total_val)
-                taxes_lines.append(f'          <Taxes Total="{escape_xml_attr(taxes_total_val)}">')
-                for tax in item_taxes:
-                    tax_name = escape_xml_attr(_get_field(tax, ["Name", "name"], "Item.Taxes.Tax.Name"))
-                    tax_rate = escape_xml_attr(format_decimal(_get_field(tax, ["Rate", "rate"], "Item.Taxes.Tax.Rate")))
-                    tax_value = escape_xml_attr(format_decimal(_get_field(tax, ["Value", "value"], "Item.Taxes.Tax.Value")))
-                    tax_count = escape_xml_attr(_get_field(tax, ["Count", "count"], "Item.Taxes.Tax.Count"))
-                    tax_total = escape_xml_attr(format_decimal(_get_field(tax, ["Total", "total"], "Item.Taxes.Tax.Total")))
-                    taxes_lines.append(f'            <Tax Name="{tax_name}" Rate="{tax_rate}" Value="{tax_value}" Count="{tax_count}" Total="{tax_total}"/>')
-                taxes_lines.append("          </Taxes>")
-            elif taxes_total_val is not None:
-                taxes_lines.append(f'          <Taxes Total="{escape_xml_attr(format_decimal(taxes_total_val))}"/>')
-            
-            fees_line = f'\n          <Fees Total="{item_fees_total}"/>' if item_fees_total is not None else ""
-            taxes_block = f'\n' + "\n".join(taxes_lines) if taxes_lines else ""
-            item_entry = f"""
-        <Item ProductID="{item_product_id}" Code="{item_code}" Quantity="{item_quantity}" Price="{item_price}" Cost="{item_cost}" Total="{item_total}">{fees_line}{taxes_block}
-        </Item>"""
-            item_entries.append(item_entry)
-        
-        items_xml = "".join(item_entries)
-        
-        tenders_data = sale.get("Tenders") or sale.get("tenders")
-        tenders = _normalize_list(tenders_data, "Tender")
-        if not tenders:
-            raise ValueError("At least one tender is required (Tenders.Tender)")
-        
-        tenders_lines = []
-        for tender in tenders:
-            if not isinstance(tender, dict):
-                raise ValueError("Each tender must be an object")
-            tender_type = escape_xml_attr(_get_field(tender, ["Type", "type"], "Tender.Type"))
-            tender_amount = escape_xml_attr(format_decimal(_get_field(tender, ["Amount", "amount"], "Tender.Amount")))
-            tenders_lines.append(f'        <Tender Type="{tender_type}" Amount="{tender_amount}"/>')
-        tenders_xml = "\n".join(tenders_lines)
-        
-        sale_attrs = [f'MarketID="{market_id}"', f'KioskID="{kiosk_id}"', f'SaleID="{sale_id}"', f'SaleTime="{sale_time}"']
-        if consumer_id:
-            sale_attrs.insert(2, f'ConsumerID="{escape_xml_attr(consumer_id)}"')
-        sale_attrs_str = " ".join(sale_attrs)
-        
-        sale_block = f"""    <Sale {sale_attrs_str}>
-      {summary_xml}
-
-      <Items>{items_xml}
-      </Items>
-
-      <Tenders>
-{tenders_xml}
-      </Tenders>
-
-    </Sale>"""
-        sale_blocks.append(sale_block)
-    
-    sales_xml = "\n".join(sale_blocks)
-    
-    vdi_transaction = f"""<?xml version="1.0" encoding="utf-8"?>
-<VDITransaction xmlns:xsd="http://www.w3.org/2001/XMLSchema" VDIXMLVersion="{vdi_xml_version}" VDIXMLType="{vdi_type}" ProviderID="{escape_xml_attr(provider_id)}" ApplicationID="{escape_xml_attr(application_id)}" ApplicationVersion="{escape_xml_attr(application_version)}" TransactionID="{escape_xml_attr(transaction_id)}" TransactionTime="{escape_xml_attr(transaction_time)}" OperatorID="{escape_xml_attr(operator_id)}">
-    <Sales>
-{sales_xml}
-  </Sales>
-</VDITransaction>"""
-    
-    return vdi_transaction
-
-
-def format_decimal(value):
-    """Format numeric value to 2 decimal places for currency fields"""
-    if value is None:
-        return "0.00"
-    try:
-        num = float(value)
-        return f"{num:.2f}"
-    except (ValueError, TypeError):
-        return str(value)
 
 def escape_xml_attr(value):
     """Escape XML attribute value"""
     if value is None:
         return ""
-    return escape(str(value), {'"': '&quot;', "'": '&apos;'})
+    return str(value).translate(_ATTR_ESCAPE_TABLE)
 
 
 def escape_xml_for_cdata(xml_content):
     """Escape XML content for embedding in VDIXML element"""
-    # Escape XML special characters
-    escaped = xml_content.replace("&", "&amp;")
-    escaped = escaped.replace("<", "&lt;")
-    escaped = escaped.replace(">", "&gt;")
-    escaped = escaped.replace('"', "&quot;")
-    escaped = escaped.replace("'", "&apos;")
-    return escaped
-
+    # Escape XML special characters in a single pass
+    return xml_content.translate(_ATTR_ESCAPE_TABLE)
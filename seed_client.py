@@ -5,9 +5,16 @@ from datetime import datetime
 from config import SEED_ENDPOINTS, AUTH, VDI_CONFIG
 from soap_helpers import wrap_in_soap, create_vdi_transaction
 from requests.auth import HTTPBasicAuth
+from metrics import SEED_SEND_SECONDS, SEED_SEND_RESPONSES, SEED_SEND_RETRIES, vdi_type_label
+from tracing import add_span_event, span
 
 SOAP_ACTION = "urn:VDIDataExchangeService/IVDIDataExchangeService/VDIDataExchange"
 
+# Statuses retried with backoff (5xx is always retried)
+RETRY_STATUSES = {429}
+# Upper bound on a server-requested Retry-After delay
+MAX_RETRY_AFTER = 30
+
 def get_soap_headers(soap_action=None):
     """
     Get SOAP headers for the request.
@@ -27,17 +34,61 @@ def get_soap_headers(soap_action=None):
     
     return headers
 
-def send_soap_request(xml_data, environment="test", max_retries=3, backoff_base=0.5, soap_action=None):
+def get_retry_after(response):
+    """Return the Retry-After delay in seconds from a response, or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(max(float(value), 0.0), MAX_RETRY_AFTER)
+    except ValueError:
+        return None
+
+def get_vdi_type(xml_data):
+    """Return the VDIXMLType of a VDIDataExchange or VDITransaction string, or None."""
+    start = xml_data.find("<VDIXMLType>")
+    if start >= 0:
+        end = xml_data.find("</VDIXMLType>", start)
+        return xml_data[start + len("<VDIXMLType>"):end].strip() if end > 0 else None
+    start = xml_data.find('VDIXMLType="')
+    if start >= 0:
+        start += len('VDIXMLType="')
+        return xml_data[start:xml_data.find('"', start)]
+    return None
+
+def send_soap_request(xml_data, environment="test", max_retries=3, backoff_base=0.5, soap_action=None,
+                      on_retry=None, vdi_type=None):
     """
     Send SOAP request to SEED endpoint with basic retry on transient failures.
     
     Args:
         xml_data: The XML body to send (VDIDataExchange XML)
-        environment: Environment name (test/prod)
+        environment: Environment name (test/prod/local)
         max_retries: Maximum retry attempts
         backoff_base: Base backoff time in seconds
         soap_action: SOAPAction value. None uses default VDI action, "" uses empty string
+        on_retry: Optional callable(attempt, reason) invoked before each retry
+        vdi_type: VDI type for metric labels and spans (read from xml_data when None)
+
+    Retries 5xx and 429 responses, waiting for the server's Retry-After when
+    it is longer than the exponential backoff.
     """
+    vdi_type = vdi_type or get_vdi_type(xml_data)
+    labels = (vdi_type_label(vdi_type), environment)
+    start = time.perf_counter()
+    status = "error"
+    with span("seed.send", {"vdi.type": vdi_type, "seed.environment": environment,
+                            "seed.request_bytes": len(xml_data)}) as send_span:
+        try:
+            status, text = _send_with_retries(xml_data, environment, max_retries, backoff_base, soap_action,
+                                              on_retry, labels)
+            send_span.set_attribute("http.status_code", status)
+            return status, text
+        finally:
+            SEED_SEND_SECONDS.labels(*labels).observe(time.perf_counter() - start)
+            SEED_SEND_RESPONSES.labels(*labels, str(status)).inc()
+
+def _send_with_retries(xml_data, environment, max_retries, backoff_base, soap_action, on_retry, labels):
     url = SEED_ENDPOINTS[environment]
     wrapped = wrap_in_soap(xml_data)
     headers = get_soap_headers(soap_action)
@@ -45,25 +96,41 @@ def send_soap_request(xml_data, environment="test", max_retries=3, backoff_base=
     attempt = 0
     while True:
         try:
-            response = requests.post(
-                url,
-                headers=headers,
-                data=wrapped,
-                auth=HTTPBasicAuth(AUTH["username"], AUTH["password"]),
-                timeout=30
-            )
-            # Retry on 5xx
-            if response.status_code >= 500 and attempt < max_retries:
+            with span("seed.attempt", {"seed.attempt": attempt + 1}) as attempt_span:
+                response = requests.post(
+                    url,
+                    headers=headers,
+                    data=wrapped,
+                    auth=HTTPBasicAuth(AUTH["username"], AUTH["password"]),
+                    timeout=30
+                )
+                attempt_span.set_attribute("http.status_code", response.status_code)
+            # Retry on 5xx and throttling
+            retryable = response.status_code >= 500 or response.status_code in RETRY_STATUSES
+            if retryable and attempt < max_retries:
                 attempt += 1
                 sleep_s = backoff_base * (2 ** (attempt - 1))
+                retry_after = get_retry_after(response)
+                if retry_after is not None:
+                    sleep_s = max(sleep_s, retry_after)
+                SEED_SEND_RETRIES.labels(*labels, str(response.status_code)).inc()
+                add_span_event("retry", {"seed.attempt": attempt, "seed.reason": str(response.status_code),
+                                         "seed.sleep_s": sleep_s})
+                if on_retry:
+                    on_retry(attempt, response.status_code)
                 time.sleep(sleep_s)
                 continue
             return response.status_code, response.text
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
             if attempt >= max_retries:
                 raise
             attempt += 1
             sleep_s = backoff_base * (2 ** (attempt - 1))
+            SEED_SEND_RETRIES.labels(*labels, type(e).__name__).inc()
+            add_span_event("retry", {"seed.attempt": attempt, "seed.reason": type(e).__name__,
+                                     "seed.sleep_s": sleep_s})
+            if on_retry:
+                on_retry(attempt, type(e).__name__)
             time.sleep(sleep_s)
 
 def send_vdi_message(vdi_type, vdi_content, operator_id, environment="test"):
@@ -82,15 +149,16 @@ def send_vdi_message(vdi_type, vdi_content, operator_id, environment="test"):
         vdi_content=vdi_content
     )
     
-    return send_soap_request(vdi_transaction, environment)
+    return send_soap_request(vdi_transaction, environment, vdi_type=vdi_type)
 
-def send_vdi_dataexchange(vdi_xml, environment="test", soap_action=None):
+def send_vdi_dataexchange(vdi_xml, environment="test", soap_action=None, on_retry=None):
     """
     Send VDIDataExchange XML directly to SEED endpoint (wrapped in SOAP)
     
     Args:
         vdi_xml: VDIDataExchange XML string
-        environment: Environment name (test/prod)
+        environment: Environment name (test/prod/local)
         soap_action: SOAPAction value. None uses default VDI action, "" uses empty string
+        on_retry: Optional callable(attempt, reason) invoked before each retry
     """
-    return send_soap_request(vdi_xml, environment=environment, soap_action=soap_action)
\ No newline at end of file
+    return send_soap_request(vdi_xml, environment=environment, soap_action=soap_action, on_retry=on_retry)
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+OpenTelemetry tracing for the receive, parse, merge, load and send stages.
+
+Spans are exported according to TRACING["exporters"] in config.py:
+"otlp" sends them to an OTLP/HTTP collector (OTEL_EXPORTER_OTLP_ENDPOINT),
+"jsonl" appends one JSON object per span to TRACING["jsonl_path"] for
+offline analysis. With no exporters configured the OpenTelemetry API stays
+a no-op and span() costs next to nothing.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+from config import TRACING
+
+tracer = trace.get_tracer("seed-integration")
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class JSONLinesSpanExporter(SpanExporter):
+    """
+    SpanExporter that appends finished spans to a JSON-lines file.
+
+    Args:
+        path: File to append to; parent directories are created as needed
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def span_to_dict(span):
+        context = span.get_span_context()
+        return {
+            "name": span.name,
+            "service": span.resource.attributes.get("service.name"),
+            "trace_id": format(context.trace_id, "032x"),
+            "span_id": format(context.span_id, "016x"),
+            "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+            "start_ns": span.start_time,
+            "end_ns": span.end_time,
+            "duration_ms": (span.end_time - span.start_time) / 1e6,
+            "status": span.status.status_code.name,
+            "attributes": dict(span.attributes),
+            "events": [
+                {"name": event.name, "timestamp_ns": event.timestamp, "attributes": dict(event.attributes)}
+                for event in span.events
+            ],
+        }
+
+    def export(self, spans):
+        lines = "".join(json.dumps(self.span_to_dict(span), default=str) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(lines)
+        except OSError:
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+
+def _build_exporter(name):
+    if name == "otlp":
+        # Imported lazily: the OTLP exporter pulls in protobuf
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    if name == "jsonl":
+        return JSONLinesSpanExporter(TRACING["jsonl_path"])
+    raise ValueError(f"Unknown tracing exporter: {name}")
+
+
+def configure_tracing(service_name):
+    """
+    Install the global TracerProvider with the configured exporters.
+
+    Safe to call more than once; only the first call has an effect.
+
+    Args:
+        service_name: service.name resource attribute for exported spans
+    """
+    global _configured
+    with _configure_lock:
+        if _configured or not TRACING["exporters"]:
+            return
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": service_name}),
+            sampler=ParentBased(TraceIdRatioBased(TRACING["sample_ratio"])),
+        )
+        for name in TRACING["exporters"]:
+            provider.add_span_processor(BatchSpanProcessor(_build_exporter(name)))
+        trace.set_tracer_provider(provider)
+        _configured = True
+
+
+def _clean(attributes):
+    return {key: value for key, value in (attributes or {}).items() if value is not None}
+
+
+@contextmanager
+def span(name, attributes=None):
+    """
+    Start a span nested under the current one.
+
+    Args:
+        name: Span name, e.g. "vdi.parse"
+        attributes: Optional dict of span attributes; None values are dropped
+    """
+    with tracer.start_as_current_span(name, attributes=_clean(attributes)) as current:
+        yield current
+
+
+def set_span_attributes(attributes):
+    """Set attributes (None values dropped) on the current span."""
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.set_attributes(_clean(attributes))
+
+
+def add_span_event(name, attributes=None):
+    """Add an event to the current span."""
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.add_event(name, _clean(attributes))
@@ -1,8 +1,9 @@
-import html
-import xml.etree.ElementTree as ET
 import pandas as pd
 import xml.sax.saxutils as sax
 from datetime import datetime, timezone
+from vdi_compression import compression_elements, decompress_vdixml, encode_vdixml
+from tracing import set_span_attributes, span
+import xml_backend
 
 dry_run = True
 
@@ -13,7 +14,7 @@ def get_seed_timestamp():
     # return now.strftime("%Y-%m-%dT%H:%M:%S.%f") + "0Z"
     return now.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-def generate_kiosk_soap():
+def generate_kiosk_soap(environment="test"):
     utc_now = get_seed_timestamp()
     xml_version = 1
     xml_type = "mms-kiosks"
@@ -30,6 +31,15 @@ def generate_kiosk_soap():
     kiosk_last_transaction = "2025-11-18T07:04:06.4288410Z"
     kiosk_catalog_version = "2025-11-18T07:04:06.4288410Z"
 
+    vdi_transaction = f"""<?xml version="1.0" encoding="utf-8"?>
+    <VDITransaction xmlns:xsd="http://www.w3.org/2001/XMLSchema" VDIXMLVersion="{xml_version}" VDIXMLType="{xml_type}" ProviderID="{provider_id}" ApplicationID="{application_id}" ApplicationVersion="{application_version}" TransactionID="{transaction_id}" TransactionTime="{transaction_time}" OperatorID="{operator_id}">
+        <KiosksCollection>
+            <Kiosk MarketID="{market_id}" KioskID="{kiosk_id}" KioskSN="{kiosk_sn}" LastSync="{kiosk_last_sync}" LastTransaction="{kiosk_last_transaction}" CatalogVersion="{kiosk_catalog_version}" />
+        </KiosksCollection>
+    </VDITransaction>"""
+    vdi_xml, compression_type = encode_vdixml(vdi_transaction, environment)
+    compression_type_xml, compression_param_xml = compression_elements(compression_type)
+
     soap_xml = f"""
         <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:urn="urn:VDIDataExchangeService">
         <soapenv:Header/>
@@ -44,16 +54,11 @@ def generate_kiosk_soap():
                 <TransactionTime>{transaction_time}</TransactionTime>
                 <OperatorID>{operator_id}</OperatorID>
 
-                <CompressionType xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:nil="true"/>
-                <CompressionParam xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:nil="true"/>
+                {compression_type_xml}
+                {compression_param_xml}
                 <Encoding>utf-8</Encoding>
 
-                <VDIXML xmlns:ns3="urn:VDIDataExchangeService">&lt;?xml version=&quot;1.0&quot; encoding=&quot;utf-8&quot;?&gt;
-    &lt;VDITransaction xmlns:xsd=&quot;http://www.w3.org/2001/XMLSchema&quot; VDIXMLVersion=&quot;{xml_version}&quot; VDIXMLType=&quot;{xml_type}&quot; ProviderID=&quot;{provider_id}&quot; ApplicationID=&quot;{application_id}&quot; ApplicationVersion=&quot;{application_version}&quot; TransactionID=&quot;{transaction_id}&quot; TransactionTime=&quot;{transaction_time}&quot; OperatorID=&quot;{operator_id}&quot;&gt;
-        &lt;KiosksCollection&gt;
-            &lt;Kiosk MarketID=&quot;{market_id}&quot; KioskID=&quot;{kiosk_id}&quot; KioskSN=&quot;{kiosk_sn}&quot; LastSync=&quot;{kiosk_last_sync}&quot; LastTransaction=&quot;{kiosk_last_transaction}&quot; CatalogVersion=&quot;{kiosk_catalog_version}&quot; /&gt;
-        &lt;/KiosksCollection&gt;
-    &lt;/VDITransaction&gt;</VDIXML>
+                <VDIXML xmlns:ns3="urn:VDIDataExchangeService">{vdi_xml}</VDIXML>
 
                 <UserData xmlns:ns3="urn:VDIDataExchangeService" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:nil="true"/>
             </VDIDataExchange>
@@ -73,36 +78,54 @@ def save_df(df, name):
     df.to_csv(fp, index=False)
 
 
-def get_vdixml_el(xml_text: str):
-    """_summary_
+def get_vdixml_text(xml_text: str) -> str:
+    """
+    Return the VDITransaction XML carried in a SOAP envelope's <VDIXML>, decompressed if needed.
 
     Args:
-        xml_text (str): _description_
+        xml_text (str): VDIDataExchange SOAP envelope
+
+    Raises:
+        ValueError: If the envelope has no <VDIXML> or it is empty
     """
     # Ensure proper XML formatting
     xml_text = xml_text.strip()
 
     # Parse SOAP envelope
-    root = ET.fromstring(xml_text)
-
-    # Namespaces
-    ns = {
-        "s": "http://schemas.xmlsoap.org/soap/envelope/",
-        "v": "urn:VDIDataExchangeService"
-    }
+    with span("vdi.parse_envelope", {"vdi.envelope_bytes": len(xml_text),
+                                     "vdi.xml_backend": xml_backend.get_backend().name}):
+        root = xml_backend.fromstring(xml_text)
 
     # Extract the inner <VDIXML> block from SOAP
-    vdi_xml_el = root.find(".//v:VDIXML", ns)
+    vdi_xml_el = xml_backend.find_envelope(root, "VDIXML")
     if vdi_xml_el is None:
         raise ValueError("Cannot find <VDIXML> inside SOAP response")
 
-    inner_xml_escaped = vdi_xml_el.text
-    if inner_xml_escaped is None:
+    # The parser has already unescaped the text back to the VDITransaction XML
+    inner_xml = vdi_xml_el.text
+    if inner_xml is None:
         raise ValueError("VDIXML node exists but contains no XML")
 
-    # Unescape & parse inner VDITransaction XML
-    inner_xml = html.unescape(inner_xml_escaped)
-    inner_root = ET.fromstring(inner_xml)
+    # Compressed VDIXML is base64 of the gzip/deflate VDITransaction XML
+    compression_type_el = xml_backend.find_envelope(root, "CompressionType")
+    compression_type = (compression_type_el.text or "").strip() if compression_type_el is not None else ""
+    if compression_type:
+        with span("vdi.decompress", {"vdi.compression_type": compression_type,
+                                     "vdi.encoded_bytes": len(inner_xml)}) as current:
+            inner_xml = decompress_vdixml(inner_xml, compression_type)
+            current.set_attribute("vdi.inner_bytes", len(inner_xml))
+    return inner_xml
+
+def get_vdixml_el(xml_text: str):
+    """
+    Return the root VDITransaction element carried in a SOAP envelope's <VDIXML>.
+
+    Args:
+        xml_text (str): VDIDataExchange SOAP envelope
+    """
+    inner_xml = get_vdixml_text(xml_text)
+    with span("vdi.parse_transaction", {"vdi.inner_bytes": len(inner_xml)}):
+        inner_root = xml_backend.fromstring(inner_xml)
     return inner_root
 
 def parse_seed_markets_soap(xml_text: str):
@@ -129,6 +152,7 @@ def parse_seed_markets_soap(xml_text: str):
         "TransactionTime": inner_root.attrib.get("TransactionTime"),
     }
 
+    set_span_attributes({"vdi.transaction_id": tx["TransactionID"], "vdi.type": tx["VDIXMLType"]})
     transaction_df = pd.DataFrame([tx])
     if dry_run:
         save_df(transaction_df, 'mms-markets-transaction')
@@ -150,6 +174,7 @@ def parse_seed_markets_soap(xml_text: str):
             })
 
     markets_df = pd.DataFrame(markets)
+    set_span_attributes({"vdi.rows.markets": len(markets_df)})
     if dry_run:
         save_df(markets_df, 'mms-markets-markets')
 
@@ -158,6 +183,78 @@ def parse_seed_markets_soap(xml_text: str):
         "markets": markets_df
     }
 
+def new_product_rows():
+    """Empty per-table row lists filled by append_product_rows."""
+    return {"products": [], "product_codes": [], "product_taxes": [], "product_fees": []}
+
+def append_product_rows(transaction_id, market_id, prod_el, rows):
+    """
+    Append one <Product>'s product, code, tax and fee rows to rows.
+
+    Args:
+        transaction_id: TransactionID of the mms-products message
+        market_id: MarketID of the enclosing <Market>
+        prod_el: <Product> element
+        rows: dict from new_product_rows()
+    """
+    product_id = prod_el.attrib.get("ProductID")
+
+    rows["products"].append({
+        "TransactionID": transaction_id,
+        "MarketID": market_id,
+        "ProductID": product_id,
+        "ProductName": prod_el.attrib.get("ProductName"),
+        "Price": float(prod_el.attrib.get("Price")) if prod_el.attrib.get("Price") else None,
+        "Cost": float(prod_el.attrib.get("Cost")) if prod_el.attrib.get("Cost") else None,
+        "ProductCode": prod_el.attrib.get("ProductCode"),
+        "Category": prod_el.attrib.get("Category"),
+    })
+
+    # ---------------------------
+    # 4) Codes (barcodes)
+    # ---------------------------
+    codes_el = prod_el.find("Codes")
+    if codes_el is not None:
+        for code in codes_el.findall("Code"):
+            rows["product_codes"].append({
+                "TransactionID": transaction_id,
+                "MarketID": market_id,
+                "ProductID": product_id,
+                "Code": (code.text or "").strip()
+            })
+
+    # ---------------------------
+    # 5) Taxes
+    # ---------------------------
+    taxes_el = prod_el.find("Taxes")
+    if taxes_el is not None:
+        for tax in taxes_el.findall("Tax"):
+            rows["product_taxes"].append({
+                "TransactionID": transaction_id,
+                "MarketID": market_id,
+                "ProductID": product_id,
+                "TaxID": tax.attrib.get("ID"),
+                "TaxName": tax.attrib.get("Name"),
+                "TaxRate": float(tax.attrib.get("Rate")) if tax.attrib.get("Rate") else None,
+                "IncludedInPrice": int(tax.attrib.get("IncludedInPrice")) if tax.attrib.get("IncludedInPrice") else None,
+            })
+
+    # ---------------------------
+    # 6) Fees
+    # ---------------------------
+    fees_el = prod_el.find("Fees")
+    if fees_el is not None:
+        for fee in fees_el.findall("Fee"):
+            rows["product_fees"].append({
+                "TransactionID": transaction_id,
+                "MarketID": market_id,
+                "ProductID": product_id,
+                "FeeID": fee.attrib.get("ID"),
+                "FeeName": fee.attrib.get("Name"),
+                "FeeValue": float(fee.attrib.get("Value")) if fee.attrib.get("Value") else None,
+                "IsTaxable": fee.attrib.get("IsTaxable") == "true"
+            })
+
 def parse_seed_products_soap(xml_text: str):
     """
     Parse SEED SOAP response containing mms-products.
@@ -185,15 +282,13 @@ def parse_seed_products_soap(xml_text: str):
         "TransactionTime": inner_root.attrib.get("TransactionTime"),
     }
 
+    set_span_attributes({"vdi.transaction_id": tx["TransactionID"], "vdi.type": tx["VDIXMLType"]})
     transaction_df = pd.DataFrame([tx])
     if dry_run:
         save_df(transaction_df, 'mms-products-transaction')
 
     markets = []
-    products = []
-    product_codes = []
-    product_taxes = []
-    product_fees = []
+    rows = new_product_rows()
 
     # ---------------------------
     # 2) Extract MarketsCollection
@@ -221,70 +316,21 @@ def parse_seed_products_soap(xml_text: str):
         # 3) Products per market
         # ---------------------------
         for prod_el in products_update_el.findall("Product"):
-            product_id = prod_el.attrib.get("ProductID")
-
-            products.append({
-                "TransactionID": tx["TransactionID"],
-                "MarketID": market_id,
-                "ProductID": product_id,
-                "ProductName": prod_el.attrib.get("ProductName"),
-                "Price": float(prod_el.attrib.get("Price")) if prod_el.attrib.get("Price") else None,
-                "Cost": float(prod_el.attrib.get("Cost")) if prod_el.attrib.get("Cost") else None,
-                "ProductCode": prod_el.attrib.get("ProductCode"),
-                "Category": prod_el.attrib.get("Category"),
-            })
-
-            # ---------------------------
-            # 4) Codes (barcodes)
-            # ---------------------------
-            codes_el = prod_el.find("Codes")
-            if codes_el is not None:
-                for code in codes_el.findall("Code"):
-                    product_codes.append({
-                        "TransactionID": tx["TransactionID"],
-                        "MarketID": market_id,
-                        "ProductID": product_id,
-                        "Code": (code.text or "").strip()
-                    })
-
-            # ---------------------------
-            # 5) Taxes
-            # ---------------------------
-            taxes_el = prod_el.find("Taxes")
-            if taxes_el is not None:
-                for tax in taxes_el.findall("Tax"):
-                    product_taxes.append({
-                        "TransactionID": tx["TransactionID"],
-                        "MarketID": market_id,
-                        "ProductID": product_id,
-                        "TaxID": tax.attrib.get("ID"),
-                        "TaxName": tax.attrib.get("Name"),
-                        "TaxRate": float(tax.attrib.get("Rate")) if tax.attrib.get("Rate") else None,
-                        "IncludedInPrice": int(tax.attrib.get("IncludedInPrice")) if tax.attrib.get("IncludedInPrice") else None,
-                    })
-
-            # ---------------------------
-            # 6) Fees
-            # ---------------------------
-            fees_el = prod_el.find("Fees")
-            if fees_el is not None:
-                for fee in fees_el.findall("Fee"):
-                    product_fees.append({
-                        "TransactionID": tx["TransactionID"],
-                        "MarketID": market_id,
-                        "ProductID": product_id,
-                        "FeeID": fee.attrib.get("ID"),
-                        "FeeName": fee.attrib.get("Name"),
-                        "FeeValue": float(fee.attrib.get("Value")) if fee.attrib.get("Value") else None,
-                        "IsTaxable": fee.attrib.get("IsTaxable") == "true"
-                    })
+            append_product_rows(tx["TransactionID"], market_id, prod_el, rows)
 
     # Convert to DataFrames
     markets_df = pd.DataFrame(markets)
-    products_df = pd.DataFrame(products)
-    product_codes_df = pd.DataFrame(product_codes)
-    product_taxes_df = pd.DataFrame(product_taxes)
-    product_fees_df = pd.DataFrame(product_fees)
+    products_df = pd.DataFrame(rows["products"])
+    product_codes_df = pd.DataFrame(rows["product_codes"])
+    product_taxes_df = pd.DataFrame(rows["product_taxes"])
+    product_fees_df = pd.DataFrame(rows["product_fees"])
+    set_span_attributes({
+        "vdi.rows.markets": len(markets_df),
+        "vdi.rows.products": len(products_df),
+        "vdi.rows.codes": len(product_codes_df),
+        "vdi.rows.taxes": len(product_taxes_df),
+        "vdi.rows.fees": len(product_fees_df),
+    })
 
     if dry_run:
         save_df(markets_df, 'mms-products-markets')
@@ -302,6 +348,24 @@ def parse_seed_products_soap(xml_text: str):
         "product_fees": product_fees_df,
     }
 
+def merge_products_data(data):
+    """
+    Join the parsed mms-products frames into the flat vdi_products layout.
+
+    Args:
+        data: dict returned by parse_seed_products_soap
+    """
+    keys = ["MarketID", "ProductID", "TransactionID"]
+
+    merge_df = data["products"].merge(data["product_codes"], on=keys, how="inner")
+    merge_df = merge_df.merge(data["product_taxes"], on=keys, how="inner")
+    merge_df = merge_df.merge(data["product_fees"], on=keys, how="inner")
+    # do type-conversions
+    merge_df['FeeID'] = merge_df['FeeID'].astype(str)
+    merge_df['TaxID'] = merge_df['TaxID'].astype(str)
+    set_span_attributes({"vdi.rows.merged": len(merge_df)})
+    return merge_df
+
 # Example run
 if __name__ == "__main__":
     # soap_input = None
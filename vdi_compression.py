@@ -0,0 +1,226 @@
+"""
+VDIXML compression helpers (VDI CompressionType / CompressionParam).
+
+Compressed VDIXML content is the VDITransaction XML compressed with gzip or
+deflate and then base64 encoded, with the algorithm named in the
+CompressionType element. Uncompressed content is the escaped XML itself.
+
+Inbound content is decompressed at most max_size bytes at a time (default
+HTTP_COMPRESSION["max_request_size"]), so a small compression bomb inside
+an envelope fails with VDIXMLSizeError instead of expanding in memory.
+"""
+import base64
+import zlib
+from typing import Optional
+from xml.sax.saxutils import escape
+
+from config import HTTP_COMPRESSION, VDI_COMPRESSION
+
+COMPRESSION_TYPES = ("gzip", "deflate")
+
+# zlib wbits for each compression type when compressing
+_WBITS = {
+    "gzip": 31,      # gzip header and trailer
+    "deflate": -15,  # raw deflate stream (.NET DeflateStream)
+}
+
+_NIL_ELEMENTS = (
+    '<CompressionType xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:nil="true"/>',
+    '<CompressionParam xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:nil="true"/>',
+)
+
+
+class VDIXMLSizeError(ValueError):
+    """Raised when compressed VDIXML decompresses to more than the allowed size (HTTP 413)."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        super().__init__(f"Decompressed VDIXML exceeds {max_size} bytes")
+
+
+def _check_type(compression_type):
+    name = compression_type.strip().lower()
+    if name not in COMPRESSION_TYPES:
+        raise ValueError(f"Unsupported VDI CompressionType: {compression_type}")
+    return name
+
+
+def select_compression(size: int, environment: str = "test") -> Optional[str]:
+    """
+    Return the CompressionType to use for a VDIXML payload of the given size,
+    or None when it should be sent as plain escaped XML.
+    """
+    settings = VDI_COMPRESSION.get(environment) or {}
+    compression_type = settings.get("type")
+    if not compression_type or size < settings.get("min_size", 0):
+        return None
+    return _check_type(compression_type)
+
+
+def compression_elements(compression_type: Optional[str]):
+    """Return the (CompressionType, CompressionParam) elements for the envelope."""
+    if compression_type is None:
+        return _NIL_ELEMENTS
+    return (f"<CompressionType>{compression_type}</CompressionType>", _NIL_ELEMENTS[1])
+
+
+def compress_vdixml(xml_text: str, compression_type: str) -> str:
+    """Compress VDITransaction XML and return base64 text for the VDIXML element."""
+    compressor = zlib.compressobj(wbits=_WBITS[_check_type(compression_type)])
+    data = compressor.compress(xml_text.encode("utf-8")) + compressor.flush()
+    return base64.b64encode(data).decode("ascii")
+
+
+def _decompress_bounded(decompressor, data: bytes, limit: int) -> bytes:
+    """Decompress data, raising VDIXMLSizeError if it yields more than limit bytes."""
+    out = decompressor.decompress(data, limit + 1)
+    if len(out) > limit:
+        raise VDIXMLSizeError(limit)
+    return out
+
+
+def _decompress_all(data: bytes, wbits: int, max_size: int) -> bytes:
+    decompressor = zlib.decompressobj(wbits)
+    raw = _decompress_bounded(decompressor, data, max_size)
+    raw += decompressor.flush()
+    if len(raw) > max_size:
+        raise VDIXMLSizeError(max_size)
+    if not decompressor.eof:
+        raise zlib.error("incomplete or truncated stream")
+    return raw
+
+
+def decompress_vdixml(content: str, compression_type: str, max_size: int = None) -> str:
+    """
+    Decode base64 VDIXML content and decompress it to VDITransaction XML.
+
+    Args:
+        content: Base64 VDIXML content
+        compression_type: "gzip" or "deflate"
+        max_size: Maximum decompressed size in bytes (defaults to
+            HTTP_COMPRESSION["max_request_size"])
+
+    Raises:
+        VDIXMLSizeError: If the content decompresses to more than max_size bytes
+    """
+    name = _check_type(compression_type)
+    max_size = max_size or HTTP_COMPRESSION["max_request_size"]
+    data = base64.b64decode("".join(content.split()))
+    if name == "gzip":
+        raw = _decompress_all(data, 31, max_size)
+    else:
+        # Senders differ on whether deflate carries a zlib header
+        try:
+            raw = _decompress_all(data, -15, max_size)
+        except zlib.error:
+            raw = _decompress_all(data, 15, max_size)
+    return raw.decode("utf-8")
+
+
+def encode_vdixml(xml_text: str, environment: str = "test"):
+    """
+    Encode VDITransaction XML for the VDIXML element.
+
+    Returns:
+        (content, compression_type) where compression_type is None when the
+        content is plain escaped XML.
+    """
+    compression_type = select_compression(len(xml_text), environment)
+    if compression_type is None:
+        return escape(xml_text, {'"': "&quot;", "'": "&apos;"}), None
+    return compress_vdixml(xml_text, compression_type), compression_type
+
+
+class StreamingCompressor:
+    """
+    Incrementally compresses text and emits base64 chunks.
+
+    Base64 output is only produced for whole 3-byte groups until finish(),
+    so the concatenated chunks form a single valid base64 string.
+    """
+
+    def __init__(self, compression_type: str):
+        self._compressor = zlib.compressobj(wbits=_WBITS[_check_type(compression_type)])
+        self._pending = b""
+
+    def _encode(self, data, final=False):
+        data = self._pending + data
+        if final:
+            self._pending = b""
+        else:
+            cut = len(data) - len(data) % 3
+            data, self._pending = data[:cut], data[cut:]
+        return base64.b64encode(data).decode("ascii")
+
+    def feed(self, text: str) -> str:
+        """Compress text and return any base64 output available so far."""
+        return self._encode(self._compressor.compress(text.encode("utf-8")))
+
+    def finish(self) -> str:
+        """Flush the compressor and return the remaining base64 output."""
+        return self._encode(self._compressor.flush(), final=True)
+
+
+class StreamingDecompressor:
+    """
+    Incrementally decodes base64 VDIXML content and decompresses it.
+
+    The counterpart of StreamingCompressor: feed() takes any slice of the
+    content (whitespace included) and returns the VDITransaction bytes
+    available so far, so the content never has to be held whole.
+
+    Args:
+        compression_type: "gzip" or "deflate"
+        max_size: Maximum total decompressed size in bytes (defaults to
+            HTTP_COMPRESSION["max_request_size"]); VDIXMLSizeError beyond it
+    """
+
+    def __init__(self, compression_type: str, max_size: int = None):
+        self._name = _check_type(compression_type)
+        self.max_size = max_size or HTTP_COMPRESSION["max_request_size"]
+        self.output_bytes = 0
+        self._decompressor = None
+        self._pending = ""
+
+    def _bounded(self, data):
+        # At most one byte past the limit comes out, so a bomb is never expanded
+        out = self._decompressor.decompress(data, self.max_size - self.output_bytes + 1)
+        self.output_bytes += len(out)
+        if self.output_bytes > self.max_size:
+            raise VDIXMLSizeError(self.max_size)
+        return out
+
+    def _decompress(self, data):
+        if self._decompressor is not None:
+            return self._bounded(data)
+        if self._name == "gzip":
+            self._decompressor = zlib.decompressobj(31)
+            return self._bounded(data)
+        # Senders differ on whether deflate carries a zlib header
+        self._decompressor = zlib.decompressobj(-15)
+        try:
+            return self._bounded(data)
+        except zlib.error:
+            self._decompressor = zlib.decompressobj(15)
+            return self._bounded(data)
+
+    def feed(self, content: str) -> bytes:
+        """Decode and decompress content, returning any output available so far."""
+        content = self._pending + "".join(content.split())
+        # Only whole 4-character base64 groups decode on their own
+        cut = len(content) - len(content) % 4
+        self._pending = content[cut:]
+        return self._decompress(base64.b64decode(content[:cut])) if cut else b""
+
+    def finish(self) -> bytes:
+        """Decode the remaining content and flush the decompressor."""
+        data = base64.b64decode(self._pending)
+        self._pending = ""
+        out = self._decompress(data) if data else b""
+        if self._decompressor is not None:
+            tail = self._decompressor.flush()
+            self.output_bytes += len(tail)
+            if self.output_bytes > self.max_size:
+                raise VDIXMLSizeError(self.max_size)
+            out += tail
+        return out
@@ -0,0 +1,222 @@
+"""
+Single-pass VDITransaction record streaming for inbound VDI messages.
+
+Providers post a VDITransaction in one of three shapes:
+    <VDITransaction>...</VDITransaction>
+    <Envelope><Body><VDITransaction>...</VDITransaction></Body></Envelope>
+    <Envelope><Body><VDIDataExchange>...<VDIXML>escaped or compressed
+        VDITransaction</VDIXML></VDIDataExchange></Body></Envelope>
+
+iter_records() walks the document once with incremental parsing, matching
+element local names only on the known envelope paths, and yields the record
+elements of one collection (e.g. KiosksCollection/Kiosk) as they are parsed.
+Each record is released once the caller has moved on, so memory stays flat
+however many records a message carries.
+
+read_header() and iter_vdixml_bytes() read a VDIDataExchange envelope with
+expat directly, so the (possibly very large) VDIXML text is never built as
+one string: the header fields are collected on their own and the VDIXML
+content is handed on piece by piece, decompressed if needed.
+"""
+import io
+from xml.parsers import expat
+
+import xml_backend
+from tracing import span
+from vdi_compression import StreamingDecompressor, decompress_vdixml
+
+# Local-name paths from the document root at which a VDITransaction may sit
+TRANSACTION_PATHS = {
+    ("VDITransaction",),
+    ("Envelope", "Body", "VDITransaction"),
+    ("Envelope", "Body", "VDIDataExchange", "VDITransaction"),
+}
+
+# Local-name paths of the VDIDataExchange element carrying VDIXML
+DATAEXCHANGE_PATHS = {
+    ("VDIDataExchange",),
+    ("Envelope", "Body", "VDIDataExchange"),
+}
+
+_MAX_ENVELOPE_DEPTH = max(len(p) for p in TRANSACTION_PATHS)
+
+# VDIDataExchange header fields collected by read_header()
+HEADER_FIELDS = ("VDIXMLType", "TransactionID", "CompressionType")
+
+# Characters of the envelope handed to expat per Parse() call
+ENVELOPE_PIECE_CHARS = 1 << 20
+
+
+class VDIEnvelopeError(ValueError):
+    """The document does not contain a VDITransaction at any known location."""
+
+
+def local_name(tag: str) -> str:
+    """Element tag without its {namespace} prefix."""
+    return tag.rpartition("}")[2]
+
+
+def _iter_transaction(source, collection: str, record: str, found: list):
+    """Stream (transaction attrib, record element) pairs from one XML byte stream."""
+    path = []
+    transaction = None
+    container = None
+    compression_type = ""
+    for event, element in xml_backend.iterparse(source, events=("start", "end")):
+        if event == "start":
+            path.append(local_name(element.tag))
+            depth = len(path)
+            if depth <= _MAX_ENVELOPE_DEPTH and tuple(path) in TRANSACTION_PATHS:
+                transaction = element
+                found.append(True)
+            elif transaction is not None and depth >= 2 and path[-1] == collection and path[-2] == "VDITransaction":
+                container = element
+            continue
+
+        name = path.pop()
+        if container is not None and name == record and path[-1] == collection:
+            yield transaction.attrib, element
+            # Drop the record from the tree so parsed records do not accumulate
+            container.remove(element)
+        elif name == collection and element is container:
+            container = None
+        elif len(path) < _MAX_ENVELOPE_DEPTH and tuple(path) in DATAEXCHANGE_PATHS:
+            if name == "CompressionType":
+                compression_type = (element.text or "").strip()
+            elif name == "VDIXML":
+                # The parser has already unescaped the text back to XML
+                content = element.text or ""
+                if compression_type:
+                    with span("vdi.decompress", {"vdi.compression_type": compression_type,
+                                                 "vdi.encoded_bytes": len(content)}):
+                        content = decompress_vdixml(content, compression_type)
+                element.clear()
+                yield from _iter_transaction(io.BytesIO(content.encode("utf-8")), collection, record, found)
+
+
+def iter_records(xml_data, collection: str, record: str):
+    """
+    Yield (transaction_attrs, element) for each <record> in the VDITransaction's <collection>.
+
+    The element is only valid until the next item is requested; read what you
+    need from it before moving on.
+
+    Args:
+        xml_data: Request body (bytes or str)
+        collection: Collection element directly under VDITransaction, e.g. "KiosksCollection"
+        record: Record element inside the collection, e.g. "Kiosk"
+
+    Raises:
+        VDIEnvelopeError: If no VDITransaction is found (raised once the document is consumed)
+        xml_backend.XML_PARSE_ERRORS: If the document or the VDIXML content is not well-formed
+    """
+    if isinstance(xml_data, str):
+        xml_data = xml_data.encode("utf-8")
+    found = []
+    yield from _iter_transaction(io.BytesIO(xml_data.strip()), collection, record, found)
+    if not found:
+        raise VDIEnvelopeError("Invalid VDI message format")
+
+
+class _EnvelopeReader:
+    """expat handlers collecting VDIDataExchange header fields and, optionally, VDIXML text."""
+
+    def __init__(self, keep_vdixml: bool):
+        self.fields = {}
+        self.pieces = []
+        self.vdixml_started = False
+        self._keep_vdixml = keep_vdixml
+        self._in_vdixml = False
+        self._field = None
+        self.parser = expat.ParserCreate(namespace_separator="}")
+        self.parser.buffer_text = True
+        self.parser.buffer_size = 1 << 16
+        self.parser.StartElementHandler = self._start
+        self.parser.EndElementHandler = self._end
+        self.parser.CharacterDataHandler = self._data
+
+    def _start(self, name, attrs):
+        namespace, _, local = name.rpartition("}")
+        if namespace != xml_backend.VDI_NS["v"]:
+            return
+        if local == "VDIXML":
+            self._in_vdixml = self.vdixml_started = True
+        elif local in HEADER_FIELDS:
+            self._field = self.fields.setdefault(local, [])
+
+    def _end(self, name):
+        self._in_vdixml = False
+        self._field = None
+
+    def _data(self, data):
+        if self._in_vdixml:
+            if self._keep_vdixml:
+                self.pieces.append(data)
+        elif self._field is not None:
+            self._field.append(data)
+
+    def field(self, name: str) -> str:
+        return "".join(self.fields.get(name, ())).strip()
+
+    def feed(self, xml_text: str):
+        """Parse xml_text in ENVELOPE_PIECE_CHARS slices, yielding after each one."""
+        for start in range(0, len(xml_text), ENVELOPE_PIECE_CHARS):
+            self.parser.Parse(xml_text[start:start + ENVELOPE_PIECE_CHARS], False)
+            yield
+        self.parser.Parse("", True)
+        yield
+
+
+def read_header(xml_text: str):
+    """
+    Return (vdi_type, transaction_id) from a VDIDataExchange envelope without building its tree.
+
+    Parsing stops at the start of <VDIXML> once <VDIXMLType> has been seen.
+
+    Raises:
+        ValueError: If the envelope has no <VDIXMLType>
+        xml_backend.XML_PARSE_ERRORS: If the envelope is not well-formed
+    """
+    reader = _EnvelopeReader(keep_vdixml=False)
+    for _ in reader.feed(xml_text.strip()):
+        if reader.vdixml_started and "VDIXMLType" in reader.fields:
+            break
+    if "VDIXMLType" not in reader.fields:
+        raise ValueError("Cannot find <VDIXMLType> inside SOAP response")
+    return reader.field("VDIXMLType"), reader.field("TransactionID")
+
+
+def iter_vdixml_bytes(xml_text: str):
+    """
+    Yield the VDITransaction XML carried in an envelope's <VDIXML> as UTF-8 byte pieces.
+
+    The pieces are unescaped and, when CompressionType is set, decompressed;
+    SEED sends CompressionType ahead of VDIXML, as it must be known first.
+
+    Raises:
+        ValueError: If the envelope has no <VDIXML> or it is empty
+        xml_backend.XML_PARSE_ERRORS: If the envelope is not well-formed
+    """
+    reader = _EnvelopeReader(keep_vdixml=True)
+    decompressor = None
+    emitted = 0
+    for _ in reader.feed(xml_text.strip()):
+        if not reader.pieces:
+            continue
+        if decompressor is None:
+            compression_type = reader.field("CompressionType")
+            decompressor = StreamingDecompressor(compression_type) if compression_type else False
+        content = "".join(reader.pieces)
+        reader.pieces.clear()
+        piece = decompressor.feed(content) if decompressor else content.encode("utf-8")
+        emitted += len(content)
+        if piece:
+            yield piece
+    if not reader.vdixml_started:
+        raise ValueError("Cannot find <VDIXML> inside SOAP response")
+    if not emitted:
+        raise ValueError("VDIXML node exists but contains no XML")
+    if decompressor:
+        piece = decompressor.finish()
+        if piece:
+            yield piece
@@ -0,0 +1,352 @@
+"""
+Parser registry for inbound VDIDataExchange messages, keyed by VDIXMLType.
+
+Every VDI type /vdi/seed accepts has one VDIParser. Its parse step turns the
+decoded SOAP envelope into {table name: DataFrame}; an optional merge step
+post-processes the parsed frames (mms-products joins its per-product frames
+into the flat vdi_products layout). ingest.process_vdi_payload() hands every
+resulting table to the same loader.
+
+Parsers for the record-per-row types build their tables column by column
+with ColumnBatch, typed from the table's declared schema in TABLE_SCHEMAS.
+gcp_utils adds those schemas to SCHEMA_DATA, so the BigQuery tables and the
+frames loaded into them come from one declaration.
+"""
+import pandas as pd
+
+from products_chunked import parse_products_chunked
+from products_parallel import parse_products_parallel, use_parallel_parsing
+from tracing import set_span_attributes
+from utils import merge_products_data, parse_seed_markets_soap, parse_seed_products_soap
+from vdi_envelope import iter_records
+
+# Table name -> [(column, BigQuery type)] for the tables filled by ColumnBatch
+TABLE_SCHEMAS = {
+    # ------------------------------
+    # mms-kiosks: one row per kiosk status
+    # ------------------------------
+    "vdi_kiosks": [
+        ("TransactionID", "STRING"),
+        ("OperatorID", "STRING"),
+        ("MarketID", "STRING"),
+        ("KioskID", "STRING"),
+        ("KioskSN", "STRING"),
+        ("LastSync", "STRING"),
+        ("LastTransaction", "STRING"),
+        ("CatalogVersion", "STRING"),
+    ],
+
+    # ------------------------------
+    # mms-collections: one row per cash collection
+    # ------------------------------
+    "vdi_collections": [
+        ("TransactionID", "STRING"),
+        ("OperatorID", "STRING"),
+        ("MarketID", "STRING"),
+        ("KioskID", "STRING"),
+        ("CollectionTime", "STRING"),
+        ("Amount", "FLOAT"),
+        ("CollectedBy", "STRING"),
+    ],
+
+    # ------------------------------
+    # mms-sales: sales, their items, item taxes and tenders
+    # ------------------------------
+    "vdi_sales": [
+        ("TransactionID", "STRING"),
+        ("OperatorID", "STRING"),
+        ("MarketID", "STRING"),
+        ("KioskID", "STRING"),
+        ("SaleID", "STRING"),
+        ("SaleTime", "STRING"),
+        ("ConsumerID", "STRING"),
+        ("Price", "FLOAT"),
+        ("Discount", "FLOAT"),
+        ("Total", "FLOAT"),
+        ("FeesTotal", "FLOAT"),
+        ("TaxesTotal", "FLOAT"),
+    ],
+    "vdi_sale_items": [
+        ("TransactionID", "STRING"),
+        ("SaleID", "STRING"),
+        ("ItemIndex", "INTEGER"),
+        ("ProductID", "STRING"),
+        ("Code", "STRING"),
+        ("Quantity", "FLOAT"),
+        ("Price", "FLOAT"),
+        ("Cost", "FLOAT"),
+        ("Total", "FLOAT"),
+        ("FeesTotal", "FLOAT"),
+        ("TaxesTotal", "FLOAT"),
+    ],
+    "vdi_sale_item_taxes": [
+        ("TransactionID", "STRING"),
+        ("SaleID", "STRING"),
+        ("ItemIndex", "INTEGER"),
+        ("TaxIndex", "INTEGER"),
+        ("TaxName", "STRING"),
+        ("Rate", "FLOAT"),
+        ("Value", "FLOAT"),
+        ("Count", "INTEGER"),
+        ("Total", "FLOAT"),
+    ],
+    "vdi_sale_tenders": [
+        ("TransactionID", "STRING"),
+        ("SaleID", "STRING"),
+        ("TenderIndex", "INTEGER"),
+        ("Type", "STRING"),
+        ("Amount", "FLOAT"),
+    ],
+}
+
+# Table name -> columns identifying a row. MERGE-loaded tables only insert
+# rows whose key is not in the table yet. Append-only tables use the key as
+# the streaming insert ID, which BigQuery only deduplicates for about a
+# minute; their <table>_dedup views keep one row per key
+TABLE_KEYS = {
+    "vdi_markets_info": ["MarketID"],
+    "vdi_products": ["MarketID", "ProductID"],
+    "vdi_kiosks": ["MarketID", "KioskID", "LastSync"],
+    "vdi_collections": ["MarketID", "KioskID", "CollectionTime"],
+    "vdi_sales": ["SaleID"],
+    "vdi_sale_items": ["SaleID", "ItemIndex"],
+    "vdi_sale_item_taxes": ["SaleID", "ItemIndex", "TaxIndex"],
+    "vdi_sale_tenders": ["SaleID", "TenderIndex"],
+}
+
+SALES_TABLES = ("vdi_sales", "vdi_sale_items", "vdi_sale_item_taxes", "vdi_sale_tenders")
+
+# Sales are immutable once sent, so they are appended instead of MERGEd
+APPEND_ONLY_TABLES = frozenset(SALES_TABLES)
+
+
+class ColumnBatch:
+    """
+    Rows for one table, accumulated as one list per column.
+
+    Args:
+        table_name: TABLE_SCHEMAS key; fixes the column order and types
+    """
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.schema = TABLE_SCHEMAS[table_name]
+        self.columns = {name: [] for name, _ in self.schema}
+
+    def __len__(self):
+        return len(self.columns[self.schema[0][0]])
+
+    def append(self, **values):
+        """Add one row; columns not given are NULL."""
+        for name, column in self.columns.items():
+            column.append(values.get(name))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Build the DataFrame, converting each column to its declared type."""
+        return pd.DataFrame({name: _typed(self.columns[name], bq_type) for name, bq_type in self.schema})
+
+
+def _typed(values, bq_type):
+    """Convert a column of attribute strings to the pandas dtype for bq_type."""
+    if bq_type == "FLOAT":
+        return pd.to_numeric(pd.Series(values, dtype=object).replace("", None)).astype("float64")
+    if bq_type == "INTEGER":
+        return pd.to_numeric(pd.Series(values, dtype=object).replace("", None)).astype("Int64")
+    if bq_type == "BOOLEAN":
+        return pd.Series([None if v is None else str(v).lower() in ("true", "1") for v in values], dtype="boolean")
+    return pd.Series(values, dtype=object)
+
+
+class VDIParser:
+    """
+    How one VDIXMLType becomes table rows.
+
+    Args:
+        vdi_type: VDIXMLType handled, e.g. "mms-kiosks"
+        tables: Names of the tables the parser produces
+        parse: Callable(xml_str) -> parsed data ({table name: DataFrame} when merge is None)
+        merge: Optional callable(parsed data) -> {table name: DataFrame}
+        chunked: Optional memory-bounded alternative to parse + merge:
+            callable(xml_str, on_parsed=None) -> {table name: products_chunked.ChunkSpool},
+            calling on_parsed with each chunk's unmerged parse output
+    """
+
+    def __init__(self, vdi_type: str, tables, parse, merge=None, chunked=None):
+        self.vdi_type = vdi_type
+        self.tables = tuple(tables)
+        self.parse = parse
+        self.merge = merge
+        self.chunked = chunked
+
+
+PARSERS = {}
+
+
+def register_parser(vdi_type: str, tables, merge=None):
+    """Decorator registering a parse function as the VDIParser for vdi_type."""
+    def decorator(parse):
+        PARSERS[vdi_type] = VDIParser(vdi_type, tables, parse, merge)
+        return parse
+    return decorator
+
+
+def get_parser(vdi_type: str):
+    """Return the VDIParser for vdi_type, or None if the type is not handled."""
+    return PARSERS.get(vdi_type)
+
+
+# ---------------------------
+# mms-markets / mms-products
+# ---------------------------
+@register_parser("mms-markets", ["vdi_markets_info"])
+def parse_markets(xml_str: str):
+    return {"vdi_markets_info": parse_seed_markets_soap(xml_str)["markets"]}
+
+
+def parse_products(xml_str: str):
+    """mms-products parse step: in the process pool for large payloads (PARALLEL_PARSING), else in-process."""
+    if use_parallel_parsing(len(xml_str)):
+        return parse_products_parallel(xml_str)
+    return parse_seed_products_soap(xml_str)
+
+
+# parse_products returns per-product frames; the merge step flattens them.
+# Large catalogs can instead be parsed and merged in chunks (CHUNKED_PARSING).
+PARSERS["mms-products"] = VDIParser("mms-products", ["vdi_products"], parse_products,
+                                    merge=lambda data: {"vdi_products": merge_products_data(data)},
+                                    chunked=parse_products_chunked)
+
+
+# ---------------------------
+# mms-kiosks / mms-collections
+# ---------------------------
+@register_parser("mms-kiosks", ["vdi_kiosks"])
+def parse_kiosks(xml_str: str):
+    batch = ColumnBatch("vdi_kiosks")
+    for tx, kiosk in iter_records(xml_str, "KiosksCollection", "Kiosk"):
+        batch.append(
+            TransactionID=tx.get("TransactionID"),
+            OperatorID=tx.get("OperatorID"),
+            MarketID=kiosk.get("MarketID"),
+            KioskID=kiosk.get("KioskID"),
+            KioskSN=kiosk.get("KioskSN"),
+            LastSync=kiosk.get("LastSync"),
+            LastTransaction=kiosk.get("LastTransaction"),
+            CatalogVersion=kiosk.get("CatalogVersion"),
+        )
+    set_span_attributes({"vdi.rows.kiosks": len(batch)})
+    return {"vdi_kiosks": batch.to_frame()}
+
+
+@register_parser("mms-collections", ["vdi_collections"])
+def parse_collections(xml_str: str):
+    batch = ColumnBatch("vdi_collections")
+    for tx, collection in iter_records(xml_str, "CashCollections", "CashCollection"):
+        batch.append(
+            TransactionID=tx.get("TransactionID"),
+            OperatorID=tx.get("OperatorID"),
+            MarketID=collection.get("MarketID"),
+            KioskID=collection.get("KioskID"),
+            CollectionTime=collection.get("CollectionTime"),
+            Amount=collection.get("Amount"),
+            CollectedBy=collection.get("CollectedBy"),
+        )
+    set_span_attributes({"vdi.rows.collections": len(batch)})
+    return {"vdi_collections": batch.to_frame()}
+
+
+# ---------------------------
+# mms-sales
+# ---------------------------
+def _total(element, path):
+    """Total attribute of the Fees/Taxes container at path, or None when absent."""
+    container = element.find(path)
+    return container.get("Total") if container is not None else None
+
+
+@register_parser("mms-sales", SALES_TABLES)
+def extract_sales(xml_data):
+    """
+    Extract every sale in an mms-sales message into the normalized sales tables.
+
+    Sales are streamed one <Sale> at a time (vdi_envelope.iter_records), so the
+    message is never held as a full tree. Accepts the same shapes as the
+    /receive endpoints: a bare VDITransaction, a SOAP Body, or a
+    VDIDataExchange envelope with escaped or compressed VDIXML.
+
+    Returns:
+        {table name: DataFrame} for vdi_sales, vdi_sale_items,
+        vdi_sale_item_taxes and vdi_sale_tenders
+    """
+    sales = ColumnBatch("vdi_sales")
+    items = ColumnBatch("vdi_sale_items")
+    item_taxes = ColumnBatch("vdi_sale_item_taxes")
+    tenders = ColumnBatch("vdi_sale_tenders")
+
+    for tx, sale in iter_records(xml_data, "Sales", "Sale"):
+        transaction_id = tx.get("TransactionID")
+        sale_id = sale.get("SaleID")
+        summary = sale.find("Summary")
+        sales.append(
+            TransactionID=transaction_id,
+            OperatorID=tx.get("OperatorID"),
+            MarketID=sale.get("MarketID"),
+            KioskID=sale.get("KioskID"),
+            SaleID=sale_id,
+            SaleTime=sale.get("SaleTime"),
+            ConsumerID=sale.get("ConsumerID"),
+            Price=summary.get("Price") if summary is not None else None,
+            Discount=summary.get("Discount") if summary is not None else None,
+            Total=summary.get("Total") if summary is not None else None,
+            FeesTotal=_total(summary, "Fees") if summary is not None else None,
+            TaxesTotal=_total(summary, "Taxes") if summary is not None else None,
+        )
+
+        for item_index, item in enumerate(sale.iterfind("Items/Item")):
+            items.append(
+                TransactionID=transaction_id,
+                SaleID=sale_id,
+                ItemIndex=item_index,
+                ProductID=item.get("ProductID"),
+                Code=item.get("Code"),
+                Quantity=item.get("Quantity"),
+                Price=item.get("Price"),
+                Cost=item.get("Cost"),
+                Total=item.get("Total"),
+                FeesTotal=_total(item, "Fees"),
+                TaxesTotal=_total(item, "Taxes"),
+            )
+            for tax_index, tax in enumerate(item.iterfind("Taxes/Tax")):
+                item_taxes.append(
+                    TransactionID=transaction_id,
+                    SaleID=sale_id,
+                    ItemIndex=item_index,
+                    TaxIndex=tax_index,
+                    TaxName=tax.get("Name"),
+                    Rate=tax.get("Rate"),
+                    Value=tax.get("Value"),
+                    Count=tax.get("Count"),
+                    Total=tax.get("Total"),
+                )
+
+        for tender_index, tender in enumerate(sale.iterfind("Tenders/Tender")):
+            tenders.append(
+                TransactionID=transaction_id,
+                SaleID=sale_id,
+                TenderIndex=tender_index,
+                Type=tender.get("Type"),
+                Amount=tender.get("Amount"),
+            )
+
+    set_span_attributes({
+        "vdi.rows.sales": len(sales),
+        "vdi.rows.items": len(items),
+        "vdi.rows.taxes": len(item_taxes),
+        "vdi.rows.tenders": len(tenders),
+    })
+    return {batch.table_name: batch.to_frame() for batch in (sales, items, item_taxes, tenders)}
+
+
+def frame_columns(df: pd.DataFrame) -> dict:
+    """Return a DataFrame as JSON-ready {column: [values]} with nulls as None."""
+    return {name: [None if pd.isna(v) else v for v in column.tolist()] for name, column in df.items()}
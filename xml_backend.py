@@ -0,0 +1,149 @@
+"""
+Selectable XML parser backend for inbound VDI messages.
+
+"etree" is the standard library xml.etree.ElementTree. "lxml" parses with
+a hardened lxml parser (no entity resolution, DTD loading or network
+access), with huge_tree from config so multi-megabyte VDIXML text nodes
+parse, and looks up envelope elements with precompiled XPath.
+
+Both backends return ElementTree-compatible elements (find, findall,
+iterfind, get, attrib, text), so parsers work unchanged on either. The
+backend is picked per deployment with XML_PARSER_BACKEND; use_backend()
+switches it at runtime (benchmarks/bench_xml_backends.py).
+"""
+import threading
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+from config import XML_PARSER
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # lxml is optional unless XML_PARSER_BACKEND=lxml
+    lxml_etree = None
+
+VDI_NS = {
+    "s": "http://schemas.xmlsoap.org/soap/envelope/",
+    "v": "urn:VDIDataExchangeService"
+}
+
+# Envelope lookups by name, relative to the SOAP envelope root
+ENVELOPE_PATHS = {
+    "VDIXML": ".//v:VDIXML",
+    "VDIXMLType": ".//v:VDIXMLType",
+    "TransactionID": ".//v:TransactionID",
+    "CompressionType": ".//v:CompressionType",
+}
+
+# Exceptions raised for documents that are not well-formed, on either backend
+# (and by the expat envelope reader in vdi_envelope)
+XML_PARSE_ERRORS = (ET.ParseError, expat.ExpatError) + ((lxml_etree.XMLSyntaxError,) if lxml_etree is not None else ())
+
+
+class EtreeBackend:
+    """xml.etree.ElementTree (expat)."""
+
+    name = "etree"
+
+    def fromstring(self, data):
+        return ET.fromstring(data)
+
+    def iterparse(self, source, events=("end",)):
+        return ET.iterparse(source, events=events)
+
+    def pullparser(self, events=("end",)):
+        return ET.XMLPullParser(events=events)
+
+    def find(self, root, path_name):
+        return root.find(ENVELOPE_PATHS[path_name], VDI_NS)
+
+
+class LxmlBackend:
+    """
+    lxml (libxml2) with a hardened parser.
+
+    Args:
+        huge_tree: Allow text nodes over 10 MB and very deep trees
+    """
+
+    name = "lxml"
+
+    def __init__(self, huge_tree: bool = True):
+        if lxml_etree is None:
+            raise ImportError("XML_PARSER_BACKEND=lxml needs the lxml package (pip install lxml)")
+        self.huge_tree = huge_tree
+        self._parser_options = dict(resolve_entities=False, no_network=True, load_dtd=False,
+                                    huge_tree=huge_tree)
+        self._xpaths = {name: lxml_etree.XPath(path, namespaces=VDI_NS)
+                        for name, path in ENVELOPE_PATHS.items()}
+        # lxml parsers must not be shared between threads
+        self._local = threading.local()
+
+    def _parser(self):
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            parser = self._local.parser = lxml_etree.XMLParser(**self._parser_options)
+        return parser
+
+    def fromstring(self, data):
+        if isinstance(data, str):
+            # lxml refuses str input that carries an encoding declaration
+            data = data.encode("utf-8")
+        return lxml_etree.fromstring(data, self._parser())
+
+    def iterparse(self, source, events=("end",)):
+        return lxml_etree.iterparse(source, events=events, **self._parser_options)
+
+    def pullparser(self, events=("end",)):
+        return lxml_etree.XMLPullParser(events=events, **self._parser_options)
+
+    def find(self, root, path_name):
+        found = self._xpaths[path_name](root)
+        return found[0] if found else None
+
+
+BACKENDS = {
+    "etree": EtreeBackend,
+    "lxml": lambda: LxmlBackend(huge_tree=XML_PARSER["huge_tree"]),
+}
+
+_instances = {}
+_current = None
+
+
+def get_backend(name: str = None):
+    """Return the backend called name (default: the active one)."""
+    if name is None:
+        return _current if _current is not None else use_backend(XML_PARSER["backend"])
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown XML parser backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
+
+
+def use_backend(name: str):
+    """Make name the active backend and return it."""
+    global _current
+    _current = get_backend(name)
+    return _current
+
+
+def fromstring(data):
+    """Parse a whole document with the active backend and return its root element."""
+    return get_backend().fromstring(data)
+
+
+def iterparse(source, events=("end",)):
+    """Incrementally parse a binary file object with the active backend."""
+    return get_backend().iterparse(source, events)
+
+
+def pullparser(events=("end",)):
+    """Return a feed()/read_events() parser from the active backend."""
+    return get_backend().pullparser(events)
+
+
+def find_envelope(root, path_name: str):
+    """Return the first ENVELOPE_PATHS[path_name] element under a parsed SOAP envelope, or None."""
+    return get_backend().find(root, path_name)